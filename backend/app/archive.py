@@ -0,0 +1,43 @@
+"""
+Moves old documents to cold storage (see services/archive.py). Run it daily from cron or a
+scheduled machine:
+
+    python -m app.archive              # archive text and originals past their configured age
+    python -m app.archive --dry-run    # only count what would move
+
+On Postgres, run VACUUM (or let autovacuum) on documents afterwards to reuse the freed space.
+"""
+import argparse
+import datetime
+import sys
+from .config import settings
+from .db import SessionLocal
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text-days", type=int, default=settings.ARCHIVE_TEXT_AFTER_DAYS)
+    parser.add_argument("--originals-days", type=int, default=settings.ARCHIVE_ORIGINALS_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="count what would be archived, change nothing")
+    args = parser.parse_args()
+
+    from .services.archive import archive_originals, archive_text
+
+    now = datetime.datetime.utcnow()
+    verb = "would archive" if args.dry_run else "archived"
+    db = SessionLocal()
+    try:
+        if args.text_days > 0:
+            n = archive_text(db, now - datetime.timedelta(days=args.text_days), args.batch_size, args.dry_run)
+            print(f"{verb} text of {n} document(s) older than {args.text_days} days")
+        if args.originals_days > 0:
+            n = archive_originals(db, now - datetime.timedelta(days=args.originals_days), args.batch_size, args.dry_run)
+            print(f"{verb} {n} original(s) older than {args.originals_days} days")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,7 @@ from .model import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
 def verify_password(plain, hashed):
     try:
@@ -59,3 +60,29 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if user is None:
         raise credentials_exception
     return user
+
+def get_current_user_allow_query(
+    token: str | None = Depends(oauth2_scheme_optional),
+    access_token: str | None = None,
+    db: Session = Depends(get_db),
+) -> User:
+    """Like get_current_user, but also accepts ?access_token= for clients that cannot set headers (EventSource, <img>)."""
+    return get_current_user(token or access_token or "", db)
+
+def get_stream_user_allow_query(
+    token: str | None = Depends(oauth2_scheme_optional),
+    access_token: str | None = None,
+) -> User:
+    """get_current_user_allow_query for streaming responses: the session is closed before the stream starts.
+
+    A yield dependency such as get_db is only cleaned up after the response has been sent, so a
+    long-lived stream would otherwise keep a pooled connection checked out until it ends.
+    """
+    with SessionLocal() as db:
+        return get_current_user(token or access_token or "", db)
+
+
+def get_stream_user(token: str = Depends(oauth2_scheme)) -> User:
+    """get_current_user for streaming responses; see get_stream_user_allow_query."""
+    with SessionLocal() as db:
+        return get_current_user(token, db)
@@ -6,11 +6,90 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     OPENAI_API_KEY: str | None = None
+    # Optional OpenAI-compatible endpoint (e.g. benchmarks/fake_llm.py for local testing)
+    OPENAI_BASE_URL: str | None = None
     REDIS_URL: str | None = None
+    # Run app.migrate's ensure_schema at startup; turn off when `python -m app.migrate` runs as a deploy step
+    AUTO_MIGRATE: bool = True
     STORAGE_TYPE: str = "local"
     UPLOAD_DIR: str = "./uploads"
+    # POST /documents/upload/batch: max files per batch (ZIP entries included) and total bytes written
+    BATCH_UPLOAD_MAX_FILES: int = 500
+    BATCH_UPLOAD_MAX_BYTES: int = 500 * 1024 * 1024
+    # Page previews made during extraction (default <UPLOAD_DIR>/thumbnails); width in pixels
+    THUMBNAIL_DIR: str | None = None
+    THUMBNAIL_WIDTH: int = 320
+    THUMBNAIL_MAX_PAGES: int = 3
+    THUMBNAIL_QUALITY: int = 70
+    # Archiving (python -m app.archive): OCR text older than ARCHIVE_TEXT_AFTER_DAYS is compressed into
+    # document_archive; originals of approved/rejected documents older than ARCHIVE_ORIGINALS_AFTER_DAYS
+    # move to ARCHIVE_DIR (default <UPLOAD_DIR>/archive). 0 disables either step
+    ARCHIVE_DIR: str | None = None
+    ARCHIVE_TEXT_AFTER_DAYS: int = 90
+    ARCHIVE_ORIGINALS_AFTER_DAYS: int = 180
     # Comma-separated origins for CORS (e.g. https://your-app.vercel.app)
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
+    # OCR preprocessing (services/ocr.py); an empty OCR_PREPROCESS_STEPS sends pages to Tesseract as-is
+    OCR_PREPROCESS_STEPS: str = "downscale,orientation,binarize,deskew,crop"
+    OCR_TARGET_DPI: int = 300
+    OCR_DESKEW_MAX_ANGLE: float = 5.0
+    OCR_TESSERACT_CONFIG: str = "--oem 1 --psm 3"
+    # Re-read amounts on total/VAT lines with a digits-only whitelist below this word confidence; 0 disables
+    OCR_NUMERIC_REREAD_CONFIDENCE: float = 80.0
+    # "progressive" OCRs page 1, then the last page's header/totals, then the rest, stopping once every
+    # required field was read at EXTRACTION_MIN_CONFIDENCE or better; "full" always OCRs every page
+    EXTRACTION_MODE: str = "progressive"
+    EXTRACTION_REQUIRED_FIELDS: str = "vendor,invoice_number,date,amount"
+    EXTRACTION_MIN_CONFIDENCE: float = 60.0
+    # Extraction runs inside each API worker: jobs at once per worker, and the memory budgeted per job
+    EXTRACTION_CONCURRENCY: int = 2
+    EXTRACTION_MEMORY_MB: int = 150
+    # Production server (app/serve.py, gunicorn.conf.py); WEB_CONCURRENCY overrides the computed worker count
+    WEB_CONCURRENCY: int | None = None
+    WEB_WORKER_MEMORY_MB: int = 150
+    WEB_MAX_REQUESTS: int = 5000
+    WEB_MAX_REQUESTS_JITTER: int = 500
+    # Restart a worker gracefully once its resident memory passes this; 0 disables
+    WEB_WORKER_MAX_RSS_MB: int = 768
+    WEB_TIMEOUT: int = 60
+    WEB_GRACEFUL_TIMEOUT: int = 60
+    # Comma-separated modules imported once in the gunicorn master and shared by workers (e.g. PIL.Image,pandas)
+    WEB_PRELOAD_MODULES: str = ""
+    # Report response cache (in-memory LRU, or Redis when REDIS_URL is set); TTL 0 disables it
+    REPORT_CACHE_TTL_SECONDS: int = 60
+    REPORT_CACHE_MAX_ENTRIES: int = 256
+    # Mambo learned replies kept in the chat_memory table (oldest evicted first)
+    CHAT_MEMORY_MAX_ENTRIES: int = 10000
+    # Semantic cache in front of the LLM: cosine similarity needed for a hit; 0 entries disables it
+    CHAT_CACHE_SIMILARITY: float = 0.85
+    CHAT_CACHE_TTL_SECONDS: int = 3600
+    CHAT_CACHE_MAX_ENTRIES: int = 1000
+    # Vendor autocomplete index (services/vendors.py): new aliases are picked up incrementally when
+    # the document version changes or after VENDOR_INDEX_REFRESH_SECONDS, and the whole index (with
+    # document counts) is rebuilt after a merge or VENDOR_INDEX_REBUILD_SECONDS
+    VENDOR_INDEX_REFRESH_SECONDS: int = 30
+    VENDOR_INDEX_REBUILD_SECONDS: int = 600
+    # Anomalies: a document is flagged when its amount is ANOMALY_SCORE_THRESHOLD standard deviations
+    # above its vendor's mean (on log amounts); vendors need ANOMALY_MIN_HISTORY documents first
+    ANOMALY_SCORE_THRESHOLD: float = 3.0
+    ANOMALY_MIN_HISTORY: int = 5
+    # Admission control (services/admission.py): per-client and global limits by cost class;
+    # ADMISSION_LIMITS is JSON overriding the defaults per class, e.g. {"export": {"global_concurrency": 8}}
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: str = ""
+    # Reverse proxies in front of the app that append to X-Forwarded-For (1 on Fly); anonymous
+    # clients are keyed by the address that many entries from the right, 0 uses the socket peer
+    TRUSTED_PROXY_HOPS: int = 0
+    # Response compression (br when the brotli package is installed, else gzip); 0 disables it
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    # If set, GET /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN: str | None = None
+    # Logging: JSON lines to stdout via a background queue; per-field debug lines are sampled
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_FIELD_SAMPLE_RATE: float = 0.1
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,131 @@
+"""
+Structured JSON logging through a non-blocking queue handler.
+
+Callers only enqueue records; a single QueueListener thread formats and writes them, so worker
+threads never block on stdout. request_id (set by RequestIdMiddleware) and doc_id (set by the
+extraction pipeline) are carried in context variables and added to every record. Records logged
+with extra={"sampled": True} (per-field debug lines) are kept at LOG_FIELD_SAMPLE_RATE.
+"""
+import atexit
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from .config import settings
+
+request_id_var: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+doc_id_var: contextvars.ContextVar[int | None] = contextvars.ContextVar("doc_id", default=None)
+
+# Attributes every LogRecord has; anything else came from `extra=` and is logged as a field
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sampled"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class ContextFilter(logging.Filter):
+    """Stamps request_id/doc_id on the record in the caller's thread, before it is queued."""
+
+    def filter(self, record):
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        if getattr(record, "doc_id", None) is None:
+            record.doc_id = doc_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if getattr(record, "sampled", False):
+            return random.random() < self.rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Keep the record structured for the formatter; resolve only what cannot cross threads
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """Route the `app` loggers through a queue to one JSON (or plain) stdout writer. Idempotent."""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(
+        JsonFormatter() if settings.LOG_JSON
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s [req=%(request_id)s doc=%(doc_id)s] %(message)s")
+    )
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(q)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(settings.LOG_FIELD_SAMPLE_RATE))
+    logger = logging.getLogger("app")
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.addHandler(handler)
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(q, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_stop_listener)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    """A forked worker (gunicorn preload) inherits the queue but not the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=False)
+        _listener.start()
+
+
+def _stop_listener():
+    """Flush queued records on interpreter exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+@contextmanager
+def stage_timer(durations: dict, stage: str):
+    """Add how long a pipeline stage took, in milliseconds, to `durations[stage]`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        durations[stage] = round(durations.get(stage, 0.0) + elapsed, 1)
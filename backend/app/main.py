@@ -1,10 +1,35 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from .db import Base, engine
-from .routes import auth, documents, reports, chat
+from fastapi.responses import PlainTextResponse
+from .db import engine
+from .routes import auth, documents, reports, chat, events, vendors
 from .config import settings
+from .migrate import ensure_schema
+from .services.admission import get_controller
+from .services.metrics import instrument_engine, render_latest
+from .middleware import AdmissionMiddleware, CompressionMiddleware, MetricsMiddleware, RequestIdMiddleware
+from .log import setup_logging
 
-app = FastAPI(title="PCG DMS")
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Schema changes run here (or via `python -m app.migrate`), not on import; when the stored
+    # fingerprint matches the models this is a single SELECT
+    if settings.AUTO_MIGRATE:
+        ensure_schema(engine)
+    if settings.ADMISSION_ENABLED:
+        # Fail at startup, not on the first request, if ADMISSION_LIMITS is invalid
+        get_controller()
+    yield
+
+
+app = FastAPI(title="PCG DMS", lifespan=lifespan)
+
+# Innermost, so its 429s still get CORS headers and show up in the metrics
+app.add_middleware(AdmissionMiddleware, fastapi_app=app)
 
 # Configure CORS (use CORS_ORIGINS env var in production for your Vercel URL)
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",") if o.strip()]
@@ -14,17 +39,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
-
-# Create tables (for prototype)
-Base.metadata.create_all(bind=engine)
+app.add_middleware(MetricsMiddleware, fastapi_app=app)
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(CompressionMiddleware)
+instrument_engine(engine)
 
 app.include_router(auth.router)
 app.include_router(documents.router)
 app.include_router(reports.router)
 app.include_router(chat.router)
+app.include_router(events.router)
+app.include_router(vendors.router)
 
 
 @app.get("/")
 def root():
     return {"message": "Document Management System API"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: str | None = Header(None)):
+    """Prometheus metrics for this worker; set METRICS_TOKEN to require `Authorization: Bearer <token>`."""
+    if settings.METRICS_TOKEN and authorization != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,298 @@
+"""
+ASGI middleware for the API (pure ASGI, so streaming responses pass through untouched).
+"""
+import json
+import time
+import uuid
+import zlib
+from urllib.parse import parse_qs
+import anyio
+from jose import JWTError, jwt
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
+from .config import settings
+from .log import request_id_var
+from .services.admission import Rejection, classify, get_controller
+from .services.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+
+
+def _route_template(app, scope) -> str:
+    """Path template of the matching route (e.g. /documents/{doc_id}), to keep label cardinality bounded."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Per-route latency histogram, request counter and in-flight gauge."""
+
+    def __init__(self, app, fastapi_app=None):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = _route_template(self.fastapi_app, scope) if self.fastapi_app else scope["path"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(method=method, route=route)
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
+
+
+def _client_key(scope) -> str:
+    """JWT subject of the caller (signature checked, no DB lookup), else its IP address."""
+    headers = Headers(scope=scope)
+    token = headers.get("authorization", "")
+    token = token[7:] if token[:7].lower() == "bearer " else ""
+    if not token and b"access_token=" in scope.get("query_string", b""):
+        token = parse_qs(scope["query_string"].decode("latin-1")).get("access_token", [""])[0]
+    if token:
+        try:
+            sub = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+            if sub:
+                return f"user:{sub}"
+        except JWTError:
+            pass
+    return f"ip:{_client_ip(headers, scope)}"
+
+
+def _client_ip(headers: Headers, scope) -> str:
+    """Socket peer, or behind TRUSTED_PROXY_HOPS proxies the address the outermost one saw.
+
+    Each proxy appends the address it received the request from, so only the last
+    TRUSTED_PROXY_HOPS entries of X-Forwarded-For are trustworthy; anything left of them
+    is whatever the client sent.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = [ip.strip() for value in headers.getlist("x-forwarded-for") for ip in value.split(",")]
+        forwarded = [ip for ip in forwarded if ip]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionMiddleware:
+    """Admits, queues or sheds (429 + Retry-After) each request by its route's cost class.
+
+    The slot is released when the response body is complete, so background work attached to
+    the response (extraction after an upload) does not hold it.
+    """
+
+    def __init__(self, app, fastapi_app=None):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        route = _route_template(self.fastapi_app, scope) if self.fastapi_app else scope["path"]
+        cost_class = classify(scope["method"], route)
+        if cost_class is None:
+            await self.app(scope, receive, send)
+            return
+        ticket = await get_controller().admit(cost_class, _client_key(scope))
+        if isinstance(ticket, Rejection):
+            body = json.dumps({
+                "detail": "Too many requests, please retry later",
+                "cost_class": ticket.cost_class,
+                "reason": ticket.reason,
+            }).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"retry-after", str(ticket.retry_after).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_wrapper(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                await ticket.release()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await ticket.release()
+
+
+class RequestIdMiddleware:
+    """Takes X-Request-ID from the client (or makes one), exposes it to logging and echoes it back."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:64]
+        request_id = incoming or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
+_COMPRESSIBLE = ("application/json", "application/javascript", "application/xml", "image/svg+xml")
+# Compress bodies larger than this in a worker thread so the event loop keeps serving
+_THREAD_MIN_BYTES = 128 * 1024
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def choose_encoding(accept_encoding: str, brotli_available: bool) -> str | None:
+    """Best of br/gzip the client accepts (q > 0), preferring br on a tie; None for identity."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli_available else []) + ["gzip"]
+    best = max(candidates, key=lambda e: weights.get(e, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+def _compressible(content_type: str) -> bool:
+    media = content_type.split(";")[0].strip().lower()
+    if media == "text/event-stream":
+        return False
+    return media.startswith("text/") or media in _COMPRESSIBLE or media.endswith("+json")
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._br = _brotli().Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._br = None
+            self._gzip = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress data and flush, so each streamed chunk reaches the client promptly."""
+        if self._br is not None:
+            return self._br.process(data) + self._br.flush()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._br is not None:
+            return self._br.process(data) + self._br.finish()
+        return self._gzip.compress(data) + self._gzip.flush()
+
+
+class CompressionMiddleware:
+    """Negotiated brotli/gzip for text and JSON bodies of at least COMPRESSION_MIN_BYTES.
+
+    Skips event streams, binary downloads, partial content and bodies that are already encoded.
+    A compressed response gets a weak ETag (the bytes differ from the identity body it was
+    computed on) and Vary: Accept-Encoding.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.brotli_available = _brotli() is not None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or settings.COMPRESSION_MIN_BYTES <= 0:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.brotli_available)
+        start = None
+        compressor = None
+
+        async def send_wrapper(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                # e.g. http.response.pathsend from FileResponse: nothing to compress
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if start is not None:
+                first, start = start, None
+                headers = MutableHeaders(raw=list(first.get("headers", [])))
+                eligible = (
+                    first["status"] not in (204, 206, 304)
+                    and "content-encoding" not in headers
+                    and _compressible(headers.get("content-type", ""))
+                )
+                if eligible:
+                    headers.add_vary_header("Accept-Encoding")
+                if not eligible or encoding is None or (not more and len(body) < settings.COMPRESSION_MIN_BYTES):
+                    first["headers"] = headers.raw
+                    await send(first)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if more:
+                    del headers["Content-Length"]
+                    body = compressor.chunk(body)
+                else:
+                    if len(body) >= _THREAD_MIN_BYTES:
+                        body = await anyio.to_thread.run_sync(compressor.finish, body)
+                    else:
+                        body = compressor.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                first["headers"] = headers.raw
+                await send(first)
+                await send({"type": "http.response.body", "body": body, "more_body": more})
+                return
+            if compressor is not None:
+                body = compressor.chunk(body) if more else compressor.finish(body)
+                message = {"type": "http.response.body", "body": body, "more_body": more}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
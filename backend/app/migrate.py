@@ -0,0 +1,134 @@
+"""
+Schema management, run as an explicit step instead of on import:
+
+    python -m app.migrate            # create/upgrade the schema for DATABASE_URL
+    python -m app.migrate --check    # exit 1 if the schema is out of date
+
+Creates missing tables, adds missing columns and indexes to existing ones (new columns are added
+nullable unless they have a server default), sets up the full-text search index and indexes the
+documents missing from it, and assigns vendors and anomaly scores to documents extracted before
+those existed. A fingerprint of the models is stored in schema_state, so ensure_schema() at boot
+is a single SELECT when nothing changed. Columns are never dropped or altered; do that by hand.
+"""
+import argparse
+import hashlib
+import logging
+import sys
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.orm import Session
+from .db import Base, engine as default_engine
+from . import model  # noqa: F401 - registers the tables on Base.metadata
+from .model import Document, VendorStats
+
+logger = logging.getLogger(__name__)
+
+# Bump when ensure_search_index or other DDL outside the models changes
+_EXTRA_DDL_VERSION = "search-2"
+
+_state = Table(
+    "schema_state", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+)
+
+
+def fingerprint() -> str:
+    """Hash of every table, column type and index the models declare."""
+    parts = [_EXTRA_DDL_VERSION]
+    for table in Base.metadata.sorted_tables:
+        parts.append(table.name)
+        parts += [f"{c.name}:{c.type!r}:{c.nullable}" for c in table.columns]
+        parts += sorted(f"ix:{i.name}" for i in table.indexes)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def stored_fingerprint(engine=default_engine) -> str | None:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(_state.c.fingerprint).where(_state.c.id == 1)).scalar()
+    except Exception:
+        # No schema_state table yet: a new or pre-migration database
+        return None
+
+
+def _add_column_sql(table, column, dialect) -> str:
+    sql = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+    default = column.server_default
+    if default is not None and isinstance(getattr(default, "arg", None), str):
+        sql += f" DEFAULT '{default.arg}'"
+        if not column.nullable:
+            sql += " NOT NULL"
+    return sql
+
+
+def migrate(engine=default_engine) -> list[str]:
+    """Bring the schema up to date with the models; returns a description of each change."""
+    from .services.search import ensure_search_index, reindex_all
+    from .services.anomaly import rebuild_scores
+    from .services.vendors import backfill_vendors
+
+    changes = []
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # Several machines or workers may boot at once; the first one migrates, the rest wait
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('dms:migrate'))"))
+        existing = set(inspect(conn).get_table_names())
+        missing = [t for t in Base.metadata.sorted_tables if t.name not in existing]
+        Base.metadata.create_all(conn, tables=missing)
+        changes += [f"create table {t.name}" for t in missing]
+        for table in Base.metadata.sorted_tables:
+            if table in missing:
+                continue
+            inspector = inspect(conn)
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    conn.execute(text(_add_column_sql(table, column, engine.dialect)))
+                    changes.append(f"add column {table.name}.{column.name}")
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    changes.append(f"create index {index.name}")
+        _state.create(conn, checkfirst=True)
+        conn.execute(_state.delete())
+        conn.execute(_state.insert().values(id=1, fingerprint=fingerprint()))
+    ensure_search_index(engine)
+    with Session(engine) as db:
+        indexed = reindex_all(db, missing_only=True)
+        if indexed:
+            changes.append(f"add {indexed} documents to the search index")
+        backfilled = backfill_vendors(db)
+        if backfilled:
+            changes.append(f"assign vendor ids to {backfilled} documents")
+        if db.query(VendorStats.vendor_id).first() is None and db.query(Document.id).filter(Document.vendor_id.isnot(None)).first():
+            changes.append(f"score {rebuild_scores(db)} documents for anomalies")
+    return changes
+
+
+def ensure_schema(engine=default_engine) -> bool:
+    """Boot-time check: migrate only when the stored fingerprint differs. Returns True if it migrated."""
+    if stored_fingerprint(engine) == fingerprint():
+        return False
+    for change in migrate(engine):
+        logger.info("Schema migration: %s", change)
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report whether a migration is needed")
+    args = parser.parse_args()
+    if args.check:
+        current = stored_fingerprint() == fingerprint()
+        print("schema is up to date" if current else "schema needs migrating")
+        return 0 if current else 1
+    changes = migrate()
+    for change in changes:
+        print(change)
+    print(f"{len(changes)} change(s); schema is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
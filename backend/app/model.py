@@ -1,6 +1,6 @@
 import enum
 import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Float, Enum, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, Enum, ForeignKey, Boolean, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -24,21 +24,66 @@ class DocumentStatus(str, enum.Enum):
     approved = "approved"
     rejected = "rejected"
 
+class Vendor(Base):
+    """Canonical supplier; spelling variants map to it through vendor_aliases (services/vendors.py)."""
+    __tablename__ = "vendors"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    aliases = relationship("VendorAlias", back_populates="vendor")
+
+class VendorStats(Base):
+    """Running count, mean and M2 (Welford) of log(1 + amount) per vendor (services/anomaly.py)."""
+    __tablename__ = "vendor_stats"
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class VendorAlias(Base):
+    __tablename__ = "vendor_aliases"
+    id = Column(Integer, primary_key=True)
+    # Normalised spelling (vendors.vendor_key): lower case, no punctuation or legal suffix
+    key = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)  # first spelling seen with this key
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True, nullable=False)
+    vendor = relationship("Vendor", back_populates="aliases")
+
 class Document(Base):
     __tablename__ = "documents"
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
-    vendor = Column(String, index=True)
+    vendor = Column(String, index=True)  # as extracted
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
     invoice_number = Column(String, index=True)
     date = Column(DateTime)
     amount = Column(Float)
     vat = Column(Float)
     status = Column(Enum(DocumentStatus), default=DocumentStatus.pending)
     current_step = Column(Integer, default=1)
+    # Bumped on every workflow transition; approvals compare-and-swap on it
+    version = Column(Integer, default=1, server_default="1", nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     is_duplicate = Column(Boolean, default=False)
     raw_text = Column(Text)
-    approvals = relationship("Approval", back_populates="document")
+    # How the text was obtained: text_layer, image, first_page, first_page+last_regions, all_pages, failed
+    extraction_path = Column(String(32))
+    # Set for documents ingested together through POST /documents/upload/batch
+    batch_id = Column(String(32), index=True)
+    # Standard deviations above the vendor's usual (log) amount when extracted; NULL if unscored
+    anomaly_score = Column(Float, index=True)
+    # Set when raw_text has moved, compressed, to document_archive (services/archive.py)
+    text_archived_at = Column(DateTime)
+    # Set when the original has moved from UPLOAD_DIR to the cold store (services/files.py)
+    original_archived_at = Column(DateTime)
+    # Not loaded with the document; use selectinload(Document.approvals) where they are needed
+    approvals = relationship("Approval", back_populates="document", order_by="Approval.timestamp")
+
+    __table_args__ = (
+        # Approver inbox: pending documents per step, oldest first (keyset on created_at, id)
+        Index("ix_documents_inbox", "status", "current_step", "created_at", "id"),
+    )
 
 class Approval(Base):
     __tablename__ = "approvals"
@@ -50,3 +95,31 @@ class Approval(Base):
     comment = Column(String)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     document = relationship("Document", back_populates="approvals")
+    approver = relationship("User")
+
+    __table_args__ = (
+        # Document timeline, and the audit report filtered by approver or by date (newest first)
+        Index("ix_approvals_document", "document_id", "timestamp"),
+        Index("ix_approvals_approver", "approver_id", "timestamp"),
+        Index("ix_approvals_timestamp", "timestamp"),
+    )
+
+class DocumentArchive(Base):
+    """Compressed OCR text of archived documents; range-partitioned by year of created_at on Postgres."""
+    __tablename__ = "document_archive"
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+    # The document's created_at; in the key because Postgres requires the partition column there
+    created_at = Column(DateTime, primary_key=True)
+    codec = Column(String(8), nullable=False)  # zstd or zlib
+    raw_text = Column(LargeBinary, nullable=False)
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+class ChatMemory(Base):
+    """Mambo's learned question/reply pairs, shared by all workers (see services/chat_memory.py)."""
+    __tablename__ = "chat_memory"
+    id = Column(Integer, primary_key=True)
+    user_text = Column(Text, nullable=False)
+    bot_reply = Column(Text, nullable=False)
+    action = Column(Text)  # JSON-encoded ChatAction, if any
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
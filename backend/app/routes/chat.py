@@ -3,10 +3,18 @@ Mambo chatbot: helps users use the DMS, can think (AI/LLM), learn (store interac
 """
 import json
 import re
-from fastapi import APIRouter, Depends
+import time
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from ..auth import get_current_user
+from ..auth import get_current_user, get_stream_user
 from ..config import settings
+from ..services.chat_memory import learned_store
+from ..services.intents import classifier
+from ..services.reply_cache import reply_cache
+from ..dependencies import require_role
+from ..services.metrics import STAGE_LATENCY, timed
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -32,89 +40,27 @@ class ChatResponse(BaseModel):
     action: ChatAction | None = None
 
 
-# In-memory store for learning: last N exchanges (could be replaced with DB)
-_learned: list[dict] = []
-_MAX_LEARNED = 500
-
-
 def _learn(user_msg: str, bot_reply: str, action: dict | None):
-    _learned.append({"user": user_msg, "bot": bot_reply, "action": action})
-    if len(_learned) > _MAX_LEARNED:
-        _learned.pop(0)
+    learned_store.add(user_msg, bot_reply, action)
 
 
 def _rule_based_reply(message: str) -> tuple[str, ChatAction | None]:
-    """Fallback when no OpenAI: intent matching and helpful replies. Learns from patterns."""
+    """Fallback when no OpenAI: learned replies, then the compiled intent table (services/intents.json)."""
     m = message.lower().strip()
-    # Check learned similar questions first (simple keyword overlap)
-    for entry in reversed(_learned[-50:]):
-        if len(set(m.split()) & set(entry["user"].lower().split())) >= 2:
-            return entry["bot"], ChatAction(**entry["action"]) if entry.get("action") else None
-
-    # Upload
-    if any(w in m for w in ["upload", "add document", "submit", "invoice", "credit note"]):
-        return (
-            "To upload an invoice or credit note: go to **Upload** in the menu, choose a PDF or image file, then click Upload. "
-            "The system will extract vendor, amount, and other details automatically.",
-            ChatAction(type="navigate", path="/upload", label="Go to Upload"),
-        )
-    # Reports
-    if any(w in m for w in ["report", "export", "pdf", "excel", "filter", "spend"]):
-        return (
-            "**Reports** let you filter by date, vendor, status, and amount, and export as CSV, Excel, or PDF. "
-            "Open **Reports** from the menu, set your filters, and use the export buttons.",
-            ChatAction(type="navigate", path="/reports", label="Open Reports"),
-        )
-    # Approvals
-    if any(w in m for w in ["approv", "pending", "review", "reject", "workflow", "step"]):
-        return (
-            "The approval workflow has **3 steps**: Reviewer → Manager → Finance/Admin. "
-            "Go to **Approvals** to see pending documents and Approve or Reject. Your role determines which step you can act on.",
-            ChatAction(type="navigate", path="/approvals", label="Open Approvals"),
-        )
-    # Insights
-    if any(w in m for w in ["insight", "chart", "graph", "trend", "dashboard", "analytics"]):
-        return (
-            "**AI Insights** shows document counts, pie and line charts, spending insights, and anomalies. "
-            "Use it together with Reports for a full picture.",
-            ChatAction(type="navigate", path="/insights", label="Open AI Insights"),
-        )
-    # Dashboard / home
-    if any(w in m for w in ["home", "dashboard", "main", "overview"]):
-        return (
-            "The **Dashboard** shows an overview of documents, pending count, duplicates, recent documents, and quick links to Upload, Approvals, Reports, and AI Insights.",
-            ChatAction(type="navigate", path="/", label="Go to Dashboard"),
-        )
-    # Help / general
-    if any(w in m for w in ["help", "how", "what", "where", "start", "use"]):
-        return (
-            "I'm **Mambo**, your DMS assistant. You can:\n"
-            "• **Upload** invoices or credit notes (PDF/images)\n"
-            "• **Approvals** – 3-step workflow (Reviewer, Manager, Finance/Admin)\n"
-            "• **Reports** – filter and export CSV, Excel, PDF\n"
-            "• **AI Insights** – charts, trends, spending insights\n"
-            "Ask me things like: 'How do I upload?', 'Where are reports?', 'Explain approvals'.",
-            None,
-        )
-    # Greeting
-    if any(w in m for w in ["hi", "hello", "hey", "mambo"]):
-        return (
-            "Hi! I'm Mambo. I can help you use this Document Management System—uploading, approvals, reports, and insights. What would you like to do?",
-            None,
-        )
-    # Default: learn and suggest
-    return (
-        "I'm not sure about that. Try: 'How do I upload?', 'Where are reports?', or 'Explain the approval workflow.' I learn from your questions to get better!",
-        None,
-    )
+    # Check learned similar questions first (keyword overlap via the store's inverted index)
+    learned = learned_store.lookup(m)
+    if learned:
+        bot_reply, action = learned
+        return bot_reply, ChatAction(**action) if action else None
 
+    intent = classifier.classify(m)
+    if intent is None:
+        # Default: learn and suggest
+        return classifier.fallback, None
+    return intent.reply, ChatAction(**intent.action) if intent.action else None
 
-def _openai_reply(message: str, history: list[ChatMessage]) -> tuple[str, ChatAction | None]:
-    """Use OpenAI for thinking/reasoning when API key is set."""
-    if not settings.OPENAI_API_KEY:
-        return _rule_based_reply(message)
 
-    system = """You are Mambo, a helpful chatbot for a Document Management System (DMS). You help users:
+_SYSTEM_PROMPT = """You are Mambo, a helpful chatbot for a Document Management System (DMS). You help users:
 - Upload invoices and credit notes (PDF or images)
 - Use the 3-step approval workflow (Reviewer, Manager, Finance/Admin)
 - Run reports with filters (date, vendor, status, amount) and export CSV, Excel, PDF
@@ -125,39 +71,125 @@ ACTION: navigate /path
 Examples: ACTION: navigate /upload   or   ACTION: navigate /reports
 Only output ACTION when it clearly helps (e.g. user asks to upload, see reports, approvals, insights). Otherwise omit ACTION."""
 
+_MODEL = "gpt-4o-mini"
+_ACTION_MARKER = "ACTION:"
+
+
+def _build_messages(message: str, history: list[ChatMessage]) -> list[dict]:
+    messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
+    for h in history[-10:]:
+        messages.append({"role": h.role, "content": h.content})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+def _cache_context(history: list[ChatMessage]) -> str:
+    """Short history that scopes a cached reply: the previous user turn."""
+    return next((h.content for h in reversed(history) if h.role == "user"), "")
+
+
+def _cached_reply(message: str, history: list[ChatMessage]) -> tuple[str, ChatAction | None] | None:
+    hit = reply_cache.get(message, _cache_context(history))
+    if hit is None:
+        return None
+    reply, action = hit
+    return reply, ChatAction(**action) if action else None
+
+
+def _parse_action(rest: str) -> ChatAction | None:
+    """Parse the text after ACTION: (e.g. 'navigate /reports')."""
+    match = re.search(r"navigate\s+(\S+)", rest.strip(), re.I)
+    if match:
+        path = match.group(1).strip()
+        return ChatAction(type="navigate", path=path, label=f"Go to {path}")
+    return None
+
+
+class ActionTrailerParser:
+    """Splits a streamed reply into visible text and the trailing ACTION line.
+
+    feed() returns the text that is safe to show now; anything that might be the start of
+    the ACTION marker is held back until the next chunk decides it.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._reply = []
+        self._trailer: str | None = None
+
+    def feed(self, chunk: str) -> str:
+        if self._trailer is not None:
+            self._trailer += chunk
+            return ""
+        self._pending += chunk
+        idx = self._pending.find(_ACTION_MARKER)
+        if idx >= 0:
+            out, self._trailer = self._pending[:idx], self._pending[idx + len(_ACTION_MARKER):]
+            self._pending = ""
+        else:
+            # Hold back the longest suffix that is a prefix of the marker
+            hold = 0
+            for n in range(min(len(_ACTION_MARKER) - 1, len(self._pending)), 0, -1):
+                if _ACTION_MARKER.startswith(self._pending[-n:]):
+                    hold = n
+                    break
+            out = self._pending[:len(self._pending) - hold]
+            self._pending = self._pending[len(self._pending) - hold:]
+        self._reply.append(out)
+        return out
+
+    def finish(self) -> tuple[str, str, ChatAction | None]:
+        """Returns (text still to show, full reply, action)."""
+        out, self._pending = self._pending, ""
+        self._reply.append(out)
+        action = _parse_action(self._trailer) if self._trailer is not None else None
+        return out, "".join(self._reply).strip(), action
+
+
+_async_client = None
+
+
+def _get_async_client():
+    """One AsyncOpenAI client per process, so connections are pooled across requests."""
+    global _async_client
+    if _async_client is None:
+        import openai
+        _async_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+    return _async_client
+
+
+def _openai_reply(message: str, history: list[ChatMessage]) -> tuple[str, ChatAction | None]:
+    """Use OpenAI for thinking/reasoning when API key is set."""
+    if not settings.OPENAI_API_KEY:
+        return _rule_based_reply(message)
+    cached = _cached_reply(message, history)
+    if cached:
+        return cached
+
     try:
         import openai
         client = getattr(openai, "OpenAI", None)
         if client:
-            oai = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-            messages = [{"role": "system", "content": system}]
-            for h in history[-10:]:
-                messages.append({"role": h.role, "content": h.content})
-            messages.append({"role": "user", "content": message})
-            resp = oai.chat.completions.create(model="gpt-4o-mini", messages=messages, temperature=0.3)
+            oai = openai.OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+            with timed("chat_llm"):
+                resp = oai.chat.completions.create(model=_MODEL, messages=_build_messages(message, history), temperature=0.3)
             reply = resp.choices[0].message.content or ""
         else:
             # Older openai API
             openai.api_key = settings.OPENAI_API_KEY
-            messages = [{"role": "system", "content": system}]
-            for h in history[-10:]:
-                messages.append({"role": h.role, "content": h.content})
-            messages.append({"role": "user", "content": message})
-            resp = openai.ChatCompletion.create(model="gpt-4o-mini", messages=messages, temperature=0.3)
+            resp = openai.ChatCompletion.create(model=_MODEL, messages=_build_messages(message, history), temperature=0.3)
             reply = resp.choices[0].message.content or ""
     except Exception:
         return _rule_based_reply(message)
 
     # Parse ACTION: navigate /path
     action = None
-    if "ACTION:" in reply:
-        reply, rest = reply.split("ACTION:", 1)
+    if _ACTION_MARKER in reply:
+        reply, rest = reply.split(_ACTION_MARKER, 1)
         reply = reply.strip()
-        match = re.search(r"navigate\s+(\S+)", rest.strip(), re.I)
-        if match:
-            path = match.group(1).strip()
-            action = ChatAction(type="navigate", path=path, label=f"Go to {path}")
+        action = _parse_action(rest)
 
+    reply_cache.set(message, _cache_context(history), reply, action.model_dump() if action else None)
     return reply, action
 
 
@@ -167,3 +199,76 @@ def chat(req: ChatRequest, current_user=Depends(get_current_user)):
     reply, action = _openai_reply(req.message, req.history)
     _learn(req.message, reply, action.model_dump() if action else None)
     return ChatResponse(reply=reply, action=action)
+
+
+@router.get("/cache-stats")
+def chat_cache_stats(_admin=Depends(require_role(["admin"]))):
+    """Hit rate and size of the semantic reply cache in this worker."""
+    return reply_cache.stats()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(req: ChatRequest, request: Request, current_user=Depends(get_stream_user)):
+    """Like POST /chat/, but streams the reply as server-sent events.
+
+    Events: `token` ({"text"}) as the reply is generated, then `done` ({"reply", "action"}).
+    The upstream LLM request is cancelled if the client disconnects.
+    """
+
+    async def events():
+        cached = _cached_reply(req.message, req.history) if settings.OPENAI_API_KEY else None
+        if not settings.OPENAI_API_KEY:
+            reply, action = await run_in_threadpool(_rule_based_reply, req.message)
+            yield _sse("token", {"text": reply})
+        elif cached:
+            reply, action = cached
+            yield _sse("token", {"text": reply})
+        else:
+            parser = ActionTrailerParser()
+            stream = None
+            shown = False
+            started = time.perf_counter()
+            try:
+                stream = await _get_async_client().chat.completions.create(
+                    model=_MODEL, messages=_build_messages(req.message, req.history), temperature=0.3, stream=True,
+                )
+                async for chunk in stream:
+                    if await request.is_disconnected():
+                        return
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    text = parser.feed(delta or "")
+                    if text:
+                        if not shown:
+                            STAGE_LATENCY.observe(time.perf_counter() - started, stage="chat_llm_first_token")
+                        shown = True
+                        yield _sse("token", {"text": text})
+                text, reply, action = parser.finish()
+                if text:
+                    yield _sse("token", {"text": text})
+                STAGE_LATENCY.observe(time.perf_counter() - started, stage="chat_llm")
+                reply_cache.set(
+                    req.message, _cache_context(req.history), reply, action.model_dump() if action else None,
+                )
+            except Exception:
+                if shown:
+                    # Partial reply already shown; end it rather than switching answers mid-stream
+                    raise
+                reply, action = await run_in_threadpool(_rule_based_reply, req.message)
+                yield _sse("token", {"text": reply})
+            finally:
+                if stream is not None:
+                    # Closes the upstream HTTP response, which cancels generation on disconnect
+                    await stream.close()
+        action_dict = action.model_dump() if action else None
+        await run_in_threadpool(_learn, req.message, reply, action_dict)
+        yield _sse("done", {"reply": reply, "action": action_dict})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
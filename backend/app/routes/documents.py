@@ -1,29 +1,73 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import case, func, insert, literal, tuple_, update
+from sqlalchemy.orm import Session, defer, selectinload
+from datetime import datetime
+import base64
+import mimetypes
 import os
+import shutil
+import uuid
+import zipfile
+from urllib.parse import quote
 from ..dependencies import get_db
-from ..auth import get_current_user
+from ..auth import get_current_user, get_current_user_allow_query
 from .. import schemas
-from ..model import Document, DocumentStatus, Approval
-from ..services.extractor import process_document_file
+from ..model import Document, DocumentStatus, Approval, User
+from ..services.extractor import process_document_batch, process_document_file, run_extraction
+from ..services.cache import bump_document_version, etag_matches
+from ..services.events import publish_event
+from ..services.files import (
+    archived_path, generate_thumbnails, gzip_size, iter_gzip, local_original, original_path, thumbnail_path,
+)
+from ..services.search import search_documents
 from ..config import settings
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+# Exactly 3 approval stages per spec: Step 1=Reviewer, Step 2=Manager, Step 3=Finance/Admin
+# Viewer can do step 1 so default-registered users can use Approvals; admin can do any step
+STEP_ALLOWED_ROLES = {1: ["reviewer", "viewer"], 2: ["manager", "approver"], 3: ["admin"]}
+MAX_BULK_APPROVALS = 1000
+ALLOWED_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg")
+
+
+def _can_act(role: str, step: int) -> bool:
+    return role == "admin" or role in STEP_ALLOWED_ROLES.get(step, ["admin"])
+
+
+def _publish_approval(doc_id: int, step: int, status: DocumentStatus, current_step: int):
+    event_type = status.value if status != DocumentStatus.pending else "step_approved"
+    publish_event(event_type, doc_id, step=step, status=status.value, current_step=current_step)
+
+
+def _encode_cursor(doc: Document) -> str:
+    raw = f"{doc.created_at.isoformat()}|{doc.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, doc_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.post("/upload", response_model=schemas.DocumentOut)
-async def upload_document(
+def upload_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     _user=Depends(get_current_user),
 ):
-    if not file.filename.lower().endswith((".pdf", ".png", ".jpg", ".jpeg")):
+    # A plain def, like upload_batch: the file write, the commit and the Redis calls
+    # (version bump, event) all block, so they run in the threadpool rather than on the event loop
+    if not file.filename.lower().endswith(ALLOWED_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Only invoices and credit notes (PDF or image) are allowed")
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     saved_path = os.path.join(settings.UPLOAD_DIR, f"{int(os.times().system)}_{file.filename}")
-    contents = await file.read()
     with open(saved_path, "wb") as f:
-        f.write(contents)
+        shutil.copyfileobj(file.file, f, 1 << 20)
     doc = Document(
         filename=os.path.basename(saved_path),
         status=DocumentStatus.pending,
@@ -32,9 +76,163 @@ async def upload_document(
     db.add(doc)
     db.commit()
     db.refresh(doc)
-    background_tasks.add_task(process_document_file, doc.id, saved_path)
+    bump_document_version()
+    publish_event("uploaded", doc.id, filename=doc.filename)
+    background_tasks.add_task(run_extraction, process_document_file, doc.id, saved_path)
     return doc
 
+class _BatchTooLarge(Exception):
+    pass
+
+
+def _copy_limited(src, dst, limit: int) -> int:
+    """Copy in 1 MiB chunks; raise _BatchTooLarge once more than `limit` bytes were read."""
+    written = 0
+    while chunk := src.read(1 << 20):
+        written += len(chunk)
+        if written > limit:
+            raise _BatchTooLarge()
+        dst.write(chunk)
+    return written
+
+
+def _iter_batch_entries(files: list[UploadFile]):
+    """Yield (filename, archive, stream, error) per uploaded file, opening ZIP members one at a time."""
+    for upload in files:
+        name = os.path.basename(upload.filename or "")
+        if not name.lower().endswith(".zip"):
+            yield name, None, upload.file, None
+            continue
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile:
+            yield name, None, None, "Not a valid ZIP archive"
+            continue
+        with archive:
+            for info in archive.infolist():
+                member = os.path.basename(info.filename)
+                if info.is_dir() or not member or member.startswith(".") or info.filename.startswith("__MACOSX/"):
+                    continue
+                if info.flag_bits & 0x1:
+                    yield member, name, None, "Encrypted ZIP entries are not supported"
+                    continue
+                with archive.open(info) as stream:
+                    yield member, name, stream, None
+
+
+@router.post("/upload/batch", response_model=schemas.BatchUploadOut)
+def upload_batch(
+    background_tasks: BackgroundTasks,
+    files: list[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    """Ingest several files and/or ZIP archives as one batch: one INSERT, one commit, one extraction task."""
+    batch_id = uuid.uuid4().hex
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    results: list[schemas.BatchUploadItem] = []
+    accepted: list[tuple[schemas.BatchUploadItem, str]] = []
+    budget = settings.BATCH_UPLOAD_MAX_BYTES
+    try:
+        for name, archive, stream, error in _iter_batch_entries(files):
+            item = schemas.BatchUploadItem(filename=name, archive=archive)
+            results.append(item)
+            if error is None and not name.lower().endswith(ALLOWED_EXTENSIONS):
+                error = "Only invoices and credit notes (PDF or image) are allowed"
+            if error is None and len(accepted) >= settings.BATCH_UPLOAD_MAX_FILES:
+                error = f"Batch is limited to {settings.BATCH_UPLOAD_MAX_FILES} files"
+            if error is not None:
+                item.error = error
+                continue
+            saved_path = os.path.join(settings.UPLOAD_DIR, f"{batch_id[:12]}_{len(accepted)}_{name}")
+            try:
+                with open(saved_path, "wb") as out:
+                    budget -= _copy_limited(stream, out, budget)
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError, EOFError) as exc:
+                # Corrupt or unsupported member (bad CRC, unknown compression): skip just this entry
+                os.remove(saved_path)
+                item.error = f"Could not read file from archive: {exc}"
+                continue
+            except _BatchTooLarge:
+                os.remove(saved_path)
+                raise
+            accepted.append((item, saved_path))
+    except _BatchTooLarge:
+        for _, path in accepted:
+            os.remove(path)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.BATCH_UPLOAD_MAX_BYTES // (1024 * 1024)} MB once extracted",
+        )
+
+    if accepted:
+        rows = [
+            {
+                "filename": os.path.basename(path),
+                "status": DocumentStatus.pending,
+                "current_step": 1,
+                "batch_id": batch_id,
+            }
+            for _, path in accepted
+        ]
+        dialect = db.get_bind().dialect
+        if getattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False):
+            # One multi-row INSERT ... RETURNING id, ids in the same order as rows
+            ids = db.scalars(insert(Document).returning(Document.id, sort_by_parameter_order=True), rows).all()
+        else:
+            docs = [Document(**row) for row in rows]
+            db.add_all(docs)
+            db.flush()
+            ids = [d.id for d in docs]
+        db.commit()
+        bump_document_version()
+        for (item, path), doc_id in zip(accepted, ids):
+            item.id = doc_id
+            publish_event("uploaded", doc_id, filename=os.path.basename(path), batch_id=batch_id)
+        background_tasks.add_task(run_extraction, process_document_batch, [(doc_id, path) for (_, path), doc_id in zip(accepted, ids)])
+    elif not results:
+        raise HTTPException(status_code=400, detail="No files in upload")
+
+    return schemas.BatchUploadOut(
+        batch_id=batch_id,
+        accepted=len(accepted),
+        rejected=len(results) - len(accepted),
+        files=results,
+    )
+
+
+@router.get("/batch/{batch_id}", response_model=schemas.BatchStatusOut)
+def batch_status(batch_id: str, db: Session = Depends(get_db), _user=Depends(get_current_user)):
+    """Progress of a batch upload: per-document state and how many have been through extraction."""
+    docs = (
+        db.query(Document)
+        .options(defer(Document.raw_text))
+        .filter(Document.batch_id == batch_id)
+        .order_by(Document.id)
+        .all()
+    )
+    if not docs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    processed = (
+        db.query(func.count(Document.id))
+        .filter(
+            Document.batch_id == batch_id,
+            Document.raw_text.isnot(None) | Document.text_archived_at.isnot(None),
+        )
+        .scalar()
+    )
+    status_counts: dict[str, int] = {}
+    for d in docs:
+        status_counts[d.status.value] = status_counts.get(d.status.value, 0) + 1
+    return {
+        "batch_id": batch_id,
+        "total": len(docs),
+        "processed": processed,
+        "status_counts": status_counts,
+        "documents": docs,
+    }
+
+
 @router.get("/", response_model=list[schemas.DocumentOut])
 def list_documents(skip: int = 0, limit: int = 50, db: Session = Depends(get_db), _user=Depends(get_current_user)):
     docs = (
@@ -46,6 +244,52 @@ def list_documents(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)
     )
     return docs
 
+@router.get("/inbox", response_model=schemas.InboxOut)
+def approval_inbox(
+    step: int | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Pending documents at the steps the current user's role can act on, oldest first.
+
+    Pass the returned next_cursor to get the following page; counts are per step.
+    """
+    steps = [s for s in STEP_ALLOWED_ROLES if _can_act(current_user.role.value, s)]
+    if step is not None:
+        steps = [s for s in steps if s == step]
+    limit = max(1, min(limit, 200))
+    base = db.query(Document).filter(Document.status == DocumentStatus.pending, Document.current_step.in_(steps))
+    counts = dict(
+        base.with_entities(Document.current_step, func.count(Document.id))
+        .group_by(Document.current_step)
+        .all()
+    )
+    query = base
+    if cursor:
+        created_at, doc_id = _decode_cursor(cursor)
+        query = query.filter(tuple_(Document.created_at, Document.id) > tuple_(created_at, doc_id))
+    docs = query.order_by(Document.created_at, Document.id).limit(limit + 1).all()
+    next_cursor = _encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {
+        "items": docs[:limit],
+        "counts": {s: counts.get(s, 0) for s in steps},
+        "next_cursor": next_cursor,
+    }
+
+@router.get("/search", response_model=list[schemas.SearchHit])
+def search(q: str, skip: int = 0, limit: int = 20, db: Session = Depends(get_db), _user=Depends(get_current_user)):
+    """Full-text search across OCR text, vendor and invoice number; snippets mark matches with <mark>."""
+    limit = max(1, min(limit, 100))
+    hits = search_documents(db, q, limit=limit, skip=skip)
+    docs = {d.id: d for d in db.query(Document).filter(Document.id.in_([h[0] for h in hits]))}
+    return [
+        {"document": docs[doc_id], "rank": rank, "snippet": snippet}
+        for doc_id, rank, snippet in hits
+        if doc_id in docs
+    ]
+
 @router.get("/{doc_id}", response_model=schemas.DocumentOut)
 def get_document(doc_id: int, db: Session = Depends(get_db), _user=Depends(get_current_user)):
     doc = db.query(Document).get(doc_id)
@@ -53,26 +297,267 @@ def get_document(doc_id: int, db: Session = Depends(get_db), _user=Depends(get_c
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
 
+
+@router.get("/{doc_id}/timeline", response_model=schemas.DocumentTimelineOut)
+def document_timeline(doc_id: int, db: Session = Depends(get_db), _user=Depends(get_current_user)):
+    """A document with its approval history, oldest first: two queries however long the history is."""
+    doc = (
+        db.query(Document)
+        .options(
+            defer(Document.raw_text),
+            selectinload(Document.approvals).joinedload(Approval.approver).load_only(User.email),
+        )
+        .filter(Document.id == doc_id)
+        .first()
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {
+        "document": doc,
+        "approvals": [
+            {
+                "id": a.id,
+                "step": a.step,
+                "action": a.action,
+                "comment": a.comment,
+                "timestamp": a.timestamp,
+                "approver_id": a.approver_id,
+                "approver_email": a.approver.email if a.approver else None,
+            }
+            for a in doc.approvals
+        ],
+    }
+
+
+def _file_response(request: Request, path: str, max_age: int, filename: str | None = None, inline: bool = True):
+    """FileResponse (Range, If-Range) plus If-None-Match -> 304.
+
+    The file is streamed in chunks; it is only handed off zero-copy on servers that advertise the
+    http.response.pathsend extension, which uvicorn does not.
+    """
+    response = FileResponse(
+        path,
+        stat_result=os.stat(path),
+        filename=filename,
+        content_disposition_type="inline" if inline else "attachment",
+        headers={"Cache-Control": f"private, max-age={max_age}"},
+    )
+    etag = response.headers["etag"]
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": response.headers["cache-control"]})
+    return response
+
+
+def _gzip_file_response(request: Request, path: str, max_age: int, filename: str, inline: bool = True):
+    """An original gzipped in the cold store, decompressed as it streams (no Range support)."""
+    stat = os.stat(path)
+    headers = {"ETag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', "Cache-Control": f"private, max-age={max_age}"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # Same Content-Disposition as FileResponse builds
+    quoted = quote(filename)
+    disposition = "inline" if inline else "attachment"
+    if quoted != filename:
+        headers["Content-Disposition"] = f"{disposition}; filename*=utf-8''{quoted}"
+    else:
+        headers["Content-Disposition"] = f'{disposition}; filename="{filename}"'
+    headers["Content-Length"] = str(gzip_size(path))
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return StreamingResponse(iter_gzip(path), media_type=media_type, headers=headers)
+
+
+@router.get("/{doc_id}/file")
+def get_document_file(
+    doc_id: int,
+    request: Request,
+    download: bool = False,
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user_allow_query),
+):
+    """The uploaded original, hot or archived. Supports Range requests unless gzipped in the cold store;
+    ?access_token= works for <iframe>/<img>."""
+    filename = db.query(Document.filename).filter(Document.id == doc_id).scalar()
+    if filename is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    path = original_path(filename) or archived_path(filename)
+    if not path:
+        raise HTTPException(status_code=404, detail="File not found")
+    if path.endswith(".gz"):
+        return _gzip_file_response(request, path, max_age=3600, filename=filename, inline=not download)
+    return _file_response(request, path, max_age=3600, filename=filename, inline=not download)
+
+
+@router.get("/{doc_id}/thumbnail")
+def get_document_thumbnail(
+    doc_id: int,
+    request: Request,
+    page: int = 1,
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user_allow_query),
+):
+    """JPEG preview of a page, made during extraction or here on first request."""
+    if not 1 <= page <= settings.THUMBNAIL_MAX_PAGES:
+        raise HTTPException(status_code=404, detail="No thumbnail for this page")
+    filename = db.query(Document.filename).filter(Document.id == doc_id).scalar()
+    if filename is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    path = thumbnail_path(doc_id, page)
+    if not os.path.isfile(path):
+        with local_original(filename) as source:
+            if not source:
+                raise HTTPException(status_code=404, detail="File not found")
+            try:
+                generate_thumbnails(doc_id, source)
+            except Exception:
+                raise HTTPException(status_code=404, detail="Preview not available")
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="No thumbnail for this page")
+    # Thumbnails only change if the original does, which it never does
+    return _file_response(request, path, max_age=86400)
+
 @router.post("/{doc_id}/approve")
-def approve_document(doc_id: int, action: str, comment: str = "", db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def approve_document(
+    doc_id: int,
+    action: str,
+    comment: str = "",
+    version: int | None = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
     doc = db.query(Document).get(doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    # Exactly 3 approval stages per spec: Step 1=Reviewer, Step 2=Manager, Step 3=Finance/Admin
-    # Viewer can do step 1 so default-registered users can use Approvals; admin can do any step
-    step_allowed_roles = {1: ["reviewer", "viewer"], 2: ["manager", "approver"], 3: ["admin"]}
-    allowed = step_allowed_roles.get(doc.current_step, ["admin"])
-    if current_user.role.value not in allowed and current_user.role.value != "admin":
+    # Clients may send the version they were shown, so acting on a stale view is refused too
+    if version is not None and version != doc.version:
+        raise HTTPException(status_code=409, detail="Document was changed by someone else, reload and try again")
+    if doc.status != DocumentStatus.pending:
+        raise HTTPException(status_code=409, detail=f"Document is already {doc.status.value}")
+    if not _can_act(current_user.role.value, doc.current_step):
         raise HTTPException(status_code=403, detail="Not authorized for this step")
-    approval = Approval(document_id=doc.id, step=doc.current_step, approver_id=current_user.id, action=action, comment=comment)
-    db.add(approval)
+    step = doc.current_step
+    values = {Document.version: Document.version + 1}
     if action == "approve":
-        if doc.current_step >= 3:
-            doc.status = DocumentStatus.approved
+        if step >= 3:
+            values[Document.status] = DocumentStatus.approved
         else:
-            doc.current_step += 1
+            values[Document.current_step] = step + 1
     else:
-        doc.status = DocumentStatus.rejected
+        values[Document.status] = DocumentStatus.rejected
+    # Compare-and-swap: UPDATE ... WHERE id=? AND version=? only matches if nobody
+    # moved the document since we read it, so concurrent approvers cannot double-approve a step
+    updated = (
+        db.query(Document)
+        .filter(Document.id == doc.id, Document.version == doc.version)
+        .update(values, synchronize_session=False)
+    )
+    if not updated:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Document was changed by someone else, reload and try again")
+    db.add(Approval(document_id=doc.id, step=step, approver_id=current_user.id, action=action, comment=comment))
     db.commit()
     db.refresh(doc)
-    return {"status": doc.status.value, "current_step": doc.current_step}
+    bump_document_version()
+    _publish_approval(doc.id, step, doc.status, doc.current_step)
+    return {"status": doc.status.value, "current_step": doc.current_step, "version": doc.version}
+
+@router.post("/bulk-approve", response_model=schemas.BulkApprovalOut)
+def bulk_approve_documents(
+    req: schemas.BulkApprovalRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Approve or reject many documents at once; returns an outcome per document id."""
+    if req.action not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="action must be 'approve' or 'reject'")
+    doc_ids = list(dict.fromkeys(req.document_ids))
+    if len(doc_ids) > MAX_BULK_APPROVALS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_APPROVALS} documents per request")
+
+    # One query for eligibility: state, step and version of every requested document
+    rows = {
+        r.id: r
+        for r in db.query(Document.id, Document.status, Document.current_step, Document.version)
+        .filter(Document.id.in_(doc_ids))
+    }
+    errors = {}
+    eligible = []
+    for doc_id in doc_ids:
+        r = rows.get(doc_id)
+        if r is None:
+            errors[doc_id] = "Document not found"
+        elif r.status != DocumentStatus.pending:
+            errors[doc_id] = f"Document is already {r.status.value}"
+        elif not _can_act(current_user.role.value, r.current_step):
+            errors[doc_id] = "Not authorized for this step"
+        else:
+            eligible.append(r)
+
+    done = set()
+    if eligible:
+        # One set-based compare-and-swap over (id, version) pairs, same rule as approve_document
+        stmt = (
+            update(Document)
+            .where(
+                tuple_(Document.id, Document.version).in_([(r.id, r.version) for r in eligible]),
+                Document.status == DocumentStatus.pending,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if req.action == "approve":
+            final = Document.current_step >= 3
+            stmt = stmt.values(
+                status=case((final, literal(DocumentStatus.approved, Document.status.type)), else_=Document.status),
+                current_step=case((final, Document.current_step), else_=Document.current_step + 1),
+                version=Document.version + 1,
+            )
+        else:
+            stmt = stmt.values(status=DocumentStatus.rejected, version=Document.version + 1)
+        if db.get_bind().dialect.update_returning:
+            done = set(db.scalars(stmt.returning(Document.id)))
+        elif db.execute(stmt).rowcount == len(eligible):
+            done = {r.id for r in eligible}
+        else:
+            # Without RETURNING we cannot tell which rows lost the race, so apply none of them
+            db.rollback()
+        for r in eligible:
+            if r.id not in done:
+                errors[r.id] = "Document was changed by someone else, reload and try again"
+        if done:
+            db.execute(
+                insert(Approval),
+                [
+                    {
+                        "document_id": r.id,
+                        "step": r.current_step,
+                        "approver_id": current_user.id,
+                        "action": req.action,
+                        "comment": req.comment,
+                    }
+                    for r in eligible
+                    if r.id in done
+                ],
+            )
+        db.commit()
+        if done:
+            bump_document_version()
+
+    results = []
+    for doc_id in doc_ids:
+        if doc_id in errors:
+            results.append(schemas.BulkApprovalItem(id=doc_id, ok=False, error=errors[doc_id]))
+            continue
+        step = rows[doc_id].current_step
+        if req.action == "reject":
+            status, next_step = DocumentStatus.rejected, step
+        elif step >= 3:
+            status, next_step = DocumentStatus.approved, step
+        else:
+            status, next_step = DocumentStatus.pending, step + 1
+        _publish_approval(doc_id, step, status, next_step)
+        results.append(schemas.BulkApprovalItem(id=doc_id, ok=True, status=status.value, current_step=next_step))
+    return schemas.BulkApprovalOut(
+        action=req.action,
+        succeeded=len(done),
+        failed=len(doc_ids) - len(done),
+        results=results,
+    )
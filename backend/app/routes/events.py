@@ -0,0 +1,42 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from ..auth import get_stream_user_allow_query
+from ..services.events import broker
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+_KEEPALIVE_SECONDS = 15
+
+
+@router.get("/stream")
+async def document_events(
+    request: Request,
+    document_id: int | None = None,
+    _user=Depends(get_stream_user_allow_query),
+):
+    """Server-sent events for document processing and approval status (optionally for one document)."""
+    queue = broker.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if document_id is not None and event.get("document_id") != document_id:
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,28 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
 from ..dependencies import get_db
 from ..auth import get_current_user
-from ..model import Document, DocumentStatus
+from ..config import settings
+from ..model import Approval, Document, DocumentStatus, User, Vendor, VendorStats
+from ..services.anomaly import typical_amount
+from ..services.cache import etag_matches, report_cache
+from ..services.metrics import REPORT_CACHE
+from ..services.vendors import vendor_index, vendor_key
 from datetime import datetime
 import io
 import json
-import math
-import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback; ~50x slower on the large insights payload
+    orjson = None
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
+def _normalise_filters(
+    start=None, end=None, vendor=None, status=None,
+    amount_min=None, amount_max=None, vendor_id=None,
+) -> dict:
+    """Canonical filter dict: equivalent requests share one cache key."""
+    status = (status or "").strip().lower()
+    return {
+        "start": (start or "").strip() or None,
+        "end": (end or "").strip() or None,
+        # vendor is matched on normalised spellings, so case and punctuation do not change the result
+        "vendor": vendor_key(vendor),
+        "vendor_id": vendor_id,
+        "status": status if status in ("pending", "approved", "rejected") else None,
+        "amount_min": amount_min,
+        "amount_max": amount_max,
+    }
+
+
+def encode_json(data) -> bytes:
+    """Compact UTF-8 JSON for a report body.
+
+    orjson handles datetimes, enums and tuples natively, so the jsonable_encoder pass (most of
+    the cost on large reports) only runs in the stdlib fallback.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(data),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _cached_json(request: Request, name: str, params: dict, build) -> Response:
+    """Serve a report from the cache (or build and store it), honouring If-None-Match."""
+    key = report_cache.make_key(name, params)
+    entry = report_cache.get(key)
+    REPORT_CACHE.inc(result="miss" if entry is None else "hit")
+    if entry is None:
+        entry = report_cache.set(key, encode_json(build()))
+    etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 def _apply_filters(
     query, start=None, end=None, vendor=None, status=None,
-    amount_min=None, amount_max=None,
+    amount_min=None, amount_max=None, vendor_id=None,
 ):
     if start:
         query = query.filter(Document.created_at >= datetime.fromisoformat(start))
     if end:
         query = query.filter(Document.created_at <= datetime.fromisoformat(end))
     if vendor:
-        query = query.filter(Document.vendor.ilike(f"%{vendor}%"))
+        # Vendors with a spelling containing the text, from the in-memory index; then an indexed IN
+        query = query.filter(Document.vendor_id.in_(vendor_index.match(query.session, vendor)))
+    if vendor_id is not None:
+        query = query.filter(Document.vendor_id == vendor_id)
     if status and status.strip().lower() in ("pending", "approved", "rejected"):
         query = query.filter(Document.status == DocumentStatus(status.strip().lower()))
     if amount_min is not None:
@@ -32,52 +93,99 @@ def _apply_filters(
     return query
 
 
+def _spend_by_vendor(query, limit: int | None = None) -> list[tuple[str, float]]:
+    """(vendor name, total amount) pairs, largest first, grouped on vendor_id; query is filtered Documents."""
+    doc_ids = query.with_entities(Document.id).subquery()
+    total = func.coalesce(func.sum(Document.amount), 0)
+    rows = (
+        query.session.query(func.coalesce(Vendor.name, "Unknown"), total)
+        .select_from(Document)
+        .join(doc_ids, doc_ids.c.id == Document.id)
+        .outerjoin(Vendor, Vendor.id == Document.vendor_id)
+        .group_by(Document.vendor_id, Vendor.name)
+        .order_by(total.desc())
+    )
+    if limit:
+        rows = rows.limit(limit)
+    return [(name, float(amount)) for name, amount in rows]
+
+
+def _anomalies(query, limit: int) -> list[dict]:
+    """Documents scored as unusual for their vendor (services/anomaly.py), highest score first.
+
+    query is filtered Documents; this is a range scan on the anomaly_score index.
+    """
+    rows = (
+        query.filter(Document.anomaly_score >= settings.ANOMALY_SCORE_THRESHOLD)
+        .outerjoin(VendorStats, VendorStats.vendor_id == Document.vendor_id)
+        .outerjoin(Vendor, Vendor.id == Document.vendor_id)
+        .with_entities(
+            Document.id, Document.filename, Document.vendor, Document.amount, Document.anomaly_score,
+            Document.created_at, Vendor.name.label("vendor_name"), VendorStats.mean.label("vendor_mean"),
+        )
+        .order_by(Document.anomaly_score.desc(), Document.id.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "id": r.id,
+            "filename": r.filename,
+            "vendor": r.vendor_name or r.vendor,
+            "amount": r.amount,
+            "anomaly_score": r.anomaly_score,
+            # The vendor's typical amount now, for context
+            "vendor_typical_amount": typical_amount(r.vendor_mean) if r.vendor_mean is not None else None,
+            "created_at": r.created_at,
+        }
+        for r in rows
+    ]
+
+
 @router.get("/spend-summary")
 def spend_summary(
+    request: Request,
     start: str | None = None,
     end: str | None = None,
     vendor: str | None = None,
     status: str | None = None,
     amount_min: float | None = None,
     amount_max: float | None = None,
+    vendor_id: int | None = None,
     db: Session = Depends(get_db),
     _current_user=Depends(get_current_user),
 ):
-    """Spend summary with filters: date range, vendor, approval status, amount."""
-    query = _apply_filters(
-        db.query(Document), start, end, vendor, status, amount_min, amount_max
-    )
-    rows = query.all()
-    total = sum(r.amount or 0 for r in rows)
-    count = len(rows)
-    top_vendors = {}
-    for r in rows:
-        v = r.vendor or "Unknown"
-        top_vendors[v] = top_vendors.get(v, 0) + (r.amount or 0)
-    top_vendors_sorted = sorted(top_vendors.items(), key=lambda x: x[1], reverse=True)[:10]
-    return {"total": total, "count": count, "top_vendors": top_vendors_sorted}
+    """Spend summary with filters: date range, vendor (name or vendor_id), approval status, amount."""
+    params = _normalise_filters(start, end, vendor, status, amount_min, amount_max, vendor_id)
+
+    def build():
+        query = _apply_filters(db.query(Document), **params)
+        count, total = query.with_entities(func.count(Document.id), func.coalesce(func.sum(Document.amount), 0)).one()
+        return {"total": float(total), "count": count, "top_vendors": _spend_by_vendor(query, limit=10)}
+
+    return _cached_json(request, "spend-summary", params, build)
 
 
 @router.get("/vendor-analysis")
 def vendor_analysis(
+    request: Request,
     start: str | None = None,
     end: str | None = None,
     status: str | None = None,
     db: Session = Depends(get_db),
     _current_user=Depends(get_current_user),
 ):
-    """Vendor analysis: spend by vendor."""
-    query = _apply_filters(db.query(Document), start=start, end=end, status=status)
-    rows = query.all()
-    by_vendor = {}
-    for r in rows:
-        v = r.vendor or "Unknown"
-        by_vendor[v] = by_vendor.get(v, 0) + (r.amount or 0)
-    return {"vendors": sorted(by_vendor.items(), key=lambda x: x[1], reverse=True)}
+    """Vendor analysis: spend by vendor, with spelling variants counted as one vendor."""
+    params = _normalise_filters(start=start, end=end, status=status)
+
+    def build():
+        return {"vendors": _spend_by_vendor(_apply_filters(db.query(Document), **params))}
+
+    return _cached_json(request, "vendor-analysis", params, build)
 
 
 @router.get("/tax-vat-report")
 def tax_vat_report(
+    request: Request,
     start: str | None = None,
     end: str | None = None,
     vendor: str | None = None,
@@ -85,19 +193,24 @@ def tax_vat_report(
     _current_user=Depends(get_current_user),
 ):
     """Tax/VAT report: amounts and VAT by document."""
-    query = _apply_filters(db.query(Document), start=start, end=end, vendor=vendor)
-    rows = query.all()
-    total_amount = sum(r.amount or 0 for r in rows)
-    total_vat = sum(r.vat or 0 for r in rows)
-    items = [
-        {"vendor": r.vendor, "invoice_number": r.invoice_number, "amount": r.amount, "vat": r.vat}
-        for r in rows
-    ]
-    return {"total_amount": total_amount, "total_vat": total_vat, "items": items}
+    params = _normalise_filters(start=start, end=end, vendor=vendor)
+
+    def build():
+        rows = _apply_filters(db.query(Document), **params).all()
+        total_amount = sum(r.amount or 0 for r in rows)
+        total_vat = sum(r.vat or 0 for r in rows)
+        items = [
+            {"vendor": r.vendor, "invoice_number": r.invoice_number, "amount": r.amount, "vat": r.vat}
+            for r in rows
+        ]
+        return {"total_amount": total_amount, "total_vat": total_vat, "items": items}
+
+    return _cached_json(request, "tax-vat-report", params, build)
 
 
 @router.get("/list")
 def report_list(
+    request: Request,
     start: str | None = None,
     end: str | None = None,
     vendor: str | None = None,
@@ -106,27 +219,125 @@ def report_list(
     amount_max: float | None = None,
     skip: int = 0,
     limit: int = 100,
+    vendor_id: int | None = None,
     db: Session = Depends(get_db),
     _current_user=Depends(get_current_user),
 ):
     """List documents with filters for reporting."""
-    query = _apply_filters(
-        db.query(Document), start, end, vendor, status, amount_min, amount_max
+    params = _normalise_filters(start, end, vendor, status, amount_min, amount_max, vendor_id)
+
+    def build():
+        query = _apply_filters(db.query(Document), **params)
+        rows = query.offset(skip).limit(limit).all()
+        return [
+            {
+                "id": r.id,
+                "filename": r.filename,
+                "vendor": r.vendor,
+                "invoice_number": r.invoice_number,
+                "date": r.date.isoformat() if r.date else None,
+                "amount": r.amount,
+                "vat": r.vat,
+                "status": r.status.value,
+            }
+            for r in rows
+        ]
+
+    return _cached_json(request, "list", {**params, "skip": skip, "limit": limit}, build)
+
+
+@router.get("/anomalies")
+def anomalies_report(
+    request: Request,
+    start: str | None = None,
+    end: str | None = None,
+    vendor: str | None = None,
+    status: str | None = None,
+    vendor_id: int | None = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    _current_user=Depends(get_current_user),
+):
+    """Documents with amounts unusual for their vendor, most unusual first."""
+    limit = max(1, min(limit, 500))
+    params = _normalise_filters(start=start, end=end, vendor=vendor, status=status, vendor_id=vendor_id)
+    return _cached_json(
+        request, "anomalies", {**params, "limit": limit},
+        lambda: {
+            "threshold": settings.ANOMALY_SCORE_THRESHOLD,
+            "items": _anomalies(_apply_filters(db.query(Document), **params), limit),
+        },
     )
-    rows = query.offset(skip).limit(limit).all()
-    return [
-        {
-            "id": r.id,
-            "filename": r.filename,
-            "vendor": r.vendor,
-            "invoice_number": r.invoice_number,
-            "date": r.date.isoformat() if r.date else None,
-            "amount": r.amount,
-            "vat": r.vat,
-            "status": r.status.value,
-        }
-        for r in rows
-    ]
+
+
+@router.get("/approvals")
+def approvals_audit(
+    request: Request,
+    approver_id: int | None = None,
+    step: int | None = None,
+    action: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    _current_user=Depends(get_current_user),
+):
+    """Approvals audit: who approved or rejected which document, newest first.
+
+    Filters: approver, step, action (approve/reject) and a date range on when it happened. Approver
+    emails and document fields are joined in, so a page is one query whatever its size.
+    """
+    limit = max(1, min(limit, 1000))
+    action = (action or "").strip().lower()
+    params = {
+        "approver_id": approver_id,
+        "step": step,
+        "action": action if action in ("approve", "reject") else None,
+        "start": (start or "").strip() or None,
+        "end": (end or "").strip() or None,
+        "skip": skip,
+        "limit": limit,
+    }
+
+    def build():
+        query = db.query(Approval).options(
+            joinedload(Approval.approver).load_only(User.email),
+            joinedload(Approval.document).load_only(
+                Document.filename, Document.vendor, Document.invoice_number, Document.amount, Document.status,
+            ),
+        )
+        if params["approver_id"] is not None:
+            query = query.filter(Approval.approver_id == params["approver_id"])
+        if params["step"] is not None:
+            query = query.filter(Approval.step == params["step"])
+        if params["action"]:
+            query = query.filter(Approval.action == params["action"])
+        if params["start"]:
+            query = query.filter(Approval.timestamp >= datetime.fromisoformat(params["start"]))
+        if params["end"]:
+            query = query.filter(Approval.timestamp <= datetime.fromisoformat(params["end"]))
+        rows = query.order_by(Approval.timestamp.desc(), Approval.id.desc()).offset(skip).limit(limit).all()
+        return [
+            {
+                "id": a.id,
+                "timestamp": a.timestamp,
+                "step": a.step,
+                "action": a.action,
+                "comment": a.comment,
+                "approver_id": a.approver_id,
+                "approver_email": a.approver.email if a.approver else None,
+                "document_id": a.document_id,
+                "filename": a.document.filename if a.document else None,
+                "vendor": a.document.vendor if a.document else None,
+                "invoice_number": a.document.invoice_number if a.document else None,
+                "amount": a.document.amount if a.document else None,
+                "status": a.document.status.value if a.document else None,
+            }
+            for a in rows
+        ]
+
+    return _cached_json(request, "approvals", params, build)
 
 
 @router.get("/export/csv")
@@ -154,6 +365,8 @@ def export_csv(
         }
         for r in rows
     ]
+    import pandas as pd
+
     df = pd.DataFrame(data)
     stream = io.StringIO()
     df.to_csv(stream, index=False)
@@ -179,6 +392,7 @@ def export_excel(
     """Export filtered report as Excel."""
     try:
         import openpyxl  # noqa: F401 - used by pd.ExcelWriter(engine="openpyxl")
+        import pandas as pd
     except ImportError as exc:
         raise HTTPException(
             500, "Excel export requires openpyxl: pip install openpyxl"
@@ -204,9 +418,8 @@ def export_excel(
     stream = io.BytesIO()
     with pd.ExcelWriter(stream, engine="openpyxl") as writer:
         df.to_excel(writer, index=False, sheet_name="Report")
-    stream.seek(0)
-    return StreamingResponse(
-        stream.read(),
+    return Response(
+        content=stream.getvalue(),
         media_type=(
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         ),
@@ -280,9 +493,8 @@ def export_pdf(
     ]))  # noqa: E501
     elements.append(t)
     doc.build(elements)
-    buffer.seek(0)
-    return StreamingResponse(
-        buffer.read(),
+    return Response(
+        content=buffer.getvalue(),
         media_type="application/pdf",
         headers={"Content-Disposition": "attachment; filename=report.pdf"},
     )
@@ -302,6 +514,7 @@ def _trend_key(dt, granularity: str) -> str:
 
 @router.get("/insights")
 def ai_insights(
+    request: Request,
     start: str | None = None,
     end: str | None = None,
     granularity: str = Query(
@@ -314,6 +527,18 @@ def ai_insights(
     """AI Insights: document counts, trends, anomalies, spending insights."""
     if granularity not in ("month", "day", "hour", "minute"):
         granularity = "day"
+    params = {
+        "start": (start or "").strip() or None,
+        "end": (end or "").strip() or None,
+        "granularity": granularity,
+    }
+    return _cached_json(
+        request, "insights", params,
+        lambda: _build_insights(db, params["start"], params["end"], granularity),
+    )
+
+
+def _build_insights(db: Session, start: str | None, end: str | None, granularity: str) -> dict:
     query = db.query(Document)
     if start:
         query = query.filter(Document.created_at >= datetime.fromisoformat(start))
@@ -374,27 +599,9 @@ def ai_insights(
     total = sum(amounts)
     count = len(amounts)
     avg = total / count if count else 0
-    variance = sum((x - avg) ** 2 for x in amounts) / count if count else 0
-    std = math.sqrt(variance) if variance else 0
-    threshold = avg + 2 * std if std else None
-    anomalies = [
-        {
-            "id": r.id,
-            "filename": r.filename,
-            "vendor": r.vendor,
-            "amount": r.amount,
-        }
-        for r in rows
-        if r.amount and threshold and r.amount > threshold
-    ]
+    anomalies = _anomalies(query, limit=20)
 
-    by_vendor = {}
-    for r in rows:
-        v = r.vendor or "Unknown"
-        by_vendor[v] = by_vendor.get(v, 0) + (r.amount or 0)
-    top_vendors = sorted(
-        by_vendor.items(), key=lambda x: x[1], reverse=True
-    )[:10]
+    top_vendors = _spend_by_vendor(query, limit=10)
     by_status_spend = {}
     for r in rows:
         s = r.status.value
@@ -409,7 +616,7 @@ def ai_insights(
         "status_counts": status_counts,
         "trends": trends,
         "document_series": doc_keys,
-        "anomalies": anomalies[:20],
+        "anomalies": anomalies,
         "spending_insights": {
             "total_spend": total,
             "document_count": count,
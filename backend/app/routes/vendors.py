@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from ..dependencies import get_db, require_role
+from ..auth import get_current_user
+from .. import schemas
+from ..model import Document, Vendor
+from ..services.cache import bump_document_version
+from ..services.vendors import merge_vendors, vendor_index
+
+router = APIRouter(prefix="/vendors", tags=["vendors"])
+
+
+@router.get("/autocomplete", response_model=list[schemas.VendorSuggestion])
+def autocomplete(q: str, limit: int = 10, db: Session = Depends(get_db), _user=Depends(get_current_user)):
+    """Vendors matching what has been typed: prefix, then substring, then close spellings (from memory)."""
+    return vendor_index.suggest(db, q, limit=max(1, min(limit, 50)))
+
+
+@router.get("/", response_model=list[schemas.VendorOut])
+def list_vendors(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), _user=Depends(get_current_user)):
+    """Vendors with their document counts and known spellings, most documents first."""
+    counts = (
+        db.query(Document.vendor_id, func.count(Document.id).label("documents"))
+        .filter(Document.vendor_id.isnot(None))
+        .group_by(Document.vendor_id)
+        .subquery()
+    )
+    rows = (
+        db.query(Vendor, func.coalesce(counts.c.documents, 0))
+        .outerjoin(counts, counts.c.vendor_id == Vendor.id)
+        .options(selectinload(Vendor.aliases))
+        .order_by(func.coalesce(counts.c.documents, 0).desc(), Vendor.name)
+        .offset(skip)
+        .limit(max(1, min(limit, 1000)))
+        .all()
+    )
+    return [
+        {"id": v.id, "name": v.name, "documents": n, "aliases": sorted(a.name for a in v.aliases)}
+        for v, n in rows
+    ]
+
+
+@router.post("/{vendor_id}/merge")
+def merge_vendor(
+    vendor_id: int,
+    into: int,
+    db: Session = Depends(get_db),
+    _admin=Depends(require_role(["admin"])),
+):
+    """Fold a vendor that is a spelling variant into another: its aliases and documents move over."""
+    if vendor_id == into:
+        raise HTTPException(status_code=400, detail="Cannot merge a vendor into itself")
+    found = db.query(func.count(Vendor.id)).filter(Vendor.id.in_([vendor_id, into])).scalar()
+    if found != 2:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    moved = merge_vendors(db, vendor_id, into)
+    bump_document_version()
+    return {"merged": vendor_id, "into": into, "documents": moved}
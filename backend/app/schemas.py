@@ -28,17 +28,94 @@ class DocumentOut(BaseModel):
     id: int
     filename: str
     vendor: Optional[str]
+    vendor_id: Optional[int] = None
     invoice_number: Optional[str]
     date: Optional[datetime]
     amount: Optional[float]
     vat: Optional[float]
     status: str
     current_step: int
+    version: int
     is_duplicate: bool
     created_at: datetime
+    batch_id: Optional[str] = None
+    extraction_path: Optional[str] = None
     model_config = {"from_attributes": True}
 
     @field_validator("status", mode="before")
     @classmethod
     def status_to_str(cls, v: Any) -> str:
         return getattr(v, "value", v) if hasattr(v, "value") else str(v)
+
+
+class ApprovalOut(BaseModel):
+    id: int
+    step: int
+    action: str
+    comment: Optional[str] = None
+    timestamp: datetime
+    approver_id: Optional[int] = None
+    approver_email: Optional[str] = None
+
+class DocumentTimelineOut(BaseModel):
+    document: DocumentOut
+    approvals: list[ApprovalOut]
+
+
+class BulkApprovalRequest(BaseModel):
+    document_ids: list[int]
+    action: str  # approve/reject
+    comment: str = ""
+
+class BulkApprovalItem(BaseModel):
+    id: int
+    ok: bool
+    status: Optional[str] = None
+    current_step: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkApprovalOut(BaseModel):
+    action: str
+    succeeded: int
+    failed: int
+    results: list[BulkApprovalItem]
+
+class InboxOut(BaseModel):
+    items: list[DocumentOut]
+    counts: dict[int, int]  # pending documents per step the user can act on
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    document: DocumentOut
+    rank: float
+    snippet: Optional[str] = None
+
+class VendorSuggestion(BaseModel):
+    id: int
+    name: str
+    documents: int
+
+class VendorOut(BaseModel):
+    id: int
+    name: str
+    documents: int
+    aliases: list[str]
+
+class BatchUploadItem(BaseModel):
+    filename: str
+    archive: Optional[str] = None  # ZIP the file came from, if any
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchUploadOut(BaseModel):
+    batch_id: str
+    accepted: int
+    rejected: int
+    files: list[BatchUploadItem]
+
+class BatchStatusOut(BaseModel):
+    batch_id: str
+    total: int
+    processed: int  # extraction finished (raw_text stored)
+    status_counts: dict[str, int]
+    documents: list[DocumentOut]
@@ -0,0 +1,169 @@
+"""
+Production server: gunicorn managing uvicorn workers (gunicorn.conf.py holds the hooks).
+
+    python -m app.serve              # same as: gunicorn -c gunicorn.conf.py app.main:app
+    python -m app.serve --plan       # print the worker count and limits this machine gets
+
+The worker count is WEB_CONCURRENCY if set, otherwise the smaller of 2 x CPUs + 1 and what fits
+in memory. Without REDIS_URL it defaults to one worker: the report cache version, the event
+stream broker and the admission counters are then per process, so a second worker would serve
+stale reports and miss other workers' events. CPUs and memory are read from the cgroup limits, so a container sees its own quota
+rather than the host's. Each worker is budgeted WEB_WORKER_MEMORY_MB plus EXTRACTION_MEMORY_MB
+for each of its EXTRACTION_CONCURRENCY extraction slots (OCR and pdf2image are the memory hogs).
+
+Workers restart after WEB_MAX_REQUESTS requests (with jitter) or once their resident memory
+passes WEB_WORKER_MAX_RSS_MB. Either way they finish in-flight requests, including the
+extraction background tasks attached to them, for up to WEB_GRACEFUL_TIMEOUT seconds.
+"""
+import argparse
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from uvicorn_worker import UvicornWorker
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+class Worker(UvicornWorker):
+    """UvicornWorker that lets in-flight requests finish on shutdown instead of cutting them off."""
+
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "timeout_graceful_shutdown": settings.WEB_GRACEFUL_TIMEOUT}
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path, encoding="ascii") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit() -> float:
+    """CPUs this process may use: affinity mask, capped by a cgroup v2/v1 CPU quota."""
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        cpus = float(os.cpu_count() or 1)
+    quota = _read("/sys/fs/cgroup/cpu.max")
+    if quota and not quota.startswith("max"):
+        limit, period = quota.split()
+        cpus = min(cpus, int(limit) / int(period))
+    else:
+        limit, period = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if limit and period and int(limit) > 0:
+            cpus = min(cpus, int(limit) / int(period))
+    return max(cpus, 1.0)
+
+
+def memory_limit_mb() -> int | None:
+    """Memory available to the container (cgroup limit), else the machine's total; None if unknown."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read(path)
+        # cgroup v1 reports "no limit" as a huge number
+        if value and value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    meminfo = _read("/proc/meminfo")
+    if meminfo:
+        for line in meminfo.splitlines():
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) // 1024
+    return None
+
+
+def worker_budget_mb() -> int:
+    return settings.WEB_WORKER_MEMORY_MB + settings.EXTRACTION_CONCURRENCY * settings.EXTRACTION_MEMORY_MB
+
+
+def worker_count() -> int:
+    if settings.WEB_CONCURRENCY:
+        return settings.WEB_CONCURRENCY
+    if not settings.REDIS_URL:
+        return 1
+    by_cpu = 2 * math.ceil(cpu_limit()) + 1
+    memory = memory_limit_mb()
+    by_memory = memory // worker_budget_mb() if memory else by_cpu
+    return max(1, min(by_cpu, by_memory))
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (Linux; elsewhere the peak, which only grows)."""
+    statm = _read("/proc/self/statm")
+    if statm:
+        return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def start_memory_watchdog(limit_mb: int, interval: float = 10.0) -> threading.Thread | None:
+    """Ask this worker to shut down gracefully once its RSS passes limit_mb; gunicorn starts a new one."""
+    if limit_mb <= 0:
+        return None
+
+    def watch():
+        while True:
+            time.sleep(interval)
+            rss = rss_mb()
+            if rss > limit_mb:
+                logger.warning("Worker over memory limit, restarting", extra={"rss_mb": round(rss), "limit_mb": limit_mb})
+                # Same signal the arbiter sends for a graceful stop: uvicorn drains in-flight requests
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+    thread = threading.Thread(target=watch, name="memory-watchdog", daemon=True)
+    thread.start()
+    return thread
+
+
+def shared_state_warning(workers: int) -> str | None:
+    """Why running this many workers is unsafe, or None."""
+    if workers > 1 and not settings.REDIS_URL:
+        return (
+            f"{workers} workers without REDIS_URL: report cache versions, document events and "
+            "admission limits are per worker, so workers will serve stale reports and "
+            "miss each other's events. Set REDIS_URL or WEB_CONCURRENCY=1."
+        )
+    return None
+
+
+def plan() -> dict:
+    return {
+        "cpus": cpu_limit(),
+        "redis": bool(settings.REDIS_URL),
+        "memory_mb": memory_limit_mb(),
+        "worker_budget_mb": worker_budget_mb(),
+        "workers": worker_count(),
+        "extraction_concurrency_per_worker": settings.EXTRACTION_CONCURRENCY,
+        "max_requests": settings.WEB_MAX_REQUESTS,
+        "max_rss_mb": settings.WEB_WORKER_MAX_RSS_MB,
+        "graceful_timeout_s": settings.WEB_GRACEFUL_TIMEOUT,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plan", action="store_true", help="print the sizing for this machine and exit")
+    args, rest = parser.parse_known_args()
+    if args.plan:
+        for key, value in plan().items():
+            print(f"{key:36} {value}")
+        warning = shared_state_warning(worker_count())
+        if warning:
+            print(f"WARNING: {warning}")
+        return 0
+    from gunicorn.app.wsgiapp import run
+
+    sys.argv = ["gunicorn", "-c", CONFIG_FILE, *rest, "app.main:app"]
+    return run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
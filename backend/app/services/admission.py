@@ -0,0 +1,322 @@
+"""
+Admission control: each request gets a cost class from its route, and each class has limits
+per client and across the deployment.
+
+    rate          token bucket per client: `rate` requests/second, up to `burst` at once
+    concurrency   requests in progress per client (`user_concurrency`) and overall
+                  (`global_concurrency`)
+
+A request over its client's rate or concurrency is rejected at once. A request over the global
+concurrency waits up to `queue_timeout` seconds, with at most `max_queue` waiting in this
+worker; after that it is rejected too. Rejections are 429 with Retry-After. The client is the
+JWT subject, or the IP address for anonymous requests.
+
+The counters live in this process, or in Redis when REDIS_URL is set, so the limits hold across
+workers and machines. On a Redis error the process-local counters take over until it recovers.
+The Redis client is synchronous. Its calls run in worker threads (at most _REDIS_THREADS at
+once), so a slow Redis delays only the requests being admitted, not the event loop.
+Limits can be overridden per class with ADMISSION_LIMITS, e.g. '{"export": {"global_concurrency": 8}}'.
+"""
+import json
+import math
+import threading
+import time
+import uuid
+from dataclasses import dataclass, replace
+import anyio
+from ..config import settings
+from .cache import redis_down, get_redis
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT
+
+
+@dataclass(frozen=True)
+class CostClass:
+    name: str
+    rate: float  # tokens per second, per client
+    burst: int
+    user_concurrency: int
+    global_concurrency: int
+    queue_timeout: float
+    max_queue: int
+    retry_after: int  # seconds, when rejected for concurrency
+
+
+DEFAULT_CLASSES = {
+    c.name: c for c in (
+        CostClass("read", rate=20, burst=60, user_concurrency=16, global_concurrency=64, queue_timeout=2, max_queue=128, retry_after=1),
+        CostClass("auth", rate=1, burst=10, user_concurrency=2, global_concurrency=8, queue_timeout=2, max_queue=16, retry_after=2),
+        CostClass("aggregate", rate=2, burst=10, user_concurrency=4, global_concurrency=16, queue_timeout=5, max_queue=32, retry_after=2),
+        CostClass("export", rate=0.2, burst=3, user_concurrency=2, global_concurrency=4, queue_timeout=10, max_queue=8, retry_after=10),
+        CostClass("upload", rate=2, burst=20, user_concurrency=4, global_concurrency=8, queue_timeout=10, max_queue=32, retry_after=5),
+        CostClass("llm", rate=0.5, burst=5, user_concurrency=2, global_concurrency=8, queue_timeout=5, max_queue=16, retry_after=5),
+    )
+}
+
+# (method, route template) -> class; anything not listed is "read"
+ROUTE_CLASSES = {
+    ("POST", "/auth/token"): "auth",
+    ("POST", "/auth/register"): "auth",
+    ("POST", "/documents/upload"): "upload",
+    ("POST", "/documents/upload/batch"): "upload",
+    ("GET", "/documents/search"): "aggregate",
+    ("POST", "/documents/bulk-approve"): "aggregate",
+    ("GET", "/reports/export/csv"): "export",
+    ("GET", "/reports/export/excel"): "export",
+    ("GET", "/reports/export/pdf"): "export",
+    ("POST", "/chat/"): "llm",
+    ("POST", "/chat/stream"): "llm",
+}
+# Long-lived streams, probes and unknown routes are not admission-controlled
+EXEMPT_ROUTES = {"/", "/metrics", "/events/stream", "unmatched"}
+
+_LEASE_SECONDS = 600  # Redis concurrency slots expire after this if a worker dies holding them
+_POLL_MIN, _POLL_MAX = 0.01, 0.1
+_REDIS_THREADS = 16
+
+
+def load_classes() -> dict[str, CostClass]:
+    """Default classes with ADMISSION_LIMITS applied; raises ValueError on limits that cannot work."""
+    classes = dict(DEFAULT_CLASSES)
+    if settings.ADMISSION_LIMITS:
+        for name, overrides in json.loads(settings.ADMISSION_LIMITS).items():
+            classes[name] = replace(classes.get(name, DEFAULT_CLASSES["read"]), name=name, **overrides)
+    for c in classes.values():
+        # A bucket that never refills would make every wait infinite; use ADMISSION_ENABLED to turn limits off
+        if not c.rate > 0 or c.burst < 1:
+            raise ValueError(f"ADMISSION_LIMITS: {c.name} needs rate > 0 and burst >= 1")
+        if c.user_concurrency < 1 or c.global_concurrency < 1:
+            raise ValueError(f"ADMISSION_LIMITS: {c.name} concurrency limits must be at least 1")
+    return classes
+
+
+def classify(method: str, route: str) -> str | None:
+    """Cost class of a request, or None if it is exempt."""
+    if method == "OPTIONS" or route in EXEMPT_ROUTES:
+        return None
+    cost_class = ROUTE_CLASSES.get((method, route))
+    if cost_class:
+        return cost_class
+    return "aggregate" if route.startswith("/reports/") else "read"
+
+
+class LocalBackend:
+    """Token buckets and concurrency counters for this process."""
+
+    _MAX_BUCKETS = 10_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}  # key -> (tokens, updated)
+        self._slots: dict[str, int] = {}
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            if len(self._buckets) > self._MAX_BUCKETS:
+                # Drop buckets that have refilled; they are equivalent to a new one
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+        return wait
+
+    def acquire(self, key: str, limit: int) -> str | None:
+        with self._lock:
+            if self._slots.get(key, 0) >= limit:
+                return None
+            self._slots[key] = self._slots.get(key, 0) + 1
+        return key
+
+    def release(self, key: str, lease: str):
+        with self._lock:
+            count = self._slots.get(key, 0) - 1
+            if count > 0:
+                self._slots[key] = count
+            else:
+                self._slots.pop(key, None)
+
+
+_TOKEN_BUCKET_LUA = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+_ACQUIRE_LUA = """
+local now, limit = tonumber(ARGV[1]), tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= limit then return 0 end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class RedisBackend:
+    """Same interface as LocalBackend, shared by every worker; concurrency slots are leases."""
+
+    prefix = "dms:admission:"
+
+    def __init__(self, client):
+        self._take = client.register_script(_TOKEN_BUCKET_LUA)
+        self._acquire = client.register_script(_ACQUIRE_LUA)
+        self._client = client
+
+    def take_token(self, key: str, rate: float, burst: int) -> float:
+        return float(self._take(keys=[self.prefix + "rate:" + key], args=[rate, burst, time.time()]))
+
+    def acquire(self, key: str, limit: int) -> str | None:
+        lease = uuid.uuid4().hex
+        ok = self._acquire(keys=[self.prefix + "slots:" + key], args=[time.time(), limit, _LEASE_SECONDS, lease])
+        return lease if ok else None
+
+    def release(self, key: str, lease: str):
+        self._client.zrem(self.prefix + "slots:" + key, lease)
+
+
+@dataclass
+class Rejection:
+    cost_class: str
+    reason: str  # rate, user_concurrency, queue_full, queue_timeout
+    retry_after: int
+
+
+class Ticket:
+    """Held while a request runs; release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", cost_class: str, slots: list[tuple[object, str, str]]):
+        self._controller = controller
+        self.cost_class = cost_class
+        self._slots = slots
+        ADMISSION_IN_FLIGHT.inc(cost_class=cost_class)
+
+    async def release(self):
+        if self._slots is None:
+            return
+        slots, self._slots = self._slots, None
+        ADMISSION_IN_FLIGHT.dec(cost_class=self.cost_class)
+        await self._controller._release_all(slots)
+
+
+class AdmissionController:
+    def __init__(self):
+        self.classes = load_classes()
+        self.local = LocalBackend()
+        self._redis_backend = None
+        self._queued: dict[str, int] = {}
+        self._queue_lock = threading.Lock()
+        self._limiter: anyio.CapacityLimiter | None = None
+        for name in self.classes:
+            ADMISSION_QUEUE_DEPTH.set_function(lambda name=name: self._queued.get(name, 0), cost_class=name)
+
+    def _backend(self):
+        client = get_redis()
+        if client is None:
+            return self.local
+        if self._redis_backend is None or self._redis_backend._client is not client:
+            self._redis_backend = RedisBackend(client)
+        return self._redis_backend
+
+    async def _offload(self, fn, *args):
+        """Run fn inline when only the local backend can be involved, else in a worker thread."""
+        if not settings.REDIS_URL:
+            return fn(*args)
+        if self._limiter is None:
+            # Created lazily: a CapacityLimiter needs a running event loop
+            self._limiter = anyio.CapacityLimiter(_REDIS_THREADS)
+        return await anyio.to_thread.run_sync(fn, *args, limiter=self._limiter)
+
+    async def _call(self, method: str, *args):
+        return await self._offload(self._call_sync, method, *args)
+
+    def _call_sync(self, method: str, *args):
+        """Run a backend operation, falling back to the local backend if Redis fails."""
+        backend = self._backend()
+        try:
+            return backend, getattr(backend, method)(*args)
+        except Exception:
+            if backend is self.local:
+                raise
+            redis_down()
+            return self.local, getattr(self.local, method)(*args)
+
+    def _release_sync(self, slots: list[tuple[object, str, str]]):
+        for backend, key, lease in slots:
+            try:
+                backend.release(key, lease)
+            except Exception:
+                # The Redis lease expires on its own
+                redis_down()
+
+    async def _release_all(self, slots: list[tuple[object, str, str]]):
+        await self._offload(self._release_sync, slots)
+
+    def _reject(self, cost_class: str, reason: str, retry_after: float) -> Rejection:
+        ADMISSION_REJECTED.inc(cost_class=cost_class, reason=reason)
+        return Rejection(cost_class, reason, max(1, math.ceil(retry_after)))
+
+    async def admit(self, cost_class: str, client: str) -> Ticket | Rejection:
+        limits = self.classes.get(cost_class) or self.classes["read"]
+        _, wait = await self._call("take_token", f"{cost_class}:{client}", limits.rate, limits.burst)
+        if wait > 0:
+            return self._reject(cost_class, "rate", wait)
+
+        user_key = f"{cost_class}:{client}"
+        backend, lease = await self._call("acquire", user_key, limits.user_concurrency)
+        if lease is None:
+            return self._reject(cost_class, "user_concurrency", limits.retry_after)
+        slots = [(backend, user_key, lease)]
+
+        started = time.monotonic()
+        backend, lease = await self._call("acquire", cost_class, limits.global_concurrency)
+        if lease is None:
+            with self._queue_lock:
+                queued = self._queued.get(cost_class, 0)
+                if queued >= limits.max_queue:
+                    full = True
+                else:
+                    full = False
+                    self._queued[cost_class] = queued + 1
+            if full:
+                await self._release_all(slots)
+                return self._reject(cost_class, "queue_full", limits.retry_after)
+            try:
+                # Poll rather than wait on a condition: slots may be freed by another worker (Redis)
+                # or another event loop, and neither can notify this one
+                delay = _POLL_MIN
+                while lease is None and time.monotonic() - started < limits.queue_timeout:
+                    await anyio.sleep(delay)
+                    delay = min(delay * 2, _POLL_MAX)
+                    backend, lease = await self._call("acquire", cost_class, limits.global_concurrency)
+            finally:
+                with self._queue_lock:
+                    self._queued[cost_class] -= 1
+            if lease is None:
+                await self._release_all(slots)
+                return self._reject(cost_class, "queue_timeout", limits.retry_after)
+        ADMISSION_WAIT.observe(time.monotonic() - started, cost_class=cost_class)
+        slots.append((backend, cost_class, lease))
+        return Ticket(self, cost_class, slots)
+
+
+_controller: AdmissionController | None = None
+
+
+def get_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
@@ -0,0 +1,136 @@
+"""
+Per-vendor anomaly scores, kept up to date as documents are extracted.
+
+vendor_stats holds, for each vendor, the running count, mean and M2 of log(1 + amount)
+(Welford's algorithm). An update is O(1), and two vendors' stats can be combined exactly when
+they are merged (Chan et al.). Working on log amounts makes the score about ratios. An invoice
+10x a vendor's usual amount scores the same whether that vendor usually bills R100 or R100,000,
+so big-ticket vendors are not flagged merely for being big.
+
+A document's score is the number of standard deviations its log amount sits above the
+vendor's mean *before* it is added, so an outlier cannot hide itself. It is stored in
+documents.anomaly_score, which is indexed, so anomaly lists are a range scan. Documents without
+a vendor or amount, and those of vendors with fewer than ANOMALY_MIN_HISTORY documents, get no
+score. Duplicates are scored but left out of the stats.
+"""
+import math
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer
+from ..config import settings
+from ..model import Document, VendorStats
+
+
+def _value(amount: float) -> float:
+    return math.log1p(max(amount, 0.0))
+
+
+def score(stats: VendorStats | None, amount: float) -> float | None:
+    """Standard deviations above the vendor's mean log amount, or None without enough history."""
+    if stats is None or stats.count < max(settings.ANOMALY_MIN_HISTORY, 2):
+        return None
+    std = math.sqrt(stats.m2 / (stats.count - 1))
+    if std == 0:
+        # Every earlier invoice had the same amount: any increase is notable, but not infinitely so
+        std = 0.01
+    return round((_value(amount) - stats.mean) / std, 3)
+
+
+def _update(stats: VendorStats, amount: float):
+    x = _value(amount)
+    stats.count += 1
+    delta = x - stats.mean
+    stats.mean += delta / stats.count
+    stats.m2 += delta * (x - stats.mean)
+
+
+def typical_amount(mean: float) -> float:
+    """A vendor's typical amount (geometric mean) from its stats' mean."""
+    return round(math.expm1(mean), 2)
+
+
+def _locked_stats(db: Session, vendor_id: int) -> VendorStats:
+    stats = db.query(VendorStats).filter(VendorStats.vendor_id == vendor_id).with_for_update().first()
+    if stats is not None:
+        return stats
+    try:
+        with db.begin_nested():
+            stats = VendorStats(vendor_id=vendor_id, count=0, mean=0.0, m2=0.0)
+            db.add(stats)
+            db.flush()
+        return stats
+    except IntegrityError:
+        # Another worker created the row first
+        return db.query(VendorStats).filter(VendorStats.vendor_id == vendor_id).with_for_update().one()
+
+
+def score_document(db: Session, doc: Document) -> float | None:
+    """Score doc against its vendor's stats, then add it to them. Call before committing doc.
+
+    The stats row is locked (SELECT ... FOR UPDATE on Postgres) until the caller commits, so
+    concurrent extractions for one vendor update it one at a time.
+    """
+    if not doc.vendor_id or doc.amount is None or doc.amount <= 0:
+        doc.anomaly_score = None
+        return None
+    stats = _locked_stats(db, doc.vendor_id)
+    doc.anomaly_score = score(stats, doc.amount)
+    if not doc.is_duplicate:
+        _update(stats, doc.amount)
+    return doc.anomaly_score
+
+
+def merge_stats(db: Session, source_id: int, target_id: int):
+    """Fold source's stats into target's (Chan's parallel update); does not commit."""
+    source = db.query(VendorStats).filter(VendorStats.vendor_id == source_id).first()
+    if source is None:
+        return
+    target = _locked_stats(db, target_id)
+    n = target.count + source.count
+    if n:
+        delta = source.mean - target.mean
+        target.m2 += source.m2 + delta * delta * target.count * source.count / n
+        target.mean += delta * source.count / n
+        target.count = n
+    db.delete(source)
+    db.flush()
+
+
+def rebuild_scores(db: Session, batch_size: int = 1000) -> int:
+    """Recompute every vendor's stats and every score by replaying documents oldest first.
+
+    Returns how many documents were scored. app.migrate runs it once to backfill existing documents.
+    """
+    db.query(VendorStats).delete(synchronize_session=False)
+    stats: dict[int, VendorStats] = {}
+    scored = 0
+    last_id = 0
+    while True:
+        docs = (
+            db.query(Document)
+            .options(defer(Document.raw_text))
+            .filter(Document.id > last_id)
+            .order_by(Document.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not docs:
+            break
+        last_id = docs[-1].id
+        for doc in docs:
+            if not doc.vendor_id or doc.amount is None or doc.amount <= 0:
+                doc.anomaly_score = None
+                continue
+            s = stats.get(doc.vendor_id)
+            if s is None:
+                s = stats[doc.vendor_id] = VendorStats(vendor_id=doc.vendor_id, count=0, mean=0.0, m2=0.0)
+                db.add(s)
+            doc.anomaly_score = score(s, doc.amount)
+            scored += doc.anomaly_score is not None
+            if not doc.is_duplicate:
+                _update(s, doc.amount)
+        db.flush()
+        # Keep the session small; the stats objects stay attached
+        for doc in docs:
+            db.expunge(doc)
+    db.commit()
+    return scored
@@ -0,0 +1,143 @@
+"""
+Hot/cold tiering for documents. Almost every query touches recent documents, so old ones are
+moved out of the hot tables and directories:
+
+- OCR text of documents older than ARCHIVE_TEXT_AFTER_DAYS moves from documents.raw_text,
+  compressed (zstd, or zlib without the zstandard package), to document_archive. On Postgres
+  that table is range-partitioned by year, so a year can be detached, backed up or dropped on
+  its own.
+- Originals of approved/rejected documents older than ARCHIVE_ORIGINALS_AFTER_DAYS move to the
+  cold store (services/files.py).
+
+Reads stay transparent. document_text() returns the text wherever it lives. Search keeps its
+index (the Postgres tsvector and the SQLite FTS5 copy are left alone). The file and thumbnail
+routes fall back to the cold store. Run by `python -m app.archive`.
+"""
+import datetime
+import zlib
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from ..model import Document, DocumentArchive, DocumentStatus
+from .files import archive_original, original_path
+
+try:
+    import zstandard
+except ImportError:  # zlib is used instead
+    zstandard = None
+
+_ZSTD_LEVEL = 10
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def compress_text(raw: str) -> tuple[str, bytes]:
+    data = raw.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("the zstandard package is needed to read text archived with zstd")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+
+def archived_texts(db: Session, ids: list[int]) -> dict[int, str]:
+    """Archived OCR text by document id, for the given ids that have any."""
+    if not ids:
+        return {}
+    rows = db.query(DocumentArchive.document_id, DocumentArchive.codec, DocumentArchive.raw_text).filter(
+        DocumentArchive.document_id.in_(ids)
+    )
+    return {r.document_id: decompress_text(r.codec, r.raw_text) for r in rows}
+
+
+def document_text(db: Session, doc: Document) -> str | None:
+    """A document's OCR text, from the documents row or the archive."""
+    if doc.raw_text is not None or doc.text_archived_at is None:
+        return doc.raw_text
+    return archived_texts(db, [doc.id]).get(doc.id)
+
+
+def ensure_partitions(conn, years) -> None:
+    """Postgres: create the yearly document_archive partitions (and a default one) if missing."""
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("CREATE TABLE IF NOT EXISTS document_archive_default PARTITION OF document_archive DEFAULT"))
+    for year in sorted(set(years)):
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS document_archive_y{year:04d} PARTITION OF document_archive "
+            f"FOR VALUES FROM ('{year:04d}-01-01') TO ('{year + 1:04d}-01-01')"
+        ))
+
+
+def archive_text(db: Session, older_than: datetime.datetime, batch_size: int = 500, dry_run: bool = False) -> int:
+    """Move the OCR text of documents created before older_than to document_archive; returns how many."""
+    count = 0
+    last_id = 0
+    while True:
+        docs = (
+            db.query(Document.id, Document.created_at, Document.raw_text)
+            .filter(
+                Document.id > last_id,
+                Document.created_at < older_than,
+                Document.raw_text.isnot(None),
+                Document.text_archived_at.is_(None),
+            )
+            .order_by(Document.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not docs:
+            return count
+        last_id = docs[-1].id
+        count += len(docs)
+        if dry_run:
+            continue
+        rows = []
+        for d in docs:
+            codec, data = compress_text(d.raw_text)
+            rows.append({"document_id": d.id, "created_at": d.created_at or _EPOCH, "codec": codec, "raw_text": data})
+        # Every year gets its partition before its rows arrive, so the default partition stays empty
+        ensure_partitions(db.connection(), [r["created_at"].year for r in rows])
+        db.execute(insert(DocumentArchive), rows)
+        db.query(Document).filter(Document.id.in_([d.id for d in docs])).update(
+            {Document.raw_text: None, Document.text_archived_at: datetime.datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+
+
+def archive_originals(db: Session, older_than: datetime.datetime, batch_size: int = 500, dry_run: bool = False) -> int:
+    """Move originals of finalised documents created before older_than to the cold store; returns how many."""
+    count = 0
+    last_id = 0
+    while True:
+        docs = (
+            db.query(Document.id, Document.filename)
+            .filter(
+                Document.id > last_id,
+                Document.created_at < older_than,
+                Document.status.in_([DocumentStatus.approved, DocumentStatus.rejected]),
+                Document.original_archived_at.is_(None),
+            )
+            .order_by(Document.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not docs:
+            return count
+        last_id = docs[-1].id
+        moved = []
+        for d in docs:
+            path = original_path(d.filename) if dry_run else archive_original(d.filename)
+            if path:
+                moved.append(d.id)
+        count += len(moved)
+        if moved and not dry_run:
+            db.query(Document).filter(Document.id.in_(moved)).update(
+                {Document.original_archived_at: datetime.datetime.utcnow()}, synchronize_session=False,
+            )
+            db.commit()
@@ -0,0 +1,168 @@
+"""
+Response cache for the report endpoints: in-memory LRU with TTL, or Redis when REDIS_URL is set.
+
+Keys embed a document-version counter that is bumped on upload, extraction and approval,
+so any change to the documents table makes every older entry unreachable at once.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from ..config import settings
+
+_VERSION_KEY = "dms:documents:version"
+_REDIS_RETRY_SECONDS = 30
+
+_redis_client = None
+_redis_failed_at = 0.0
+_redis_lock = threading.Lock()
+
+
+def get_redis():
+    """Shared Redis client, or None when REDIS_URL is unset or Redis is unreachable."""
+    global _redis_client, _redis_failed_at
+    if not settings.REDIS_URL:
+        return None
+    if _redis_client is not None:
+        return _redis_client
+    if time.monotonic() - _redis_failed_at < _REDIS_RETRY_SECONDS:
+        return None
+    with _redis_lock:
+        if _redis_client is None:
+            try:
+                import redis
+                client = redis.Redis.from_url(
+                    settings.REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5
+                )
+                client.ping()
+                _redis_client = client
+            except Exception:
+                _redis_failed_at = time.monotonic()
+                return None
+    return _redis_client
+
+
+def redis_down():
+    """Drop the shared client after an error; get_redis() retries after a back-off."""
+    global _redis_client, _redis_failed_at
+    _redis_client = None
+    _redis_failed_at = time.monotonic()
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Process-local version counter, used when Redis is not available
+_local_version = 0
+_local_version_lock = threading.Lock()
+
+
+def get_document_version() -> int:
+    r = get_redis()
+    if r is not None:
+        try:
+            return int(r.get(_VERSION_KEY) or 0)
+        except Exception:
+            redis_down()
+    return _local_version
+
+
+def bump_document_version() -> int:
+    """Call after any write that can change report results (upload, extraction, approval)."""
+    global _local_version
+    with _local_version_lock:
+        _local_version += 1
+        version = _local_version
+    r = get_redis()
+    if r is not None:
+        try:
+            return int(r.incr(_VERSION_KEY))
+        except Exception:
+            redis_down()
+    return version
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """True when an If-None-Match header covers etag (weak comparison, as for GET/HEAD)."""
+    tags = [t.strip().removeprefix("W/") for t in (if_none_match or "").split(",")]
+    return etag.removeprefix("W/") in tags or "*" in tags
+
+
+class ReportCache:
+    """Caches serialised JSON bodies together with their ETag."""
+
+    def __init__(self, prefix: str = "dms:reports"):
+        self.prefix = prefix
+        self._local = LRUCache(settings.REPORT_CACHE_MAX_ENTRIES, settings.REPORT_CACHE_TTL_SECONDS)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.REPORT_CACHE_TTL_SECONDS > 0
+
+    def make_key(self, name: str, params: dict) -> str:
+        raw = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{get_document_version()}:{name}:{digest}"
+
+    def get(self, key: str) -> tuple[str, bytes] | None:
+        if not self.enabled:
+            return None
+        r = get_redis()
+        if r is not None:
+            try:
+                raw = r.get(key)
+                if raw is None:
+                    return None
+                etag, _, body = raw.partition(b"\n")
+                return etag.decode("ascii"), body
+            except Exception:
+                redis_down()
+        return self._local.get(key)
+
+    def set(self, key: str, body: bytes) -> tuple[str, bytes]:
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if not self.enabled:
+            return etag, body
+        r = get_redis()
+        if r is not None:
+            try:
+                r.set(key, etag.encode("ascii") + b"\n" + body, ex=settings.REPORT_CACHE_TTL_SECONDS)
+                return etag, body
+            except Exception:
+                redis_down()
+        self._local.set(key, (etag, body))
+        return etag, body
+
+
+report_cache = ReportCache()
@@ -0,0 +1,135 @@
+"""
+Persistent, thread-safe store for Mambo's learned replies.
+
+Rows live in the chat_memory table so they survive restarts and are shared by every worker.
+Each worker keeps a bounded LRU of entries plus an inverted token index, so a lookup only
+touches entries that share a word with the message. Rows written by other workers are
+pulled in incrementally at most every SYNC_INTERVAL seconds. The watermark is the highest id a
+sync has read, never an id this worker wrote, and each sync re-reads the last SYNC_ID_OVERLAP ids:
+ids are allocated before commit, so a lower id can become visible after a higher one.
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from ..config import settings
+from ..db import SessionLocal
+from ..model import ChatMemory
+
+SYNC_INTERVAL = 5.0
+SYNC_ID_OVERLAP = 100
+MIN_OVERLAP = 2
+
+# Words too common to say two questions are the same
+_STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "you", "your", "we", "it", "is", "are", "do", "does", "can",
+    "to", "of", "in", "on", "for", "and", "or", "how", "what", "where", "when", "please", "this", "that",
+}
+
+
+def tokenize(text: str) -> frozenset[str]:
+    return frozenset(w for w in re.findall(r"\w+", text.lower()) if w not in _STOPWORDS)
+
+
+class LearnedStore:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: OrderedDict[int, tuple[frozenset[str], str, dict | None]] = OrderedDict()
+        self._index: dict[str, set[int]] = {}
+        self._lock = threading.RLock()
+        self._last_id = 0
+        self._seen: set[int] = set()  # ids in the overlap window already loaded or written here
+        self._last_sync = 0.0
+        self._local_seq = 0
+
+    def _insert(self, entry_id: int, user_text: str, bot_reply: str, action: dict | None):
+        tokens = tokenize(user_text)
+        with self._lock:
+            if entry_id in self._entries:
+                return
+            self._entries[entry_id] = (tokens, bot_reply, action)
+            for t in tokens:
+                self._index.setdefault(t, set()).add(entry_id)
+            self._seen.add(entry_id)
+            while len(self._entries) > self.capacity:
+                old_id, (old_tokens, _, _) = self._entries.popitem(last=False)
+                for t in old_tokens:
+                    ids = self._index.get(t)
+                    if ids is not None:
+                        ids.discard(old_id)
+                        if not ids:
+                            del self._index[t]
+
+    def _sync(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_sync < SYNC_INTERVAL:
+            return
+        self._last_sync = now
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(ChatMemory)
+                .filter(ChatMemory.id > self._last_id - SYNC_ID_OVERLAP)
+                .order_by(ChatMemory.id.desc())
+                .limit(self.capacity)
+                .all()
+            )
+            for row in reversed(rows):
+                if row.id not in self._seen:
+                    self._insert(row.id, row.user_text, row.bot_reply, json.loads(row.action) if row.action else None)
+            with self._lock:
+                if rows:
+                    self._last_id = max(self._last_id, rows[0].id)
+                floor = self._last_id - SYNC_ID_OVERLAP
+                self._seen = {i for i in self._seen if i > floor}
+        except Exception:
+            # Table missing or DB unavailable: keep serving from memory
+            pass
+        finally:
+            db.close()
+
+    def add(self, user_text: str, bot_reply: str, action: dict | None):
+        db = SessionLocal()
+        try:
+            row = ChatMemory(user_text=user_text, bot_reply=bot_reply, action=json.dumps(action) if action else None)
+            db.add(row)
+            db.flush()
+            # Ring buffer in the table: ids are monotonic, so keep only the newest `capacity` rows
+            db.query(ChatMemory).filter(ChatMemory.id <= row.id - self.capacity).delete(synchronize_session=False)
+            db.commit()
+            entry_id = row.id
+        except Exception:
+            db.rollback()
+            entry_id = None
+        finally:
+            db.close()
+        if entry_id is None:
+            # Not persisted; keep it locally under a negative id so it never collides with DB rows
+            with self._lock:
+                self._local_seq -= 1
+                entry_id = self._local_seq
+        self._insert(entry_id, user_text, bot_reply, action)
+
+    def lookup(self, message: str) -> tuple[str, dict | None] | None:
+        """Best learned reply sharing at least MIN_OVERLAP words with the message (newest wins ties)."""
+        self._sync()
+        tokens = tokenize(message)
+        with self._lock:
+            overlap: Counter = Counter()
+            for t in tokens:
+                for entry_id in self._index.get(t, ()):
+                    overlap[entry_id] += 1
+            best = max(
+                ((n, entry_id) for entry_id, n in overlap.items() if n >= MIN_OVERLAP),
+                default=None,
+            )
+            if best is None:
+                return None
+            entry_id = best[1]
+            self._entries.move_to_end(entry_id)
+            _, bot_reply, action = self._entries[entry_id]
+            return bot_reply, action
+
+
+learned_store = LearnedStore(settings.CHAT_MEMORY_MAX_ENTRIES)
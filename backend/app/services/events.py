@@ -0,0 +1,95 @@
+"""
+Document lifecycle events: uploaded, ocr_started, ocr_finished, parsed, duplicate_flagged,
+step_approved, approved, rejected, processing_failed.
+
+publish() may be called from any thread (routes, background extraction); subscribers are asyncio
+queues drained by the SSE endpoint. With REDIS_URL set, events go through Redis pub/sub so every
+API replica delivers every event to its own subscribers.
+"""
+import asyncio
+import json
+import threading
+import time
+from ..config import settings
+from .cache import get_redis
+
+_CHANNEL = "dms:document-events"
+_QUEUE_SIZE = 100
+
+
+class EventBroker:
+    def __init__(self):
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+        self._listener: threading.Thread | None = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        self._ensure_listener()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {s for s in self._subscribers if s[1] is not queue}
+
+    def publish(self, event_type: str, document_id: int, **data):
+        event = {"type": event_type, "document_id": document_id, "ts": time.time(), **data}
+        r = get_redis()
+        if r is not None:
+            try:
+                r.publish(_CHANNEL, json.dumps(event, default=str))
+                return
+            except Exception:
+                pass
+        self._dispatch(event)
+
+    def _dispatch(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # Event loop already closed; the subscriber is gone
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        # Slow consumers lose their oldest events rather than blocking publishers
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def _ensure_listener(self):
+        if not settings.REDIS_URL or get_redis() is None:
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="dms-events-redis", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        import redis
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    return
+            try:
+                # Own connection without a read timeout: pubsub blocks until a message arrives
+                client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.5)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_CHANNEL)
+                for message in pubsub.listen():
+                    self._dispatch(json.loads(message["data"]))
+            except Exception:
+                time.sleep(1)
+
+
+broker = EventBroker()
+
+
+def publish_event(event_type: str, document_id: int, **data):
+    broker.publish(event_type, document_id, **data)
@@ -1,49 +1,141 @@
-import pytesseract
-from PIL import Image
+from __future__ import annotations
+
+import logging
 import re
 from sqlalchemy.orm import Session
 from ..db import SessionLocal
 from ..model import Document
 from ..config import settings
+from .cache import bump_document_version
+from .events import publish_event
+from .files import generate_thumbnails
+from .anomaly import score_document
+from .search import index_document
+from .vendors import resolve_vendor, vendor_index
+from .metrics import EXTRACTION_PATHS, timed
+from ..log import doc_id_var, stage_timer
 import json
-import os
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .ocr import OcrLine
+
+logger = logging.getLogger(__name__)
 
 # NOTE: This is a simple extraction pipeline stub. Replace OpenAI parsing with your API key and logic.
 
-def ocr_extract_text(file_path: str) -> str:
+def _pdf_text_layer(file_path: str) -> str:
+    text = ""
+    try:
+        import PyPDF2
+        with open(file_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            for page in reader.pages:
+                part = page.extract_text()
+                if part:
+                    text += part + "\n"
+    except Exception:
+        pass
+    return text
+
+
+def _required_fields() -> list[str]:
+    return [f.strip() for f in settings.EXTRACTION_REQUIRED_FIELDS.split(",") if f.strip()]
+
+
+def _field_confidence(lines: list[OcrLine], parsed: dict) -> dict[str, float]:
+    """OCR confidence of the line each parsed value was read from (0 if it cannot be located)."""
+    confidence = {}
+    for field, value in parsed.items():
+        if value in (None, ""):
+            continue
+        if isinstance(value, float):
+            needles = {f"{value:,.2f}", f"{value:.2f}"}
+        else:
+            needles = {str(value).replace(" ", "")}
+        confidence[field] = max(
+            (line.confidence for line in lines if any(n in line.text.replace(" ", "") for n in needles)),
+            default=0.0,
+        )
+    return confidence
+
+
+def _fields_complete(lines: list[OcrLine], text: str) -> bool:
+    """Every required field parsed from text, each from a line read at EXTRACTION_MIN_CONFIDENCE or better."""
+    confidence = _field_confidence(lines, simple_parse(text))
+    return all(confidence.get(f, 0.0) >= settings.EXTRACTION_MIN_CONFIDENCE for f in _required_fields())
+
+
+def _ocr_pdf(file_path: str, durations: dict) -> tuple[str, str]:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    from .ocr import ocr_image
+
+    def render(page: int):
+        # Render straight at the OCR resolution instead of resampling afterwards
+        return convert_from_path(
+            file_path, dpi=settings.OCR_TARGET_DPI, grayscale=True, first_page=page, last_page=page,
+        )[0]
+
+    page_count = int(pdfinfo_from_path(file_path).get("Pages", 1))
+    progressive = settings.EXTRACTION_MODE == "progressive"
+    first = ocr_image(render(1), durations=durations)
+    if page_count == 1:
+        return first.text, "first_page"
+    if progressive and _fields_complete(first.lines, first.text):
+        return first.text, "first_page"
+
+    if progressive:
+        # Supplier header and totals/VAT sit at the top and bottom of the last page
+        last = render(page_count)
+        width, height = last.size
+        regions = [last.crop((0, 0, width, int(height * 0.25))), last.crop((0, int(height * 0.6), width, height))]
+        lines, texts = list(first.lines), [first.text]
+        for region in regions:
+            page = ocr_image(region, durations=durations)
+            lines += page.lines
+            texts.append(page.text)
+        text = "\n".join(texts)
+        if _fields_complete(lines, text):
+            return text, "first_page+last_regions"
+
+    texts = [first.text]
+    for number in range(2, page_count + 1):
+        texts.append(ocr_image(render(number), durations=durations).text)
+    return "\n".join(texts), "all_pages"
+
+
+@timed("ocr")
+def extract_text(file_path: str, durations: dict | None = None) -> tuple[str, str]:
+    """Text to parse and the extraction path taken; OCR stage timings go into `durations`.
+
+    Paths: text_layer (PDF text, no OCR), image, first_page, first_page+last_regions
+    (progressive mode stopped early), all_pages, failed.
+    """
+    durations = {} if durations is None else durations
     try:
         # Handle PDF files: fast path first (PyPDF2 text), then OCR only if needed
         if file_path.lower().endswith('.pdf'):
-            text = ""
-            try:
-                import PyPDF2
-                with open(file_path, 'rb') as f:
-                    reader = PyPDF2.PdfReader(f)
-                    for page in reader.pages:
-                        part = page.extract_text()
-                        if part:
-                            text += part + "\n"
-            except Exception:
-                pass
+            text = _pdf_text_layer(file_path)
             if text and len(text.strip()) >= 30:
-                return text
+                return text, "text_layer"
             try:
-                from pdf2image import convert_from_path
-                images = convert_from_path(file_path)
-                text = ""
-                for img in images:
-                    text += pytesseract.image_to_string(img) + "\n"
-                return text or ""
-            except Exception:
-                return text or ""
+                return _ocr_pdf(file_path, durations)
+            except Exception as e:
+                logger.warning("PDF OCR failed for %s: %s", file_path, e)
+                return text or "", "failed"
 
         # Handle image files
-        img = Image.open(file_path).convert("L")
-        return pytesseract.image_to_string(img) or ""
+        from PIL import Image
+        from .ocr import ocr_image
+
+        with Image.open(file_path) as img:
+            return ocr_image(img, durations=durations).text or "", "image"
     except Exception as e:
-        print(f"OCR Error: {e}")
-        return ""
+        logger.warning("OCR failed for %s: %s", file_path, e)
+        return "", "failed"
 
+@timed("parse")
 def simple_parse(text: str) -> dict:
     """Improved parsing with multiple patterns - vendor, date, amount, VAT, invoice number per spec."""
     if not text:
@@ -151,22 +243,37 @@ def simple_parse(text: str) -> dict:
         "date": date_str
     }
 
+@timed("process_document")
 def process_document_file(doc_id: int, file_path: str):
     db = SessionLocal()
+    doc_token = doc_id_var.set(doc_id)
+    durations: dict[str, float] = {}
     try:
         doc = db.query(Document).get(doc_id)
         if not doc:
-            print(f"Document {doc_id} not found")
+            logger.warning("Document not found")
             return
         
-        print(f"Processing document {doc_id}: {file_path}")
-        text = ocr_extract_text(file_path)
+        logger.info("Processing document", extra={"file_path": file_path})
+        publish_event("ocr_started", doc_id)
+        with stage_timer(durations, "ocr"):
+            text, path = extract_text(file_path, durations)
         doc.raw_text = text
+        doc.extraction_path = path
+        EXTRACTION_PATHS.inc(path=path)
+        publish_event("ocr_finished", doc_id, chars=len(text or ""), extraction_path=path)
+        try:
+            with stage_timer(durations, "thumbnails"):
+                generate_thumbnails(doc_id, file_path)
+        except Exception as e:
+            # Previews are optional; the thumbnail endpoint retries on first view
+            logger.warning("Thumbnail generation failed: %s", e)
         
         if not text or len(text.strip()) < 10:
-            print(f"Warning: Extracted text is too short or empty for document {doc_id}")
+            logger.warning("Extracted text is too short or empty", extra={"chars": len(text or "")})
         
         parsed = {}
+        extract_started = time.perf_counter()
         # If OpenAI key present, use OpenAI to parse structured JSON (new client API)
         if settings.OPENAI_API_KEY and (text or "").strip():
             try:
@@ -177,11 +284,12 @@ def process_document_file(doc_id: int, file_path: str):
                     "vendor (string), invoice_number (string), date (YYYY-MM-DD), amount (number), vat (number). "
                     "If a value is missing use null. No markdown or explanation.\n\n" + (text or "")
                 )
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0,
-                )
+                with timed("llm_extract"):
+                    resp = client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0,
+                    )
                 content = (resp.choices[0].message.content or "").strip()
                 # Strip markdown code blocks if present
                 if content.startswith("```"):
@@ -189,44 +297,46 @@ def process_document_file(doc_id: int, file_path: str):
                     content = re.sub(r"\s*```$", "", content)
                 parsed = json.loads(content) if content else {}
                 if isinstance(parsed, dict):
-                    print(f"OpenAI extraction successful for document {doc_id}")
+                    logger.info("OpenAI extraction succeeded")
                 else:
                     parsed = simple_parse(text)
             except Exception as e:
-                print(f"OpenAI extraction failed for document {doc_id}: {e}")
+                logger.warning("OpenAI extraction failed, falling back to simple parse: %s", e)
                 parsed = simple_parse(text) if (text or "").strip() else {}
         else:
             parsed = simple_parse(text) if (text or "").strip() else {}
-            print(f"Simple parse results for document {doc_id}: {parsed}")
+            logger.debug("Simple parse finished", extra={"fields": sorted(k for k, v in parsed.items() if v)})
+        durations["extract"] = round((time.perf_counter() - extract_started) * 1000, 1)
         
         # Update document fields
         if parsed.get("vendor"):
             doc.vendor = parsed.get("vendor")
-            print(f"  Vendor: {doc.vendor}")
+            doc.vendor_id = resolve_vendor(db, doc.vendor)
+            logger.debug("Extracted field", extra={"field": "vendor", "value": doc.vendor, "sampled": True})
         
         if parsed.get("invoice_number"):
             doc.invoice_number = parsed.get("invoice_number")
-            print(f"  Invoice #: {doc.invoice_number}")
+            logger.debug("Extracted field", extra={"field": "invoice_number", "value": doc.invoice_number, "sampled": True})
         
         try:
             amt = parsed.get("amount")
             if amt is not None and amt != "":
                 doc.amount = float(amt)
-                print(f"  Amount: {doc.amount}")
+                logger.debug("Extracted field", extra={"field": "amount", "value": doc.amount, "sampled": True})
         except Exception as e:
-            print(f"  Error parsing amount: {e}")
+            logger.warning("Could not parse amount: %s", e, extra={"field": "amount"})
         
         try:
             vat_val = parsed.get("vat")
             if vat_val is not None and vat_val != "":
                 doc.vat = float(vat_val)
-                print(f"  VAT: {doc.vat}")
+                logger.debug("Extracted field", extra={"field": "vat", "value": doc.vat, "sampled": True})
             elif doc.amount is not None and doc.amount > 0:
                 # Ensure VAT (15%) is set for reports when not extracted from document
                 doc.vat = round(float(doc.amount) * 0.15, 2)
-                print(f"  VAT (15% of amount): {doc.vat}")
+                logger.debug("Derived VAT at 15% of amount", extra={"field": "vat", "value": doc.vat, "sampled": True})
         except Exception as e:
-            print(f"  Error parsing VAT: {e}")
+            logger.warning("Could not parse VAT: %s", e, extra={"field": "vat"})
         
         # Invoice date
         if parsed.get("date"):
@@ -240,28 +350,77 @@ def process_document_file(doc_id: int, file_path: str):
                 elif re.match(r"\d{1,2}/\d{1,2}/\d{2}", d):
                     doc.date = dt.strptime(d, "%m/%d/%y")
                 if doc.date:
-                    print(f"  Date: {doc.date}")
+                    logger.debug("Extracted field", extra={"field": "date", "value": doc.date, "sampled": True})
             except Exception as e:
-                print(f"  Error parsing date: {e}")
+                logger.warning("Could not parse date: %s", e, extra={"field": "date"})
         
         # Duplicate detection: invoice number match first, then vendor + amount (per spec)
-        if doc.invoice_number:
-            existing = db.query(Document).filter(Document.invoice_number == doc.invoice_number, Document.id != doc.id).first()
-            if existing:
-                doc.is_duplicate = True
-                print(f"  Duplicate detected by invoice number")
-        elif doc.vendor and doc.amount:
-            existing = db.query(Document).filter(Document.vendor == doc.vendor, Document.amount == doc.amount, Document.id != doc.id).first()
-            if existing:
-                doc.is_duplicate = True
-                print(f"  Duplicate detected by vendor and amount")
+        with timed("duplicate_check"), stage_timer(durations, "duplicate_check"):
+            if doc.invoice_number:
+                existing = db.query(Document).filter(Document.invoice_number == doc.invoice_number, Document.id != doc.id).first()
+                if existing:
+                    doc.is_duplicate = True
+                    logger.info("Duplicate detected", extra={"match": "invoice_number", "duplicate_of": existing.id})
+            elif doc.vendor_id and doc.amount:
+                existing = db.query(Document).filter(Document.vendor_id == doc.vendor_id, Document.amount == doc.amount, Document.id != doc.id).first()
+                if existing:
+                    doc.is_duplicate = True
+                    logger.info("Duplicate detected", extra={"match": "vendor_amount", "duplicate_of": existing.id})
+
+        with stage_timer(durations, "anomaly_score"):
+            score_document(db, doc)
         
         db.commit()
-        print(f"Successfully processed document {doc_id}")
+        if doc.vendor_id:
+            vendor_index.count_document(doc.vendor_id)
+        try:
+            with timed("search_index"), stage_timer(durations, "search_index"):
+                index_document(db, doc)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Search indexing failed: %s", e)
+        bump_document_version()
+        publish_event(
+            "parsed", doc_id,
+            vendor=doc.vendor, invoice_number=doc.invoice_number, amount=doc.amount, vat=doc.vat,
+        )
+        if doc.is_duplicate:
+            publish_event("duplicate_flagged", doc_id, invoice_number=doc.invoice_number)
+        logger.info(
+            "Document processed",
+            extra={
+                "durations_ms": durations,
+                "extraction_path": doc.extraction_path,
+                "is_duplicate": bool(doc.is_duplicate),
+            },
+        )
     except Exception as e:
         db.rollback()
-        print(f"Error processing document {doc_id}: {e}")
-        import traceback
-        traceback.print_exc()
+        publish_event("processing_failed", doc_id, error=str(e))
+        logger.exception("Document processing failed", extra={"durations_ms": durations})
     finally:
         db.close()
+        doc_id_var.reset(doc_token)
+
+
+_extraction_limiter = None
+
+
+async def run_extraction(func, *args):
+    """Background task: run a blocking extraction job in a thread, EXTRACTION_CONCURRENCY at a time per worker.
+
+    Queued jobs wait as coroutines rather than parked threads, so an upload burst cannot take
+    the shared threadpool away from API requests.
+    """
+    import anyio
+
+    global _extraction_limiter
+    if _extraction_limiter is None:
+        _extraction_limiter = anyio.CapacityLimiter(max(1, settings.EXTRACTION_CONCURRENCY))
+    await anyio.to_thread.run_sync(func, *args, limiter=_extraction_limiter)
+
+
+def process_document_batch(items: list[tuple[int, str]]):
+    """Extract a batch one document at a time from a single background task."""
+    for doc_id, file_path in items:
+        process_document_file(doc_id, file_path)
@@ -0,0 +1,135 @@
+"""
+Uploaded originals and their page thumbnails on local storage.
+
+Thumbnails are small JPEGs of the first THUMBNAIL_MAX_PAGES pages, written to THUMBNAIL_DIR as
+<doc_id>_p<page>.jpg during extraction (or on the first request for documents uploaded before
+that), so the approval screens never rasterise a PDF just to show a preview.
+
+Originals of finalised documents are eventually moved to the cold store, ARCHIVE_DIR (which can
+be a cheaper volume than UPLOAD_DIR). There they are gzipped as <name>.gz, or kept as they are
+when gzip would save less than 10% (most JPEGs and many PDFs). Thumbnails stay where they are.
+"""
+import gzip
+import os
+import shutil
+import struct
+import tempfile
+from contextlib import contextmanager
+from ..config import settings
+
+_MIN_GZIP_RATIO = 0.9
+_CHUNK = 1024 * 1024
+
+
+def original_path(filename: str | None) -> str | None:
+    """Path of an uploaded file in UPLOAD_DIR, or None if it is missing. Never leaves UPLOAD_DIR."""
+    if not filename:
+        return None
+    path = os.path.join(settings.UPLOAD_DIR, os.path.basename(filename))
+    return path if os.path.isfile(path) else None
+
+
+def archive_dir() -> str:
+    return settings.ARCHIVE_DIR or os.path.join(settings.UPLOAD_DIR, "archive")
+
+
+def archived_path(filename: str | None) -> str | None:
+    """Path of an original in the cold store (<name>.gz or <name>), or None if it is not there."""
+    if not filename:
+        return None
+    base = os.path.join(archive_dir(), os.path.basename(filename))
+    for path in (base + ".gz", base):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def archive_original(filename: str | None) -> str | None:
+    """Move an original from UPLOAD_DIR to the cold store; returns its new path, None if it is missing."""
+    source = original_path(filename)
+    if not source:
+        return archived_path(filename)
+    os.makedirs(archive_dir(), exist_ok=True)
+    target = os.path.join(archive_dir(), os.path.basename(filename))
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(source, "rb") as src, open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, _CHUNK)
+    if os.path.getsize(tmp) < os.path.getsize(source) * _MIN_GZIP_RATIO:
+        target += ".gz"
+    else:
+        shutil.copyfile(source, tmp)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    # Rename into place before deleting the source, so the file is always in one of the two stores
+    os.replace(tmp, target)
+    os.remove(source)
+    return target
+
+
+def gzip_size(path: str) -> int:
+    """Uncompressed size of a single-member gzip file under 4 GiB (from its trailer)."""
+    with open(path, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+
+def iter_gzip(path: str, chunk_size: int = 64 * 1024):
+    with gzip.open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+@contextmanager
+def local_original(filename: str | None):
+    """A readable path to the original, hot or cold (decompressed to a temporary file); None if missing."""
+    path = original_path(filename) or archived_path(filename)
+    if path is None or not path.endswith(".gz"):
+        yield path
+        return
+    fd, tmp = tempfile.mkstemp(suffix=os.path.splitext(os.path.basename(filename))[1])
+    try:
+        with os.fdopen(fd, "wb") as dst, gzip.open(path, "rb") as src:
+            shutil.copyfileobj(src, dst, _CHUNK)
+        yield tmp
+    finally:
+        os.remove(tmp)
+
+
+def thumbnail_dir() -> str:
+    return settings.THUMBNAIL_DIR or os.path.join(settings.UPLOAD_DIR, "thumbnails")
+
+
+def thumbnail_path(doc_id: int, page: int = 1) -> str:
+    return os.path.join(thumbnail_dir(), f"{doc_id}_p{page}.jpg")
+
+
+def _page_images(file_path: str) -> list:
+    from PIL import Image, ImageOps
+
+    if file_path.lower().endswith(".pdf"):
+        from pdf2image import convert_from_path
+
+        # pdftoppm renders straight to the target width instead of a full-resolution page
+        return convert_from_path(
+            file_path, first_page=1, last_page=settings.THUMBNAIL_MAX_PAGES,
+            size=(settings.THUMBNAIL_WIDTH, None),
+        )
+    with Image.open(file_path) as img:
+        img.draft("RGB", (settings.THUMBNAIL_WIDTH, settings.THUMBNAIL_WIDTH * 4))  # JPEG: decode at reduced scale
+        return [ImageOps.exif_transpose(img)]
+
+
+def generate_thumbnails(doc_id: int, file_path: str) -> int:
+    """Write JPEG thumbnails for the first pages of file_path; returns how many were written."""
+    os.makedirs(thumbnail_dir(), exist_ok=True)
+    pages = _page_images(file_path)
+    for page, img in enumerate(pages, start=1):
+        img = img.convert("L") if img.mode in ("1", "L", "LA", "I", "I;16") else img.convert("RGB")
+        img.thumbnail((settings.THUMBNAIL_WIDTH, settings.THUMBNAIL_WIDTH * 4))
+        path = thumbnail_path(doc_id, page)
+        # Write then rename, so a concurrent request never serves a half-written file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        img.save(tmp, "JPEG", quality=settings.THUMBNAIL_QUALITY, optimize=True)
+        os.replace(tmp, path)
+    return len(pages)
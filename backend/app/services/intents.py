@@ -0,0 +1,67 @@
+"""
+Compiled intent classifier for Mambo's rule-based fallback.
+
+Intents come from intents.json. All keywords are compiled into one regex with word boundaries
+(one named group per keyword), so a message is scanned once regardless of how many intents exist.
+Each match adds its keyword weight to its intent; the highest score wins and ties go to the
+intent listed first in the table.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass
+
+_TABLE_PATH = os.path.join(os.path.dirname(__file__), "intents.json")
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    reply: str
+    action: dict | None
+
+
+def _keyword_pattern(keyword: str) -> str:
+    prefix = keyword.endswith("*")
+    words = keyword.rstrip("*").split()
+    pattern = r"\s+".join(re.escape(w) for w in words)
+    return rf"\b{pattern}\w*" if prefix else rf"\b{pattern}\b"
+
+
+class IntentClassifier:
+    def __init__(self, table: dict):
+        self.fallback: str = table["fallback"]
+        self.intents: list[Intent] = []
+        self._groups: list[tuple[int, float]] = []  # group index -> (intent index, weight)
+        parts = []
+        for i, spec in enumerate(table["intents"]):
+            self.intents.append(Intent(spec["name"], spec["reply"], spec.get("action")))
+            for keyword, weight in spec["keywords"].items():
+                parts.append(f"(?P<k{len(self._groups)}>{_keyword_pattern(keyword.lower())})")
+                self._groups.append((i, float(weight)))
+        self._regex = re.compile("|".join(parts), re.IGNORECASE)
+
+    def _totals(self, message: str) -> list[float]:
+        totals = [0.0] * len(self.intents)
+        for m in self._regex.finditer(message):
+            intent_idx, weight = self._groups[int(m.lastgroup[1:])]
+            totals[intent_idx] += weight
+        return totals
+
+    def scores(self, message: str) -> dict[str, float]:
+        return {self.intents[i].name: s for i, s in enumerate(self._totals(message)) if s}
+
+    def classify(self, message: str) -> Intent | None:
+        totals = self._totals(message)
+        best = max(range(len(totals)), key=lambda i: (totals[i], -i), default=None)
+        if best is None or totals[best] <= 0:
+            return None
+        return self.intents[best]
+
+
+def load_classifier(path: str = _TABLE_PATH) -> IntentClassifier:
+    with open(path, encoding="utf-8") as f:
+        return IntentClassifier(json.load(f))
+
+
+classifier = load_classifier()
@@ -0,0 +1,189 @@
+"""
+Minimal Prometheus-style metrics: counters, gauges and histograms rendered in the text exposition
+format on GET /metrics.
+
+Values are per process; with several workers, scrape each one or aggregate in Prometheus.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._functions: dict[tuple, Callable[[], float]] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, fn, **labels):
+        """Read the value from fn() at scrape time."""
+        self._functions[self._key(labels)] = fn
+
+    def render(self) -> list[str]:
+        for key, fn in list(self._functions.items()):
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            with self._lock:
+                self._values[key] = value
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for key, series in items:
+            names = self.labels + ("le",)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_label_str(names, key + (bound,))} {count}")
+            lines.append(f"{self.name}_bucket{_label_str(names, key + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {series[-1]}")
+        return lines
+
+
+def render_latest() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("dms_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("dms_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("dms_http_requests_in_flight", "HTTP requests currently being served", ("method", "route"))
+STAGE_LATENCY = Histogram(
+    "dms_stage_duration_seconds",
+    "Time spent in pipeline stages (ocr, parse, llm_extract, duplicate_check, chat_llm, ...)",
+    ("stage",),
+)
+DB_QUERY_LATENCY = Histogram("dms_db_query_duration_seconds", "SQL statement latency by operation", ("operation",))
+REPORT_CACHE = Counter("dms_report_cache_requests_total", "Report cache lookups", ("result",))
+EXTRACTION_PATHS = Counter(
+    "dms_extraction_path_total", "Documents by extraction path (text_layer, first_page, all_pages, ...)", ("path",),
+)
+
+ADMISSION_IN_FLIGHT = Gauge("dms_admission_in_flight", "Admitted requests in progress by cost class", ("cost_class",))
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "dms_admission_queue_depth", "Requests waiting for a global slot in this worker, by cost class", ("cost_class",),
+)
+ADMISSION_REJECTED = Counter(
+    "dms_admission_rejected_total", "Requests shed with 429 by cost class and reason", ("cost_class", "reason"),
+)
+ADMISSION_WAIT = Histogram("dms_admission_wait_seconds", "Time admitted requests spent queued", ("cost_class",))
+
+
+def timed(stage: str):
+    """Context manager recording the duration of a pipeline stage."""
+    return STAGE_LATENCY.time(stage=stage)
+
+
+def instrument_engine(engine):
+    """Time every SQL statement on this engine through SQLAlchemy cursor events."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("dms_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["dms_query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_LATENCY.observe(time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("dms_query_start"):
+            conn.info["dms_query_start"].pop()
@@ -0,0 +1,236 @@
+"""
+Image preprocessing and Tesseract OCR for scanned invoices.
+
+Phone photos and scans arrive oversized, noisy, rotated and slightly skewed, and Tesseract
+spends most of its time on that. Before OCR each page goes through these steps:
+
+    downscale    resample to OCR_TARGET_DPI (DPI from the file, else assumed A4 width)
+    orientation  Tesseract OSD; rotates pages that are sideways or upside down
+    denoise      3x3 median filter against speckle (off by default: costs ~0.3s per 300 DPI page)
+    binarize     global Otsu threshold
+    deskew       projection-profile search within +/- OCR_DESKEW_MAX_ANGLE degrees
+    crop         trim blank margins
+
+OCR_PREPROCESS_STEPS selects which steps run. The page is read with image_to_data, so every
+line keeps its box and confidence. Low-confidence numbers on total/VAT lines are read again
+with a digits-only whitelist.
+"""
+import re
+from dataclasses import dataclass, field
+from PIL import Image, ImageFilter, ImageOps
+from ..config import settings
+from ..log import stage_timer
+
+STEPS = ("downscale", "orientation", "denoise", "binarize", "deskew", "crop")
+NUMERIC_CONFIG = "--oem 1 --psm 7 -c tessedit_char_whitelist=0123456789.,"
+_A4_WIDTH_INCHES = 8.27
+_AMOUNT_LINE = re.compile(r"\b(total|amount|balance|sum|vat|tax|gst)\b", re.I)
+_NUMBER = re.compile(r"\d[\d,]*\.?\d*")
+
+
+@dataclass
+class OcrLine:
+    text: str
+    confidence: float  # mean word confidence, 0-100
+    box: tuple[int, int, int, int]  # left, top, right, bottom in the preprocessed image
+    words: list[tuple[str, float, int]] = field(default_factory=list, repr=False)  # (text, confidence, left)
+
+
+@dataclass
+class OcrPage:
+    lines: list[OcrLine] = field(default_factory=list)
+    width: int = 0
+    height: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.text for line in self.lines)
+
+    @property
+    def confidence(self) -> float:
+        return sum(l.confidence for l in self.lines) / len(self.lines) if self.lines else 0.0
+
+
+def configured_steps() -> tuple[str, ...]:
+    return tuple(s.strip() for s in settings.OCR_PREPROCESS_STEPS.split(",") if s.strip() in STEPS)
+
+
+def _downscale(img: Image.Image, target_dpi: int) -> Image.Image:
+    dpi = img.info.get("dpi", (0, 0))[0] or img.width / _A4_WIDTH_INCHES
+    scale = target_dpi / float(dpi)
+    # Only resample when it matters; never blow small images up more than 2x
+    if 0.9 <= scale <= 1.1:
+        return img
+    scale = min(scale, 2.0)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+
+def _orientation(img: Image.Image) -> Image.Image:
+    import pytesseract
+
+    try:
+        osd = pytesseract.image_to_osd(img, config="--psm 0 -c min_characters_to_try=5")
+    except pytesseract.TesseractError:
+        # Too little text to decide; leave the page as it is
+        return img
+    m = re.search(r"Rotate:\s*(\d+)", osd)
+    rotate = int(m.group(1)) if m else 0
+    # OSD reports the clockwise rotation needed; PIL rotates counter-clockwise
+    return img.rotate(-rotate, expand=True, fillcolor=255) if rotate else img
+
+
+def _otsu_threshold(img: Image.Image) -> int:
+    hist = img.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = weight_bg = 0
+    best, threshold = -1.0, 127
+    for t in range(256):
+        weight_bg += hist[t]
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * hist[t]
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, t
+    return threshold
+
+
+def _binarize(img: Image.Image) -> Image.Image:
+    threshold = _otsu_threshold(img)
+    return img.point(lambda p: 255 if p > threshold else 0)
+
+
+def _skew_angle(img: Image.Image, max_angle: float) -> float:
+    """Angle whose rotation makes text rows sharpest (largest row-to-row ink differences)."""
+    import numpy as np
+
+    thumb = img.copy()
+    thumb.thumbnail((600, 600))
+    thumb = ImageOps.invert(thumb)
+
+    def score(angle: float) -> float:
+        rows = np.asarray(thumb.rotate(angle, fillcolor=0), dtype=np.float32).sum(axis=1)
+        return float(np.sum(np.diff(rows) ** 2))
+
+    coarse = max(np.arange(-max_angle, max_angle + 0.01, 1.0), key=score)
+    return float(max(np.arange(coarse - 0.8, coarse + 0.81, 0.2), key=score))
+
+
+def _deskew(img: Image.Image, max_angle: float, binary: bool) -> Image.Image:
+    angle = _skew_angle(img, max_angle)
+    if abs(angle) < 0.15:
+        return img
+    # Interpolating a black/white page only blurs it; nearest is ~10x faster at 300 DPI
+    return img.rotate(angle, resample=Image.NEAREST if binary else Image.BILINEAR, expand=True, fillcolor=255)
+
+
+def _crop(img: Image.Image, margin: int = 16) -> Image.Image:
+    bbox = ImageOps.invert(img).getbbox()
+    if not bbox:
+        return img
+    left, top, right, bottom = bbox
+    return img.crop((
+        max(0, left - margin), max(0, top - margin),
+        min(img.width, right + margin), min(img.height, bottom + margin),
+    ))
+
+
+def preprocess(img: Image.Image, steps: tuple[str, ...] | None = None, durations: dict | None = None) -> Image.Image:
+    """Run the selected preprocessing steps in order, timing each into durations["ocr.<step>"]."""
+    steps = configured_steps() if steps is None else steps
+    durations = {} if durations is None else durations
+    with stage_timer(durations, "ocr.load"):
+        img = ImageOps.exif_transpose(img).convert("L")
+    for step in STEPS:
+        if step not in steps:
+            continue
+        with stage_timer(durations, f"ocr.{step}"):
+            if step == "downscale":
+                img = _downscale(img, settings.OCR_TARGET_DPI)
+            elif step == "orientation":
+                img = _orientation(img)
+            elif step == "denoise":
+                img = img.filter(ImageFilter.MedianFilter(3))
+            elif step == "binarize":
+                img = _binarize(img)
+            elif step == "deskew":
+                img = _deskew(img, settings.OCR_DESKEW_MAX_ANGLE, binary="binarize" in steps)
+            elif step == "crop":
+                img = _crop(img)
+    return img
+
+
+def _lines_from_data(data: dict) -> list[OcrLine]:
+    grouped: dict[tuple, list[int]] = {}
+    for i, word in enumerate(data["text"]):
+        if word and word.strip():
+            key = (data["page_num"][i], data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            grouped.setdefault(key, []).append(i)
+    lines = []
+    for idx in grouped.values():
+        confs = [float(data["conf"][i]) for i in idx if float(data["conf"][i]) >= 0]
+        lines.append(OcrLine(
+            text=" ".join(data["text"][i].strip() for i in idx),
+            confidence=sum(confs) / len(confs) if confs else 0.0,
+            box=(
+                min(data["left"][i] for i in idx),
+                min(data["top"][i] for i in idx),
+                max(data["left"][i] + data["width"][i] for i in idx),
+                max(data["top"][i] + data["height"][i] for i in idx),
+            ),
+            words=[(data["text"][i].strip(), float(data["conf"][i]), data["left"][i]) for i in idx],
+        ))
+    return lines
+
+
+def _reread_numbers(img: Image.Image, line: OcrLine, min_confidence: float) -> None:
+    """Re-OCR the trailing amount on a total/VAT line with a digits-only whitelist when it read poorly."""
+    import pytesseract
+
+    words = line.words
+    end = len(words)
+    while end and not _NUMBER.search(words[end - 1][0]):
+        end -= 1
+    start = end
+    while start and _NUMBER.search(words[start - 1][0]):
+        start -= 1
+    if start == end or min(w[1] for w in words[start:end]) >= min_confidence:
+        return
+    _, top, right, bottom = line.box
+    crop = img.crop((max(0, words[start][2] - 4), max(0, top - 4), min(img.width, right + 4), min(img.height, bottom + 4)))
+    digits = pytesseract.image_to_string(crop, config=NUMERIC_CONFIG).strip()
+    if _NUMBER.fullmatch(digits.replace(" ", "")):
+        line.text = " ".join([w[0] for w in words[:start]] + [digits.replace(" ", "")] + [w[0] for w in words[end:]])
+
+
+def ocr_image(
+    img: Image.Image,
+    steps: tuple[str, ...] | None = None,
+    durations: dict | None = None,
+    config: str | None = None,
+) -> OcrPage:
+    """Preprocess and OCR one page image."""
+    import pytesseract
+
+    durations = {} if durations is None else durations
+    img = preprocess(img, steps, durations)
+    with stage_timer(durations, "ocr.tesseract"):
+        data = pytesseract.image_to_data(
+            img, config=settings.OCR_TESSERACT_CONFIG if config is None else config,
+            output_type=pytesseract.Output.DICT,
+        )
+    page = OcrPage(lines=_lines_from_data(data), width=img.width, height=img.height)
+    threshold = settings.OCR_NUMERIC_REREAD_CONFIDENCE
+    if threshold > 0:
+        with stage_timer(durations, "ocr.numeric_reread"):
+            for line in page.lines:
+                if _AMOUNT_LINE.search(line.text):
+                    _reread_numbers(img, line, threshold)
+    return page
@@ -0,0 +1,136 @@
+"""
+Semantic cache for Mambo's LLM replies.
+
+Messages are turned into sparse hashed feature vectors (words plus in-word character trigrams,
+so inflections like invoice/invoices still score partially) and compared by cosine similarity through an inverted index over
+features. The previous user turn is mixed in at a lower weight, so a follow-up like "and how do
+I export it?" only hits entries asked in a similar context. Entries expire after a TTL and the
+least recently used one is evicted when the cache is full.
+"""
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from ..config import settings
+from .metrics import Gauge
+
+_BUCKETS = 1 << 18
+_TRIGRAM_WEIGHT = 0.3
+_HISTORY_WEIGHT = 0.25
+_STOPWORD_WEIGHT = 0.2
+# Function words carry little meaning; down-weight them so "how do I upload" is not close to "how do I approve"
+_STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "you", "your", "we", "it", "is", "are", "do", "does", "can", "could",
+    "to", "of", "in", "on", "for", "and", "or", "how", "what", "where", "when", "please", "this", "that",
+}
+
+
+def normalise(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def _h(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % _BUCKETS
+
+
+def _raw_features(text: str) -> Counter:
+    feats: Counter = Counter()
+    for w in normalise(text).split():
+        weight = _STOPWORD_WEIGHT if w in _STOPWORDS else 1.0
+        feats[_h("w:" + w)] += weight
+        padded = f"<{w}>"
+        for i in range(len(padded) - 2):
+            feats[_h("c:" + padded[i:i + 3])] += weight * _TRIGRAM_WEIGHT
+    return feats
+
+
+def vectorise(message: str, context: str = "") -> dict[int, float]:
+    feats = _raw_features(message)
+    for k, v in _raw_features(context).items():
+        feats[k] += _HISTORY_WEIGHT * v
+    norm = math.sqrt(sum(v * v for v in feats.values()))
+    return {k: v / norm for k, v in feats.items()} if norm else {}
+
+
+class ReplyCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: OrderedDict[int, tuple[float, dict[int, float], str, dict | None]] = OrderedDict()
+        self._postings: dict[int, dict[int, float]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, entry_id: int):
+        _, vec, _, _ = self._entries.pop(entry_id)
+        for feat in vec:
+            posting = self._postings.get(feat)
+            if posting is not None:
+                posting.pop(entry_id, None)
+                if not posting:
+                    del self._postings[feat]
+
+    def get(self, message: str, context: str = "") -> tuple[str, dict | None] | None:
+        if self.max_entries <= 0:
+            return None
+        vec = vectorise(message, context)
+        with self._lock:
+            scores: Counter = Counter()
+            for feat, w in vec.items():
+                for entry_id, ew in self._postings.get(feat, {}).items():
+                    scores[entry_id] += w * ew
+            now = time.monotonic()
+            for entry_id, score in scores.most_common():
+                if score < self.threshold:
+                    break
+                expires_at, _, reply, action = self._entries[entry_id]
+                if expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return reply, action
+            self.misses += 1
+            return None
+
+    def set(self, message: str, context: str, reply: str, action: dict | None):
+        if self.max_entries <= 0:
+            return
+        vec = vectorise(message, context)
+        if not vec:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (time.monotonic() + self.ttl_seconds, vec, reply, action)
+            for feat, w in vec.items():
+                self._postings.setdefault(feat, {})[entry_id] = w
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "threshold": self.threshold,
+            }
+
+
+reply_cache = ReplyCache(
+    settings.CHAT_CACHE_MAX_ENTRIES,
+    settings.CHAT_CACHE_TTL_SECONDS,
+    settings.CHAT_CACHE_SIMILARITY,
+)
+
+_CACHE_STATS = Gauge("dms_chat_reply_cache", "Semantic reply cache hits, misses and size in this worker", ("field",))
+for _field in ("hits", "misses", "entries"):
+    _CACHE_STATS.set_function(lambda f=_field: reply_cache.stats()[f], field=_field)
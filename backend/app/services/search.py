@@ -0,0 +1,194 @@
+"""
+Full-text search over OCR raw_text, vendor and invoice number.
+
+Postgres: tsvector column on documents with a GIN index, ranked with ts_rank, snippets from ts_headline.
+SQLite: FTS5 table keyed by document id, ranked with bm25(), snippets from snippet().
+If FTS5 is not compiled into SQLite, search falls back to a LIKE scan ranked in Python.
+The index is updated per document when extraction completes (index_document); app.migrate indexes
+documents that are missing from it (reindex_all). Archived documents stay indexed; on Postgres their
+snippets are made from the archived text (services/archive.py).
+
+Snippets are HTML-escaped OCR text in which only the <mark> tags are markup. The database marks
+matches with control characters, which are swapped for <mark> after escaping.
+"""
+import html
+import re
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from ..model import Document
+from .archive import archived_texts, document_text
+
+_MARK_START, _MARK_END = "<mark>", "</mark>"
+# Placeholders the database puts around matches; OCR text cannot be trusted not to contain <mark>
+_SENTINEL_START, _SENTINEL_END = "\x02", "\x03"
+
+_PG_DDL = [
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_documents_search_vector ON documents USING gin (search_vector)",
+]
+_PG_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(vendor, '') || ' ' || coalesce(invoice_number, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(CAST(:raw AS text), '')), 'B')"
+)
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts "
+    "USING fts5(vendor, invoice_number, raw_text, tokenize='porter unicode61')"
+)
+
+_fts5_available: bool | None = None
+
+
+def _tokens(q: str) -> list[str]:
+    return [t for t in re.findall(r"\w+", q.lower()) if t]
+
+
+def _sqlite_has_fts5(db_or_conn) -> bool:
+    global _fts5_available
+    if _fts5_available is None:
+        try:
+            _fts5_available = bool(
+                db_or_conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar()
+            )
+        except Exception:
+            _fts5_available = False
+    return _fts5_available
+
+
+def _has_index(db: Session) -> bool:
+    dialect = db.get_bind().dialect.name
+    return dialect == "postgresql" or (dialect == "sqlite" and _sqlite_has_fts5(db))
+
+
+def ensure_search_index(engine):
+    """Create the search column/index (Postgres) or FTS5 table (SQLite) if missing."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            for stmt in _PG_DDL:
+                conn.execute(text(stmt))
+        elif engine.dialect.name == "sqlite" and _sqlite_has_fts5(conn):
+            conn.execute(text(_SQLITE_DDL))
+
+
+def index_document(db: Session, doc: Document, commit: bool = True):
+    """(Re)index one document; call after its extracted fields are committed."""
+    dialect = db.get_bind().dialect.name
+    raw = document_text(db, doc)
+    if dialect == "postgresql":
+        db.execute(text(f"UPDATE documents SET search_vector = {_PG_VECTOR} WHERE id = :id"), {"id": doc.id, "raw": raw})
+    elif dialect == "sqlite" and _sqlite_has_fts5(db):
+        db.execute(text("DELETE FROM documents_fts WHERE rowid = :id"), {"id": doc.id})
+        db.execute(
+            text("INSERT INTO documents_fts (rowid, vendor, invoice_number, raw_text) VALUES (:id, :vendor, :inv, :raw)"),
+            {"id": doc.id, "vendor": doc.vendor or "", "inv": doc.invoice_number or "", "raw": raw or ""},
+        )
+    if commit:
+        db.commit()
+
+
+def reindex_all(db: Session, batch_size: int = 500, missing_only: bool = False) -> int:
+    """Index every document, or with missing_only those not in the index yet; returns how many."""
+    if not _has_index(db):
+        return 0
+    query = db.query(Document)
+    if missing_only:
+        # search_vector is not mapped on Document; it is managed by ensure_search_index
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.filter(text("documents.search_vector IS NULL"))
+        else:
+            query = query.filter(text("documents.id NOT IN (SELECT rowid FROM documents_fts)"))
+    count = 0
+    last_id = 0
+    while True:
+        docs = query.filter(Document.id > last_id).order_by(Document.id).limit(batch_size).all()
+        if not docs:
+            return count
+        for doc in docs:
+            index_document(db, doc, commit=False)
+        db.commit()
+        count += len(docs)
+        last_id = docs[-1].id
+
+
+def search_documents(db: Session, q: str, limit: int = 20, skip: int = 0) -> list[tuple[int, float, str]]:
+    """Return (document id, rank, snippet) ordered best first; higher rank is better."""
+    tokens = _tokens(q)
+    if not tokens:
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        rows = db.execute(
+            text(
+                "SELECT d.id, ts_rank(d.search_vector, q) AS rank, "
+                "ts_headline('english', coalesce(d.raw_text, ''), q, :headline) AS snippet "
+                "FROM documents d, (SELECT websearch_to_tsquery('english', :q) || websearch_to_tsquery('simple', :q) AS q) query "
+                "WHERE d.search_vector @@ q ORDER BY rank DESC, d.id DESC LIMIT :limit OFFSET :skip"
+            ),
+            {
+                "q": q, "limit": limit, "skip": skip,
+                "headline": f"StartSel={_SENTINEL_START}, StopSel={_SENTINEL_END}, MaxFragments=2, MaxWords=20, MinWords=5",
+            },
+        )
+        hits = [(r.id, float(r.rank), _escape_marked(r.snippet)) for r in rows]
+        # raw_text of archived documents is NULL, so ts_headline has nothing to mark
+        archived = archived_texts(db, [doc_id for doc_id, _, snippet in hits if not snippet])
+        return [
+            (doc_id, rank, _snippet(archived[doc_id], tokens) if doc_id in archived else snippet)
+            for doc_id, rank, snippet in hits
+        ]
+    if dialect == "sqlite" and _sqlite_has_fts5(db):
+        # Quote each token so user input cannot inject FTS5 query syntax; tokens are ANDed
+        match = " ".join('"' + t.replace('"', '""') + '"' for t in tokens)
+        rows = db.execute(
+            text(
+                "SELECT rowid AS id, bm25(documents_fts, 10.0, 10.0, 1.0) AS rank, "
+                "snippet(documents_fts, 2, :start, :end, '…', 16) AS snippet "
+                "FROM documents_fts WHERE documents_fts MATCH :match ORDER BY rank LIMIT :limit OFFSET :skip"
+            ),
+            {"match": match, "limit": limit, "skip": skip, "start": _SENTINEL_START, "end": _SENTINEL_END},
+        )
+        # bm25() is lower-is-better; flip it so every backend ranks higher-is-better
+        return [(r.id, -float(r.rank), _escape_marked(r.snippet)) for r in rows]
+    return _search_like(db, tokens, limit, skip)
+
+
+def _search_like(db: Session, tokens: list[str], limit: int, skip: int) -> list[tuple[int, float, str]]:
+    # Archived documents only match on vendor and invoice number here
+    query = db.query(Document.id, Document.vendor, Document.invoice_number, Document.raw_text)
+    for t in tokens:
+        pattern = f"%{t}%"
+        query = query.filter(
+            Document.raw_text.ilike(pattern) | Document.vendor.ilike(pattern) | Document.invoice_number.ilike(pattern)
+        )
+    scored = []
+    for r in query:
+        haystack = " ".join(filter(None, [r.vendor, r.invoice_number, r.raw_text])).lower()
+        scored.append((r.id, float(sum(haystack.count(t) for t in tokens)), _snippet(r.raw_text or "", tokens)))
+    scored.sort(key=lambda x: (x[1], x[0]), reverse=True)
+    return scored[skip:skip + limit]
+
+
+def _escape_marked(snippet: str | None) -> str | None:
+    """HTML-escape a snippet the database marked with the sentinels, then turn them into <mark>."""
+    if snippet is None:
+        return None
+    # Sentinels that were already in the OCR text would otherwise unbalance the tags
+    marked = snippet.count(_SENTINEL_START) == snippet.count(_SENTINEL_END)
+    escaped = html.escape(snippet)
+    if not marked:
+        return escaped.replace(_SENTINEL_START, "").replace(_SENTINEL_END, "")
+    return escaped.replace(_SENTINEL_START, _MARK_START).replace(_SENTINEL_END, _MARK_END)
+
+
+def _snippet(raw: str, tokens: list[str], width: int = 80) -> str:
+    lower = raw.lower()
+    pos = min((p for p in (lower.find(t) for t in tokens) if p >= 0), default=0)
+    start = max(0, pos - width // 2)
+    fragment = raw[start:start + width]
+    # Find matches in the raw text and escape around them, so a token cannot match inside an entity
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(tokens, key=len, reverse=True)), re.I)
+    parts, end = [], 0
+    for m in pattern.finditer(fragment):
+        parts += [html.escape(fragment[end:m.start()]), _MARK_START, html.escape(m.group()), _MARK_END]
+        end = m.end()
+    parts.append(html.escape(fragment[end:]))
+    return ("…" if start else "") + "".join(parts) + ("…" if start + width < len(raw) else "")
@@ -0,0 +1,272 @@
+"""
+Vendor dimension: each extracted vendor string is mapped to a canonical Vendor.
+
+Spellings are compared by vendor_key(), which lower-cases and strips accents and punctuation
+and drops trailing legal suffixes. "ACME Widgets (Pty) Ltd." and "Acme Widgets" are the same
+vendor. Each key is a row in vendor_aliases pointing at its vendor. Merging two vendors
+re-points the aliases and documents of one to the other, so later spellings land on the right
+vendor too.
+
+vendor_index is an in-memory index over every alias key, for autocomplete and vendor filters
+without ILIKE scans:
+
+- a sorted key list for prefix lookups (bisect);
+- a trigram map for substring and typo-tolerant matches.
+
+Each worker keeps its own copy. New aliases are loaded incrementally (by id) whenever the
+document version (services/cache.py) has changed since the last load, and at least every
+VENDOR_INDEX_REFRESH_SECONDS. Extraction and merges bump that version, so a report computed
+for the new version never misses a vendor another worker just created. A load that finds fewer
+vendors than the index holds (a merge happened elsewhere) rebuilds it; otherwise the index is
+rebuilt every VENDOR_INDEX_REBUILD_SECONDS.
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..model import Document, Vendor, VendorAlias
+from .anomaly import merge_stats
+from .cache import get_document_version
+
+_LEGAL_SUFFIXES = {
+    "pty", "ltd", "limited", "inc", "incorporated", "llc", "llp", "plc", "cc", "co", "corp",
+    "corporation", "company", "gmbh", "ag", "sa", "bv", "nv",
+}
+_MIN_SIMILARITY = 0.35
+
+
+def vendor_key(name: str | None) -> str | None:
+    """Normalised vendor name used to match spellings; None if nothing is left."""
+    if not name:
+        return None
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    words = re.findall(r"[a-z0-9]+", ascii_name.lower())
+    while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return " ".join(words) or None
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VendorIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: dict[int, str] = {}
+        self._counts: dict[int, int] = {}
+        self._keys: list[tuple[str, int]] = []  # sorted (alias key, vendor id)
+        self._trigrams: dict[str, set[tuple[str, int]]] = {}
+        self._alias_watermark = 0
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._version: int | None = None  # document version when the index was last loaded
+
+    def _add_key(self, key: str, vendor_id: int):
+        entry = (key, vendor_id)
+        i = bisect.bisect_left(self._keys, entry)
+        if i < len(self._keys) and self._keys[i] == entry:
+            return
+        self._keys.insert(i, entry)
+        for gram in _trigrams(key):
+            self._trigrams.setdefault(gram, set()).add(entry)
+
+    def rebuild(self, db: Session):
+        names = dict(db.query(Vendor.id, Vendor.name))
+        counts = dict(
+            db.query(Document.vendor_id, func.count(Document.id))
+            .filter(Document.vendor_id.isnot(None))
+            .group_by(Document.vendor_id)
+        )
+        aliases = db.query(VendorAlias.id, VendorAlias.key, VendorAlias.vendor_id).all()
+        with self._lock:
+            self._names, self._counts = names, counts
+            self._keys, self._trigrams = [], {}
+            for _, key, vendor_id in sorted(aliases, key=lambda a: (a.key, a.vendor_id)):
+                self._keys.append((key, vendor_id))
+                for gram in _trigrams(key):
+                    self._trigrams.setdefault(gram, set()).add((key, vendor_id))
+            self._alias_watermark = max((a.id for a in aliases), default=0)
+            self._refreshed_at = self._rebuilt_at = time.monotonic()
+
+    def refresh(self, db: Session):
+        """Load aliases (and their vendors) created since the last refresh, by any worker."""
+        rows = (
+            db.query(VendorAlias.id, VendorAlias.key, VendorAlias.vendor_id, Vendor.name)
+            .join(Vendor, Vendor.id == VendorAlias.vendor_id)
+            .filter(VendorAlias.id > self._alias_watermark)
+            .order_by(VendorAlias.id)
+            .all()
+        )
+        with self._lock:
+            for r in rows:
+                self._names[r.vendor_id] = r.name
+                self._add_key(r.key, r.vendor_id)
+                self._alias_watermark = max(self._alias_watermark, r.id)
+            self._refreshed_at = time.monotonic()
+            known = len(self._names)
+        if db.query(func.count(Vendor.id)).scalar() < known:
+            # Vendors were merged away; re-pointed aliases are not new rows, so reload everything
+            self.rebuild(db)
+
+    def _ensure_fresh(self, db: Session):
+        # Read before loading, so a bump that races with the load triggers another one
+        version = get_document_version()
+        now = time.monotonic()
+        if not self._rebuilt_at or now - self._rebuilt_at > settings.VENDOR_INDEX_REBUILD_SECONDS:
+            self.rebuild(db)
+        elif version != self._version or now - self._refreshed_at > settings.VENDOR_INDEX_REFRESH_SECONDS:
+            self.refresh(db)
+        self._version = version
+
+    def add(self, vendor_id: int, name: str, key: str, alias_id: int):
+        """Record an alias created in this process."""
+        with self._lock:
+            self._names[vendor_id] = name
+            self._add_key(key, vendor_id)
+            # Aliases from other workers with lower ids are still picked up by the next rebuild
+            self._alias_watermark = max(self._alias_watermark, alias_id)
+
+    def count_document(self, vendor_id: int):
+        with self._lock:
+            self._counts[vendor_id] = self._counts.get(vendor_id, 0) + 1
+
+    def _prefix(self, key: str) -> list[int]:
+        ids = []
+        i = bisect.bisect_left(self._keys, (key, 0))
+        while i < len(self._keys) and self._keys[i][0].startswith(key):
+            ids.append(self._keys[i][1])
+            i += 1
+        return ids
+
+    def _substring(self, key: str) -> list[int]:
+        if len(key) < 3:
+            return [vendor_id for k, vendor_id in self._keys if key in k]
+        grams = sorted((self._trigrams.get(g, set()) for g in _trigrams(key) - {f" {key[:2]}", f"{key[-2:]} "}), key=len)
+        candidates = set.intersection(*grams) if grams else set()
+        return [vendor_id for k, vendor_id in candidates if key in k]
+
+    def _similar(self, key: str) -> list[tuple[float, int]]:
+        wanted = _trigrams(key)
+        shared: dict[tuple[str, int], int] = {}
+        for gram in wanted:
+            for entry in self._trigrams.get(gram, ()):
+                shared[entry] = shared.get(entry, 0) + 1
+        scored = []
+        for (k, vendor_id), n in shared.items():
+            score = n / len(wanted | _trigrams(k))
+            if score >= _MIN_SIMILARITY:
+                scored.append((score, vendor_id))
+        return scored
+
+    def match(self, db: Session, text: str) -> list[int]:
+        """Ids of vendors with any spelling containing text (normalised), like ILIKE '%text%'."""
+        key = vendor_key(text)
+        if not key:
+            return []
+        self._ensure_fresh(db)
+        with self._lock:
+            return sorted(set(self._substring(key)))
+
+    def suggest(self, db: Session, text: str, limit: int = 10) -> list[dict]:
+        """Autocomplete: prefix matches, then substring matches, then close spellings."""
+        key = vendor_key(text)
+        if not key:
+            return []
+        self._ensure_fresh(db)
+        with self._lock:
+            ranked: list[int] = []
+
+            def take(ids):
+                for vendor_id in sorted(set(ids) - set(ranked), key=lambda v: (-self._counts.get(v, 0), self._names.get(v, ""))):
+                    if len(ranked) < limit:
+                        ranked.append(vendor_id)
+
+            take(self._prefix(key))
+            if len(ranked) < limit:
+                take(self._substring(key))
+            if len(ranked) < limit:
+                for _, vendor_id in sorted(self._similar(key), reverse=True):
+                    if vendor_id not in ranked and len(ranked) < limit:
+                        ranked.append(vendor_id)
+            return [
+                {"id": v, "name": self._names.get(v, ""), "documents": self._counts.get(v, 0)}
+                for v in ranked
+                if v in self._names
+            ]
+
+
+vendor_index = VendorIndex()
+
+
+def resolve_vendor(db: Session, name: str | None) -> int | None:
+    """Id of the vendor for an extracted name, creating it on first sight. Flushes but does not commit."""
+    key = vendor_key(name)
+    if not key:
+        return None
+    vendor_id = db.query(VendorAlias.vendor_id).filter(VendorAlias.key == key).scalar()
+    if vendor_id is not None:
+        return vendor_id
+    name = name.strip()[:100]
+    try:
+        with db.begin_nested():
+            vendor = Vendor(name=name)
+            db.add(vendor)
+            db.flush()
+            alias = VendorAlias(key=key, name=name, vendor_id=vendor.id)
+            db.add(alias)
+            db.flush()
+    except IntegrityError:
+        # Another worker created it first
+        return db.query(VendorAlias.vendor_id).filter(VendorAlias.key == key).scalar()
+    vendor_index.add(vendor.id, vendor.name, key, alias.id)
+    return vendor.id
+
+
+def merge_vendors(db: Session, source_id: int, target_id: int) -> int:
+    """Fold source into target (aliases, documents, anomaly stats) and delete it; returns documents moved."""
+    db.query(VendorAlias).filter(VendorAlias.vendor_id == source_id).update(
+        {VendorAlias.vendor_id: target_id}, synchronize_session=False,
+    )
+    moved = db.query(Document).filter(Document.vendor_id == source_id).update(
+        {Document.vendor_id: target_id}, synchronize_session=False,
+    )
+    merge_stats(db, source_id, target_id)
+    db.query(Vendor).filter(Vendor.id == source_id).delete(synchronize_session=False)
+    db.commit()
+    vendor_index.rebuild(db)
+    return moved
+
+
+def backfill_vendors(db: Session, batch_size: int = 500) -> int:
+    """Assign vendor_id to documents extracted before vendors existed; returns how many were updated."""
+    updated = 0
+    last = ""
+    while True:
+        names = [
+            r.vendor for r in
+            db.query(Document.vendor)
+            .filter(Document.vendor_id.is_(None), Document.vendor.isnot(None), Document.vendor > last)
+            .distinct()
+            .order_by(Document.vendor)
+            .limit(batch_size)
+        ]
+        if not names:
+            return updated
+        last = names[-1]
+        for name in names:
+            vendor_id = resolve_vendor(db, name)
+            if vendor_id is None:
+                continue  # nothing left after normalising (e.g. only punctuation)
+            updated += db.query(Document).filter(Document.vendor == name, Document.vendor_id.is_(None)).update(
+                {Document.vendor_id: vendor_id}, synchronize_session=False,
+            )
+        db.commit()
@@ -0,0 +1,145 @@
+"""
+Load test: many concurrent approvers hammer the same documents through POST /documents/{id}/approve.
+
+Every document must end up approved with exactly one Approval row per step (1, 2, 3) and
+version 4; anything else means an approval was lost or duplicated. Any 5xx response or
+exception in an approver thread also fails the run.
+
+Each approver thread holds at most one pooled connection at a time, so --approvers may not
+exceed the connection pool (pool_size + max_overflow); more would make requests time out
+waiting for a connection and the result would depend on timing.
+
+Usage (from the backend directory):
+    python -m benchmarks.approval_contention --documents 5 --approvers 12
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+_tmp = tempfile.mkdtemp(prefix="dms-contention-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'contention.db')}"
+os.environ.setdefault("SECRET_KEY", "contention-test")
+os.environ["REDIS_URL"] = ""
+os.environ["ADMISSION_ENABLED"] = "false"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp, "uploads")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.auth import create_access_token  # noqa: E402
+from app.db import SessionLocal, engine  # noqa: E402
+from app.migrate import migrate  # noqa: E402
+from app.model import Approval, Document, DocumentStatus, RoleEnum, User  # noqa: E402
+
+
+def _seed(n_documents: int, n_approvers: int) -> tuple[list[int], list[str]]:
+    migrate()
+    db = SessionLocal()
+    try:
+        roles = [RoleEnum.reviewer, RoleEnum.manager, RoleEnum.admin]
+        tokens = []
+        for i in range(n_approvers):
+            user = User(email=f"approver{i}@example.com", hashed_password="x", role=roles[i % len(roles)])
+            db.add(user)
+            tokens.append(create_access_token({"sub": user.email, "role": user.role.value}))
+        docs = [Document(filename=f"contention_{i}.pdf", status=DocumentStatus.pending, current_step=1) for i in range(n_documents)]
+        db.add_all(docs)
+        db.commit()
+        return [d.id for d in docs], tokens
+    finally:
+        db.close()
+
+
+def _approver(token: str, doc_ids: list[int], outcomes: Counter, errors: list[str], lock: threading.Lock, start: threading.Event):
+    try:
+        _approve_all(token, doc_ids, outcomes, errors, lock, start)
+    except Exception as exc:
+        with lock:
+            errors.append(f"approver thread crashed: {exc!r}")
+
+
+def _approve_all(token: str, doc_ids: list[int], outcomes: Counter, errors: list[str], lock: threading.Lock, start: threading.Event):
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+    start.wait()
+    for doc_id in doc_ids:
+        while True:
+            res = client.get(f"/documents/{doc_id}", headers=headers)
+            if res.status_code != 200:
+                with lock:
+                    errors.append(f"GET /documents/{doc_id}: {res.status_code} {res.text[:200]}")
+                return
+            doc = res.json()
+            if doc["status"] != "pending":
+                break
+            res = client.post(
+                f"/documents/{doc_id}/approve",
+                params={"action": "approve", "version": doc["version"]},
+                headers=headers,
+            )
+            with lock:
+                outcomes[res.status_code] += 1
+            if res.status_code == 403:
+                # Not this approver's step yet; let the others move it along
+                time.sleep(0.001)
+            elif res.status_code >= 500:
+                with lock:
+                    errors.append(f"POST /documents/{doc_id}/approve: {res.status_code} {res.text[:200]}")
+                return
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--approvers", type=int, default=12)
+    args = parser.parse_args()
+    pool_capacity = engine.pool.size() + max(engine.pool._max_overflow, 0)
+    if args.approvers > pool_capacity:
+        parser.error(f"--approvers must not exceed the connection pool ({pool_capacity})")
+
+    doc_ids, tokens = _seed(args.documents, args.approvers)
+    outcomes: Counter = Counter()
+    errors: list[str] = []
+    lock = threading.Lock()
+    start = threading.Event()
+    threads = [
+        threading.Thread(target=_approver, args=(t, doc_ids, outcomes, errors, lock, start))
+        for t in tokens
+    ]
+    for t in threads:
+        t.start()
+    began = time.perf_counter()
+    start.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    failures = list(errors)
+    db = SessionLocal()
+    try:
+        for doc_id in doc_ids:
+            doc = db.query(Document).get(doc_id)
+            steps = sorted(a.step for a in db.query(Approval).filter(Approval.document_id == doc_id))
+            if doc.status != DocumentStatus.approved or steps != [1, 2, 3] or doc.version != 4:
+                failures.append(f"document {doc_id}: status={doc.status.value} version={doc.version} approval steps={steps}")
+    finally:
+        db.close()
+
+    print(f"{len(tokens)} approvers x {len(doc_ids)} documents in {elapsed:.2f}s")
+    print("responses: " + ", ".join(f"{code}={n}" for code, n in sorted(outcomes.items())))
+    if outcomes[200] != 3 * len(doc_ids):
+        failures.append(f"expected {3 * len(doc_ids)} successful approvals, got {outcomes[200]}")
+    if failures:
+        print("FAIL")
+        for f in failures:
+            print("  " + f)
+        return 1
+    print("OK: no approvals lost or duplicated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
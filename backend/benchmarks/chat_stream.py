@@ -0,0 +1,120 @@
+"""
+Time-to-first-token vs full-reply latency for POST /chat/stream against the fake LLM,
+compared with the blocking POST /chat/. Also checks that the ACTION trailer is parsed
+out of the stream and never shown to the user.
+
+The app runs under uvicorn on a real socket: TestClient buffers the whole response body,
+which would make the first token look as late as the last one.
+
+Usage (from the backend directory):
+    python -m benchmarks.chat_stream --requests 10 --token-delay 0.02
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+_tmp = tempfile.mkdtemp(prefix="dms-chat-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'chat.db')}"
+os.environ.setdefault("SECRET_KEY", "chat-bench")
+os.environ["REDIS_URL"] = ""
+os.environ["ADMISSION_ENABLED"] = "false"
+os.environ["OPENAI_API_KEY"] = "fake"
+os.environ["OPENAI_BASE_URL"] = "http://127.0.0.1:8091/v1"
+# Measure the LLM path, not the semantic reply cache
+os.environ["CHAT_CACHE_MAX_ENTRIES"] = "0"
+
+import uvicorn  # noqa: E402
+from app.main import app  # noqa: E402
+from app.auth import create_access_token  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.migrate import migrate  # noqa: E402
+from app.model import RoleEnum, User  # noqa: E402
+from benchmarks.fake_llm import serve  # noqa: E402
+
+
+APP_PORT = 8092
+
+
+def _parse_sse(lines):
+    event = None
+    for line in lines:
+        line = line.decode("utf-8").rstrip("\r\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[6:])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    serve(8091, args.token_delay, background=True)
+    migrate()
+    db = SessionLocal()
+    db.add(User(email="chat@example.com", hashed_password="x", role=RoleEnum.viewer))
+    db.commit()
+    db.close()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    headers = {
+        "Authorization": f"Bearer {create_access_token({'sub': 'chat@example.com'})}",
+        "Content-Type": "application/json",
+    }
+
+    def post(path: str, message: str) -> http.client.HTTPResponse:
+        conn = http.client.HTTPConnection("127.0.0.1", APP_PORT)
+        conn.request("POST", path, body=json.dumps({"message": message}), headers=headers)
+        res = conn.getresponse()
+        if res.status != 200:
+            raise RuntimeError(f"{path}: HTTP {res.status}")
+        return res
+
+    blocking, first_token, full_stream = [], [], []
+    failures = []
+    for i in range(args.requests):
+        message = f"how do I open reports {i}"
+        began = time.perf_counter()
+        post("/chat/", message).read()
+        blocking.append(time.perf_counter() - began)
+
+        began = time.perf_counter()
+        shown, done, ttft = "", None, None
+        res = post("/chat/stream", message)
+        for event, data in _parse_sse(iter(res.readline, b"")):
+            if event == "token":
+                ttft = ttft or time.perf_counter() - began
+                shown += data["text"]
+            elif event == "done":
+                done = data
+        full_stream.append(time.perf_counter() - began)
+        first_token.append(ttft or full_stream[-1])
+        if "ACTION" in shown:
+            failures.append(f"ACTION trailer leaked into streamed text: {shown!r}")
+        if not done or (done["action"] or {}).get("path") != "/reports":
+            failures.append(f"expected navigate /reports action, got {done}")
+
+    def ms(xs):
+        return f"p50={statistics.median(xs) * 1000:.0f}ms max={max(xs) * 1000:.0f}ms"
+
+    print(f"/chat/ (blocking)       {ms(blocking)}")
+    print(f"/chat/stream first token {ms(first_token)}")
+    print(f"/chat/stream full reply  {ms(full_stream)}")
+    for f in failures[:5]:
+        print("FAIL " + f)
+    server.should_exit = True
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Local fake of the OpenAI chat completions API, for exercising /chat and /chat/stream without a key.
+
+Replies word by word with a configurable per-token delay, appends an ACTION trailer when the
+message mentions a known page, and supports both stream=true (SSE) and plain JSON responses.
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_llm --port 8090 --token-delay 0.02
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8090/v1 python run.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PAGES = {"upload": "/upload", "report": "/reports", "approv": "/approvals", "insight": "/insights"}
+
+
+def fake_reply(message: str) -> str:
+    reply = f"Sure, here is what I know about: {message.strip()}. " + "This is a canned answer from the fake LLM. " * 3
+    for word, path in _PAGES.items():
+        if re.search(word, message, re.I):
+            return reply + f"\nACTION: navigate {path}"
+    return reply
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    token_delay = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        message = next((m["content"] for m in reversed(body.get("messages", [])) if m["role"] == "user"), "")
+        reply = fake_reply(message)
+        created = int(time.time())
+        if not body.get("stream"):
+            # A real model takes as long to generate the reply whether or not it is streamed
+            time.sleep(self.token_delay * len(_tokens(reply)))
+            payload = json.dumps({
+                "id": "fake-1", "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for tok in _tokens(reply):
+                time.sleep(self.token_delay)
+                chunk = {
+                    "id": "fake-1", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            pass
+        self.close_connection = True
+
+
+def serve(port: int = 8090, token_delay: float = 0.0, background: bool = False) -> ThreadingHTTPServer:
+    handler = type("Handler", (_Handler,), {"token_delay": token_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+    print(f"Fake LLM listening on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.token_delay)
@@ -0,0 +1,85 @@
+"""
+Accuracy corpus and micro-benchmark for Mambo's rule-based intent classifier (app/services/intents.py).
+
+Exits non-zero if accuracy on the corpus drops below --min-accuracy, so it can gate changes
+to intents.json.
+
+Usage (from the backend directory):
+    python -m benchmarks.intent_bench
+"""
+import argparse
+import sys
+import time
+from app.services.intents import classifier
+
+# (message, expected intent or None for the fallback reply)
+CORPUS = [
+    ("How do I upload an invoice?", "upload"),
+    ("upload", "upload"),
+    ("I want to add documents", "upload"),
+    ("where do I submit a credit note", "upload"),
+    ("Can I upload invoices as images?", "upload"),
+    ("Where are reports?", "reports"),
+    ("export to excel", "reports"),
+    ("How can I download a CSV of spending", "reports"),
+    ("filter reports by vendor", "reports"),
+    ("I need a pdf export", "reports"),
+    ("Explain approvals", "approvals"),
+    ("how does the approval workflow work", "approvals"),
+    ("who approves step 2", "approvals"),
+    ("show pending documents to review", "approvals"),
+    ("can I reject a document?", "approvals"),
+    ("Show me the insights", "insights"),
+    ("where are the charts and trends", "insights"),
+    ("any anomalies this month?", "insights"),
+    ("analytics", "insights"),
+    ("take me home", "dashboard"),
+    ("open the dashboard", "dashboard"),
+    ("I want an overview", "dashboard"),
+    ("help", "help"),
+    ("what can you do", "help"),
+    ("where do I start", "help"),
+    ("hi", "greeting"),
+    ("Hello Mambo", "greeting"),
+    ("hey there", "greeting"),
+    ("good morning", "greeting"),
+    # Substring traps the old `w in m` scan got wrong
+    ("which is this", None),
+    ("thistle", None),
+    ("the weather is nice", None),
+    ("shipping costs", None),
+    ("reimport", None),
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--min-accuracy", type=float, default=1.0)
+    args = parser.parse_args()
+
+    misses = []
+    for message, expected in CORPUS:
+        intent = classifier.classify(message.lower())
+        got = intent.name if intent else None
+        if got != expected:
+            misses.append((message, expected, got, classifier.scores(message.lower())))
+    accuracy = 1 - len(misses) / len(CORPUS)
+
+    messages = [m.lower() for m, _ in CORPUS]
+    began = time.perf_counter()
+    for _ in range(args.iterations):
+        for m in messages:
+            classifier.classify(m)
+    elapsed = time.perf_counter() - began
+    per_call_us = elapsed / (args.iterations * len(messages)) * 1e6
+
+    print(f"accuracy: {accuracy:.1%} ({len(CORPUS) - len(misses)}/{len(CORPUS)})")
+    print(f"classify: {per_call_us:.2f} us/message over {args.iterations * len(messages)} calls")
+    for message, expected, got, scores in misses:
+        print(f"  MISS {message!r}: expected {expected}, got {got} {scores}")
+    return 0 if accuracy >= args.min_accuracy else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
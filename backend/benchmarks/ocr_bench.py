@@ -0,0 +1,183 @@
+"""
+OCR seconds/page vs field accuracy for the preprocessing variants in app/services/ocr.py.
+
+Renders synthetic invoices as phone-photo-like PNGs (high resolution, no DPI metadata, noise,
+skew, some pages sideways), OCRs them with each variant, runs simple_parse on the text and
+scores vendor / invoice number / amount / VAT against the known values. "baseline" is the
+pre-preprocessing behaviour: greyscale and image_to_string.
+
+--multipage N also builds scanned (image-only) N-page PDFs, half with the totals on the last
+page, and compares EXTRACTION_MODE=full with progressive: seconds/document, accuracy and the
+extraction paths taken. Needs Pillow, numpy and tesseract (plus poppler for --multipage).
+
+Usage (from the backend directory):
+    python -m benchmarks.ocr_bench --pages 20
+    python -m benchmarks.ocr_bench --pages 20 --variants baseline,configured --out ocr.json
+    python -m benchmarks.ocr_bench --pages 0 --multipage 8 --documents 5
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "ocr-bench")
+
+from PIL import Image  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.services.ocr import ocr_image  # noqa: E402
+from app.services.extractor import extract_text, simple_parse  # noqa: E402
+from benchmarks.synthetic import SCORED_FIELDS, corpus, make_png, score_fields  # noqa: E402
+
+# name -> (preprocessing steps, tesseract config or None for OCR_TESSERACT_CONFIG)
+VARIANTS = {
+    "none": ((), None),
+    "downscale": (("downscale",), None),
+    "no-orientation": (("downscale", "binarize", "deskew", "crop"), None),
+    "configured": (None, None),
+    "configured+denoise": (("downscale", "orientation", "denoise", "binarize", "deskew", "crop"), None),
+    "configured-psm4": (None, "--oem 1 --psm 4"),
+    "configured-psm6": (None, "--oem 1 --psm 6"),
+}
+
+
+def _baseline(img: Image.Image, durations: dict) -> str:
+    import pytesseract
+
+    started = time.perf_counter()
+    text = pytesseract.image_to_string(img.convert("L")) or ""
+    durations["ocr.tesseract"] = durations.get("ocr.tesseract", 0.0) + (time.perf_counter() - started) * 1000
+    return text
+
+
+def _pages(n: int, seed: int, dpi: int, max_skew: float, sideways: float) -> list[tuple[bytes, dict]]:
+    rng = random.Random(seed)
+    pages = []
+    for text, fields in corpus(n, seed=seed):
+        png = make_png(text, rng, dpi=dpi, max_skew=max_skew, embed_dpi=False)
+        if rng.random() < sideways:
+            img = Image.open(io.BytesIO(png)).rotate(90, expand=True)
+            buf = io.BytesIO()
+            img.save(buf, format="PNG")
+            png = buf.getvalue()
+        pages.append((png, fields))
+    return pages
+
+
+def run_variant(name: str, pages: list[tuple[bytes, dict]]) -> dict:
+    seconds, durations = [], {}
+    correct = dict.fromkeys(SCORED_FIELDS, 0)
+    for png, expected in pages:
+        with Image.open(io.BytesIO(png)) as img:
+            img.load()
+            started = time.perf_counter()
+            if name == "baseline":
+                text = _baseline(img, durations)
+            else:
+                steps, config = VARIANTS[name]
+                text = ocr_image(img, steps=steps, durations=durations, config=config).text
+            seconds.append(time.perf_counter() - started)
+        for field, ok in score_fields(simple_parse(text), expected).items():
+            correct[field] += ok
+    n = len(pages)
+    return {
+        "seconds_per_page_p50": round(statistics.median(seconds), 3),
+        "seconds_per_page_mean": round(statistics.fmean(seconds), 3),
+        "field_accuracy": {f: round(c / n, 3) for f, c in correct.items()},
+        "accuracy_mean": round(sum(correct.values()) / (n * len(correct)), 3),
+        "stage_ms_per_page": {k: round(v / n, 1) for k, v in sorted(durations.items())},
+    }
+
+
+def _scanned_pdfs(n: int, pages: int, seed: int, directory: str) -> list[tuple[str, dict]]:
+    """Image-only PDFs: invoice header and items on page 1, filler pages, totals on page 1 or the last page."""
+    rng = random.Random(seed)
+    docs = []
+    for i, (text, fields) in enumerate(corpus(n, seed=seed)):
+        lines = text.splitlines()
+        split = len(lines) - 2 if i % 2 else len(lines)
+        page_texts = ["\n".join(lines[:split])]
+        for p in range(2, pages + 1):
+            filler = [f"Statement line {p}-{j}    {rng.uniform(10, 900):9.2f}" for j in range(25)]
+            page_texts.append("\n".join(filler + (lines[split:] if p == pages else [])))
+        images = [Image.open(io.BytesIO(make_png(t, rng, dpi=200))).convert("L") for t in page_texts]
+        path = os.path.join(directory, f"scan_{i}.pdf")
+        images[0].save(path, save_all=True, append_images=images[1:], resolution=200)
+        docs.append((path, fields))
+    return docs
+
+
+def run_extraction_mode(mode: str, docs: list[tuple[str, dict]]) -> dict:
+    settings.EXTRACTION_MODE = mode
+    seconds, paths = [], Counter()
+    correct = dict.fromkeys(SCORED_FIELDS, 0)
+    for path, expected in docs:
+        started = time.perf_counter()
+        text, taken = extract_text(path, {})
+        seconds.append(time.perf_counter() - started)
+        paths[taken] += 1
+        for field, ok in score_fields(simple_parse(text), expected).items():
+            correct[field] += ok
+    n = len(docs)
+    return {
+        "seconds_per_document_mean": round(statistics.fmean(seconds), 3),
+        "accuracy_mean": round(sum(correct.values()) / (n * len(correct)), 3),
+        "field_accuracy": {f: round(c / n, 3) for f, c in correct.items()},
+        "paths": dict(paths),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--dpi", type=int, default=400, help="resolution the synthetic photos are rendered at")
+    parser.add_argument("--max-skew", type=float, default=3.0)
+    parser.add_argument("--sideways", type=float, default=0.1, help="fraction of pages rotated 90 degrees")
+    parser.add_argument("--variants", default="baseline," + ",".join(VARIANTS))
+    parser.add_argument("--multipage", type=int, default=0, help="pages per scanned PDF for the progressive comparison")
+    parser.add_argument("--documents", type=int, default=5, help="scanned PDFs for --multipage")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args()
+
+    import pytesseract
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        print("tesseract is not installed or not on PATH")
+        return 2
+
+    names = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in names if v != "baseline" and v not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown variant(s): {', '.join(unknown)}")
+    results, modes = {}, {}
+    if args.pages:
+        pages = _pages(args.pages, args.seed, args.dpi, args.max_skew, args.sideways)
+        print(f"{'variant':22} {'s/page p50':>10} {'s/page mean':>11} {'accuracy':>9}  per field")
+        for name in names:
+            r = results[name] = run_variant(name, pages)
+            fields = " ".join(f"{f}={a:.0%}" for f, a in r["field_accuracy"].items())
+            print(f"{name:22} {r['seconds_per_page_p50']:10.3f} {r['seconds_per_page_mean']:11.3f} {r['accuracy_mean']:9.1%}  {fields}")
+    if args.multipage:
+        docs = _scanned_pdfs(args.documents, args.multipage, args.seed, tempfile.mkdtemp(prefix="dms-ocr-"))
+        print(f"\n{args.documents} scanned PDFs x {args.multipage} pages")
+        print(f"{'mode':12} {'s/doc':>8} {'accuracy':>9}  paths")
+        for mode in ("full", "progressive"):
+            r = modes[mode] = run_extraction_mode(mode, docs)
+            print(f"{mode:12} {r['seconds_per_document_mean']:8.2f} {r['accuracy_mean']:9.1%}  {r['paths']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"pages": args.pages, "dpi": args.dpi, "results": results, "extraction_modes": modes}, f, indent=2)
+        print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
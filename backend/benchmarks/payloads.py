@@ -0,0 +1,135 @@
+"""
+Serialisation and compression of the large report payloads (/reports/insights by default).
+
+For each report it times building the payload, encoding it the old way (jsonable_encoder +
+json.dumps) and with orjson, and compressing the result with gzip and brotli at the configured
+levels. It then fetches the endpoint through the middleware stack with each Accept-Encoding
+and records latency and bytes on the wire. The report cache is off, so every request encodes.
+
+Usage (from the backend directory):
+    python -m benchmarks.payloads --documents 2000
+    python -m benchmarks.payloads --documents 5000 --reports insights,tax-vat-report,list --out payloads.json
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPORTS = {
+    "insights": "/reports/insights",
+    "tax-vat-report": "/reports/tax-vat-report",
+    "list": "/reports/list?limit=1000",
+}
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def _timed(fn, repeat: int):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return result, round(statistics.median(samples) * 1000, 2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--reports", default="insights", help=f"comma-separated subset of {','.join(REPORTS)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dms-payloads-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'payloads.db')}"
+    os.environ.setdefault("SECRET_KEY", "payloads")
+    os.environ["REDIS_URL"] = ""
+    os.environ["ADMISSION_ENABLED"] = "false"
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["REPORT_CACHE_TTL_SECONDS"] = "0"
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    from app.auth import create_access_token
+    from app.config import settings
+    from app.db import SessionLocal, engine
+    from app.main import app
+    from app.middleware import _brotli
+    from app.migrate import migrate
+    from app.model import RoleEnum, User
+    from app.routes import reports
+    from benchmarks.synthetic import seed_documents
+
+    migrate(engine)
+    seed_documents(engine, args.documents, seed=args.seed)
+    db = SessionLocal()
+    db.add(User(email="payloads@example.com", hashed_password="x", role=RoleEnum.admin))
+    db.commit()
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'payloads@example.com'})}"}
+    builders = {
+        "insights": lambda: reports._build_insights(db, None, None, "day"),
+        "tax-vat-report": lambda: json.loads(client.get(REPORTS["tax-vat-report"], headers=headers).content),
+        "list": lambda: json.loads(client.get(REPORTS["list"], headers=headers).content),
+    }
+    brotli = _brotli()
+
+    results = {}
+    for name in [r.strip() for r in args.reports.split(",") if r.strip()]:
+        if name not in REPORTS:
+            parser.error(f"unknown report: {name}")
+        payload, build_ms = _timed(builders[name], 1)
+        stdlib, stdlib_ms = _timed(lambda: json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+        ).encode("utf-8"), args.repeat)
+        fast, fast_ms = _timed(lambda: reports.encode_json(payload), args.repeat)
+        gz, gzip_ms = _timed(lambda: gzip.compress(fast, settings.COMPRESSION_GZIP_LEVEL), args.repeat)
+        r = results[name] = {
+            "build_ms": build_ms,
+            "encode_stdlib_ms": stdlib_ms,
+            "encode_fast_ms": fast_ms,
+            "encoder": "orjson" if reports.orjson is not None else "stdlib",
+            "same_json": json.loads(stdlib) == json.loads(fast),
+            "bytes": len(fast),
+            "gzip_bytes": len(gz),
+            "gzip_ms": gzip_ms,
+        }
+        if brotli is not None:
+            br, br_ms = _timed(lambda: brotli.compress(fast, quality=settings.COMPRESSION_BROTLI_QUALITY), args.repeat)
+            r.update(br_bytes=len(br), br_ms=br_ms)
+        r["http"] = {}
+        for encoding in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            samples, wire = [], 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                res = client.get(REPORTS[name], headers={**headers, "Accept-Encoding": encoding})
+                res.raise_for_status()
+                samples.append(time.perf_counter() - started)
+                wire = res.num_bytes_downloaded
+            r["http"][encoding] = {"p50_ms": round(statistics.median(samples) * 1000, 1), "wire_bytes": wire}
+
+        print(f"{name}: {r['bytes']:,} bytes, built in {r['build_ms']:.0f}ms")
+        print(f"  encode   stdlib {r['encode_stdlib_ms']:9.1f}ms   {r['encoder']} {r['encode_fast_ms']:9.1f}ms")
+        print(f"  gzip     {r['gzip_bytes']:>12,} bytes {r['gzip_ms']:8.1f}ms")
+        if "br_bytes" in r:
+            print(f"  br       {r['br_bytes']:>12,} bytes {r['br_ms']:8.1f}ms")
+        for encoding, h in r["http"].items():
+            print(f"  GET {encoding:9} {h['wire_bytes']:>12,} bytes on wire  p50 {h['p50_ms']:8.1f}ms")
+    db.close()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"documents": args.documents, "results": results}, f, indent=2)
+        print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
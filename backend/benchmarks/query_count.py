@@ -0,0 +1,108 @@
+"""
+Query-count check for the approval views: the number of SQL statements per request must not
+grow with the page size or the length of a document's history (no N+1 lazy loads).
+
+It seeds documents with approvals by several approvers, then counts the statements issued by
+GET /reports/approvals at each --limits page size and by GET /documents/{id}/timeline for
+documents with short and long histories. The same pages are also loaded lazily, for comparison.
+Exits 1 if any count varies.
+
+Usage (from the backend directory):
+    python -m benchmarks.query_count
+    python -m benchmarks.query_count --documents 500 --limits 10,100,1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=400)
+    parser.add_argument("--approvers", type=int, default=12)
+    parser.add_argument("--limits", default="10,100,1000")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dms-queries-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'queries.db')}"
+    os.environ.setdefault("SECRET_KEY", "query-count")
+    os.environ["REDIS_URL"] = ""
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["REPORT_CACHE_TTL_SECONDS"] = "0"
+    os.environ["ADMISSION_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.auth import create_access_token
+    from app.db import SessionLocal, engine
+    from app.main import app
+    from app.migrate import migrate
+    from app.model import Approval, Document, DocumentStatus, RoleEnum, User
+
+    migrate(engine)
+    db = SessionLocal()
+    users = [User(email=f"approver{i}@example.com", hashed_password="x", role=RoleEnum.admin) for i in range(args.approvers)]
+    db.add_all(users)
+    docs = [Document(filename=f"doc_{i}.pdf", vendor=f"Vendor {i % 20}", status=DocumentStatus.approved) for i in range(args.documents)]
+    db.add_all(docs)
+    db.flush()
+    for i, doc in enumerate(docs):
+        # The last document gets a long history (re-submissions), the rest the usual three steps
+        steps = 60 if i == len(docs) - 1 else 3
+        db.add_all(
+            Approval(document_id=doc.id, step=s % 3 + 1, approver_id=users[(i + s) % len(users)].id, action="approve")
+            for s in range(steps)
+        )
+    db.commit()
+    timeline_ids = (docs[0].id, docs[-1].id)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+    def count(fn) -> int:
+        statements.clear()
+        fn()
+        return len(statements)
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': users[0].email})}"}
+
+    def get(url):
+        res = client.get(url, headers=headers)
+        res.raise_for_status()
+        return res.json()
+
+    def lazy_page(limit):
+        session = SessionLocal()
+        try:
+            for a in session.query(Approval).order_by(Approval.timestamp.desc()).limit(limit):
+                a.approver.email, a.document.vendor
+        finally:
+            session.close()
+
+    failed = False
+    limits = [int(x) for x in args.limits.split(",") if x.strip()]
+    results = {}
+    for limit in limits:
+        n = count(lambda: get(f"/reports/approvals?limit={limit}"))
+        results[f"/reports/approvals?limit={limit}"] = (n, count(lambda: lazy_page(limit)))
+    for doc_id in timeline_ids:
+        n = count(lambda: get(f"/documents/{doc_id}/timeline"))
+        history = len(get(f"/documents/{doc_id}/timeline")["approvals"])
+        results[f"/documents/{{id}}/timeline ({history} approvals)"] = (n, None)
+
+    for name, (n, lazy) in results.items():
+        print(f"{name:44} {n:4} queries" + (f"   (lazy loading: {lazy})" if lazy is not None else ""))
+    for prefix in ("/reports/approvals", "/documents/{id}/timeline"):
+        counts = {n for name, (n, _) in results.items() if name.startswith(prefix)}
+        if len(counts) > 1:
+            print(f"FAIL: {prefix} query count varies: {sorted(counts)}")
+            failed = True
+    db.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Cold-start benchmark: time to import app.main, and time from spawning uvicorn to the first
+successful response, both in fresh processes so nothing is cached in the interpreter.
+
+First response is measured against a new database (the boot step creates the schema) and an
+already migrated one (the boot step is one SELECT). The run fails if importing app.main
+loads any of HEAVY_MODULES; those belong inside the code paths that use them.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup --runs 5 --out startup.json
+    python -m benchmarks.startup --runs 5 --compare startup.json --tolerance 0.2
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ("pandas", "numpy", "PIL", "pytesseract", "pdf2image", "PyPDF2", "openai", "openpyxl", "reportlab")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _env(database_url: str, upload_dir: str) -> dict:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=database_url, SECRET_KEY="startup-bench", REDIS_URL="", UPLOAD_DIR=upload_dir,
+        LOG_LEVEL="WARNING",
+    )
+    return env
+
+
+def measure_import(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE % (HEAVY_MODULES,)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_response(env: dict, timeout: float = 60.0) -> float:
+    """Seconds from spawning uvicorn until GET / returns 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/")
+                if conn.getresponse().status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("no response before timeout")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dms-startup-")
+    upload_dir = os.path.join(tmp, "uploads")
+    migrated = _env(f"sqlite:///{os.path.join(tmp, 'migrated.db')}", upload_dir)
+    subprocess.run([sys.executable, "-m", "app.migrate"], env=migrated, capture_output=True, check=True)
+
+    imports, heavy = [], set()
+    for _ in range(args.runs):
+        probe = measure_import(migrated)
+        imports.append(probe["seconds"])
+        heavy.update(probe["heavy"])
+    fresh = [
+        measure_first_response(_env(f"sqlite:///{os.path.join(tmp, f'fresh_{i}.db')}", upload_dir))
+        for i in range(args.runs)
+    ]
+    warm = [measure_first_response(migrated) for _ in range(args.runs)]
+
+    results = {
+        "import_app_main": _summary(imports),
+        "first_response_new_db": _summary(fresh),
+        "first_response_migrated_db": _summary(warm),
+    }
+    for name, r in results.items():
+        print(f"{name:28} median={r['median_ms']:8.1f}ms min={r['min_ms']:8.1f}ms max={r['max_ms']:8.1f}ms")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"runs": args.runs, "python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"wrote {args.out}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: importing app.main loaded {', '.join(sorted(heavy))}")
+        failed = True
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        for name, r in results.items():
+            old = baseline.get(name, {}).get("median_ms")
+            if not old:
+                continue
+            change = (r["median_ms"] - old) / old
+            flag = "  REGRESSION" if change > args.tolerance else ""
+            print(f"{name:28} {old:8.1f}ms -> {r['median_ms']:8.1f}ms {change:+7.1%}{flag}")
+            failed |= change > args.tolerance
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Synthetic invoices for benchmarks: invoice text with known field values, single-page PDFs with
+a text layer (written by hand, no PDF library needed), PNG scans (needs Pillow), and bulk
+seeding of the documents table.
+
+Everything is driven by a seeded random.Random, so two runs with the same seed produce the
+same corpus and their timings are comparable.
+"""
+import datetime
+import random
+
+VENDORS = [
+    "Acme Supplies Pty Ltd", "Blue Crane Logistics", "Cape Office Solutions", "Durban Print Works",
+    "Eskom Holdings", "Fresh Produce Co", "Gauteng Cleaning Services", "Highveld Security",
+    "Indaba Catering", "Jozi IT Consulting", "Karoo Fuel Distributors", "Limpopo Timber Ltd",
+    "Mzansi Telecom", "Nedbank Business", "Orange River Water", "Protea Stationers",
+]
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y")
+_TOTAL_FORMATS = ("Total: R {:,.2f}", "Total: {:,.2f}", "Amount Due: {:,.2f} ZAR")
+
+
+def invoice_fields(rng: random.Random, index: int) -> dict:
+    amount = round(rng.uniform(50, 250_000), 2)
+    return {
+        "vendor": rng.choice(VENDORS),
+        "invoice_number": f"INV-{index:07d}",
+        "date": datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(700)),
+        "amount": amount,
+        "vat": round(amount * 0.15, 2),
+    }
+
+
+def invoice_text(fields: dict, rng: random.Random) -> str:
+    """Render fields the way a supplier's invoice (or its OCR output) typically reads."""
+    lines = [
+        fields["vendor"],
+        f"{rng.randrange(1, 400)} Main Road, Johannesburg",
+        "TAX INVOICE",
+        f"Invoice No: {fields['invoice_number']}",
+        f"Date: {fields['date'].strftime(rng.choice(_DATE_FORMATS))}",
+        "",
+        "Description                Qty      Price",
+    ]
+    for _ in range(rng.randrange(1, 6)):
+        lines.append(f"Item {rng.randrange(1000, 9999)}               {rng.randrange(1, 20):>3}   {rng.uniform(10, 5000):>9.2f}")
+    lines += [
+        "",
+        f"VAT: {fields['vat']:,.2f}",
+        rng.choice(_TOTAL_FORMATS).format(fields["amount"]),
+    ]
+    return "\n".join(lines)
+
+
+def corpus(n: int, seed: int = 42) -> list[tuple[str, dict]]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        fields = invoice_fields(rng, i)
+        out.append((invoice_text(fields, rng), fields))
+    return out
+
+
+SCORED_FIELDS = ("vendor", "invoice_number", "amount", "vat")
+
+
+def score_fields(parsed: dict, expected: dict) -> dict[str, bool]:
+    """Which of SCORED_FIELDS simple_parse got exactly right."""
+    return {f: parsed.get(f) == expected[f] for f in SCORED_FIELDS}
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(text: str) -> bytes:
+    """Single A4 page with `text` as a real text layer, so PyPDF2 extracts it without OCR."""
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+    for line in text.splitlines():
+        ops.append(f"({_pdf_escape(line)}) Tj T*")
+    ops.append("ET")
+    content = "\n".join(ops).encode("latin-1", "replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def make_png(
+    text: str, rng: random.Random | None = None, dpi: int = 200, max_skew: float = 1.5, embed_dpi: bool = True,
+) -> bytes:
+    """Greyscale 'scan' of the invoice at roughly A4 size, with a little noise and skew.
+
+    embed_dpi=False mimics phone photos, which carry no resolution metadata.
+    """
+    import io
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = rng or random.Random(0)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    img = Image.new("L", (width, height), 245)
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.load_default(size=max(12, dpi // 8))
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        font = ImageFont.load_default()
+    y = dpi // 2
+    for line in text.splitlines():
+        draw.text((dpi // 2, y), line, fill=20, font=font)
+        y += max(16, dpi // 6)
+    for _ in range(width * height // 2000):
+        draw.point((rng.randrange(width), rng.randrange(height)), fill=rng.randrange(120, 200))
+    img = img.rotate(rng.uniform(-max_skew, max_skew), fillcolor=245, expand=False)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", **({"dpi": (dpi, dpi)} if embed_dpi else {}))
+    return buf.getvalue()
+
+
+def seed_documents(engine, n: int, seed: int = 42, chunk: int = 10_000) -> int:
+    """Bulk-insert n processed documents (mixed status and step) in chunks; returns rows inserted.
+
+    The bulk insert bypasses extraction, so afterwards the rows are given vendor ids and anomaly
+    scores the way app.migrate backfills them, and this process's vendor index is rebuilt.
+    """
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+    from app.model import Document, DocumentStatus
+    from app.services.anomaly import rebuild_scores
+    from app.services.vendors import backfill_vendors, vendor_index
+
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    statuses = [DocumentStatus.pending] * 5 + [DocumentStatus.approved] * 4 + [DocumentStatus.rejected]
+    inserted = 0
+    with engine.begin() as conn:
+        while inserted < n:
+            rows = []
+            for i in range(inserted, min(n, inserted + chunk)):
+                fields = invoice_fields(rng, i)
+                status = rng.choice(statuses)
+                rows.append({
+                    "filename": f"seed_{i}.pdf",
+                    "vendor": fields["vendor"],
+                    "invoice_number": fields["invoice_number"],
+                    "date": datetime.datetime.combine(fields["date"], datetime.time()),
+                    "amount": fields["amount"],
+                    "vat": fields["vat"],
+                    "status": status,
+                    "current_step": rng.randrange(1, 4) if status == DocumentStatus.pending else 3,
+                    "version": 1,
+                    "created_at": now - datetime.timedelta(minutes=rng.randrange(60 * 24 * 700)),
+                    "is_duplicate": rng.random() < 0.02,
+                })
+            conn.execute(insert(Document), rows)
+            inserted += len(rows)
+    with Session(engine) as db:
+        backfill_vendors(db)
+        rebuild_scores(db)
+        vendor_index.rebuild(db)
+    return inserted
@@ -0,0 +1,58 @@
+"""
+gunicorn settings for production (see app/serve.py for sizing and the env vars involved).
+
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+import os
+from app.config import settings
+from app.serve import shared_state_warning, start_memory_watchdog, worker_count
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+worker_class = "app.serve.Worker"
+workers = worker_count()
+
+# Import the app once in the master; workers share its memory copy-on-write
+preload_app = True
+
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS_JITTER
+# A worker that stops heartbeating this long (e.g. stuck in a C extension) is killed
+timeout = settings.WEB_TIMEOUT
+# The arbiter's hard deadline must outlast the worker's own drain
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT + 5
+keepalive = 5
+
+accesslog = None
+errorlog = "-"
+loglevel = settings.LOG_LEVEL.lower()
+
+
+def on_starting(server):
+    # Heavy libraries imported here are shared by every worker instead of loaded in each
+    for module in filter(None, (m.strip() for m in settings.WEB_PRELOAD_MODULES.split(","))):
+        __import__(module)
+
+
+def when_ready(server):
+    warning = shared_state_warning(server.num_workers)
+    if warning:
+        server.log.warning(warning)
+
+    # Migrate once in the master so workers booting together do not race on DDL
+    from app.db import engine
+    from app.migrate import ensure_schema
+
+    if settings.AUTO_MIGRATE:
+        ensure_schema(engine)
+    engine.dispose()
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared with the children
+    from app.db import engine
+
+    engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    start_memory_watchdog(settings.WEB_WORKER_MAX_RSS_MB)
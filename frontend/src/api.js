@@ -32,4 +32,67 @@ instance.interceptors.response.use(
   }
 );
 
+// URL of a document's original (kind "file") or page preview (kind "thumbnail") for <img>/<a>,
+// which cannot send the Authorization header, so the token goes in the query string.
+export function documentFileUrl(id, kind = "file", params = {}) {
+  const token = localStorage.getItem("token");
+  const query = new URLSearchParams({ ...params, ...(token ? { access_token: token } : {}) });
+  return `${API_BASE}/documents/${id}/${kind}?${query}`;
+}
+
+// Server-sent document events (uploaded, parsed, approved, ...). Returns a close function,
+// or null when EventSource is unavailable so callers can fall back to polling.
+export function subscribeDocumentEvents(onEvent, { documentId } = {}) {
+  const token = localStorage.getItem("token");
+  if (!token || typeof EventSource === "undefined") return null;
+  const params = new URLSearchParams({ access_token: token });
+  if (documentId != null) params.set("document_id", documentId);
+  const source = new EventSource(`${API_BASE}/events/stream?${params}`);
+  const types = [
+    "uploaded", "ocr_started", "ocr_finished", "parsed", "duplicate_flagged",
+    "step_approved", "approved", "rejected", "processing_failed",
+  ];
+  const handler = (e) => onEvent(JSON.parse(e.data));
+  types.forEach((t) => source.addEventListener(t, handler));
+  return () => source.close();
+}
+
+// POST /chat/stream: calls onToken(text) as the reply streams in and resolves with
+// { reply, action } from the final "done" event. Rejects on HTTP or network errors.
+export async function streamChat(body, onToken, { signal } = {}) {
+  const token = localStorage.getItem("token");
+  const res = await fetch(`${API_BASE}/chat/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(body),
+    signal,
+  });
+  if (!res.ok || !res.body) throw new Error(`Chat stream failed: ${res.status}`);
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let done = null;
+  for (;;) {
+    const { value, done: finished } = await reader.read();
+    if (finished) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) >= 0) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const event = /^event: (.*)$/m.exec(block)?.[1];
+      const data = /^data: (.*)$/m.exec(block)?.[1];
+      if (!data) continue;
+      const payload = JSON.parse(data);
+      if (event === "token") onToken(payload.text);
+      else if (event === "done") done = payload;
+    }
+  }
+  if (!done) throw new Error("Chat stream ended early");
+  return done;
+}
+
 export default instance;
@@ -1,6 +1,6 @@
 import React from "react";
 import { useNavigate } from "react-router-dom";
-import api from "../api";
+import api, { streamChat } from "../api";
 
 const QUICK_PROMPTS = [
   "How do I upload?",
@@ -55,9 +55,26 @@ export default function MamboChat() {
     setLoading(true);
     try {
       const history = messages.map((m) => ({ role: m.role, content: m.content }));
-      const res = await api.post("/chat/", { message: userMessage, history });
-      const reply = res.data.reply;
-      const action = res.data.action;
+      let reply;
+      let action;
+      try {
+        // Stream tokens into a placeholder message so the reply appears as it is generated
+        setMessages((prev) => [...prev, { role: "assistant", content: "", streaming: true }]);
+        const appendToken = (t) =>
+          setMessages((prev) => {
+            const next = [...prev];
+            const last = next[next.length - 1];
+            next[next.length - 1] = { ...last, content: last.content + t };
+            return next;
+          });
+        ({ reply, action } = await streamChat({ message: userMessage, history }, appendToken));
+        setMessages((prev) => prev.filter((m) => !m.streaming));
+      } catch (streamErr) {
+        setMessages((prev) => prev.filter((m) => !m.streaming));
+        const res = await api.post("/chat/", { message: userMessage, history });
+        reply = res.data.reply;
+        action = res.data.action;
+      }
       setMessages((prev) => [...prev, { role: "assistant", content: reply, action }]);
       if (action?.type === "navigate" && action?.path) {
         setTimeout(() => {
@@ -1,5 +1,5 @@
 import React from "react";
-import api from "../api";
+import api, { subscribeDocumentEvents } from "../api";
 import Card from "../components/Card";
 
 const STEP_LABELS = {
@@ -16,10 +16,9 @@ export default function Approvals() {
   const fetchDocs = React.useCallback(() => {
     setLoadError(false);
     api
-      .get("/documents")
+      .get("/documents/inbox", { params: { limit: 200 } })
       .then(res => {
-        const list = Array.isArray(res.data) ? res.data : [];
-        setDocs(list.filter(d => String(d.status || "").toLowerCase() === "pending"));
+        setDocs(Array.isArray(res.data?.items) ? res.data.items : []);
       })
       .catch(() => {
         setDocs([]);
@@ -30,13 +29,18 @@ export default function Approvals() {
 
   React.useEffect(() => {
     fetchDocs();
-    const interval = setInterval(fetchDocs, 5000);
-    return () => clearInterval(interval);
+    const close = subscribeDocumentEvents(fetchDocs);
+    // Slow safety-net poll when events are streaming; fast poll otherwise
+    const interval = setInterval(fetchDocs, close ? 60000 : 5000);
+    return () => {
+      clearInterval(interval);
+      if (close) close();
+    };
   }, [fetchDocs]);
 
-  const act = async (id, action) => {
+  const act = async (id, action, version) => {
     try {
-      await api.post(`/documents/${id}/approve`, null, { params: { action } });
+      await api.post(`/documents/${id}/approve`, null, { params: { action, version } });
       fetchDocs();
     } catch (err) {
       const detail = err.response?.data?.detail;
@@ -44,6 +48,7 @@ export default function Approvals() {
       if (err.response?.status === 403) {
         msg = "Not authorized for this step. Step 1: Reviewer/Viewer; Step 2: Manager; Step 3: Admin. Log in with the right role or as Admin.";
       }
+      if (err.response?.status === 409) fetchDocs();
       alert(Array.isArray(detail) ? detail.map(m => m.msg || m).join(", ") : msg);
     }
   };
@@ -69,10 +74,10 @@ export default function Approvals() {
                 <div className="text-xs text-teal-600 mt-1 font-medium">{STEP_LABELS[Number(d.current_step)] || `Step ${d.current_step}/3`}</div>
               </div>
               <div className="flex gap-2 shrink-0">
-                <button type="button" onClick={() => act(d.id, "approve")} className="px-4 py-2 bg-green-600 hover:bg-green-700 text-white text-sm font-medium rounded">
+                <button type="button" onClick={() => act(d.id, "approve", d.version)} className="px-4 py-2 bg-green-600 hover:bg-green-700 text-white text-sm font-medium rounded">
                   Approve
                 </button>
-                <button type="button" onClick={() => act(d.id, "reject")} className="px-4 py-2 bg-red-600 hover:bg-red-700 text-white text-sm font-medium rounded">
+                <button type="button" onClick={() => act(d.id, "reject", d.version)} className="px-4 py-2 bg-red-600 hover:bg-red-700 text-white text-sm font-medium rounded">
                   Reject
                 </button>
               </div>
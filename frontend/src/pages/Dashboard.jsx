@@ -1,7 +1,7 @@
 import React from "react";
 import { Link } from "react-router-dom";
 import Card from "../components/Card";
-import api from "../api";
+import api, { subscribeDocumentEvents } from "../api";
 
 const translations = {
   en: {
@@ -119,8 +119,12 @@ export default function Dashboard() {
 
   React.useEffect(() => {
     fetchDocuments();
-    const interval = setInterval(fetchDocuments, 3000);
-    return () => clearInterval(interval);
+    const close = subscribeDocumentEvents(fetchDocuments);
+    const interval = setInterval(fetchDocuments, close ? 60000 : 3000);
+    return () => {
+      clearInterval(interval);
+      if (close) close();
+    };
   }, [fetchDocuments]);
 
   const statusLabel = (status) => {
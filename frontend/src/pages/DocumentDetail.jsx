@@ -1,21 +1,24 @@
 import React from "react";
 import { useParams, useNavigate } from "react-router-dom";
-import api from "../api";
+import api, { documentFileUrl, subscribeDocumentEvents } from "../api";
 import Card from "../components/Card";
 
 export default function DocumentDetail() {
   const { id } = useParams();
   const navigate = useNavigate();
   const [doc, setDoc] = React.useState(null);
+  const [approvals, setApprovals] = React.useState([]);
   const [error, setError] = React.useState("");
   const [loading, setLoading] = React.useState(true);
+  const [previewFailed, setPreviewFailed] = React.useState(false);
 
   const fetchDocument = React.useCallback(() => {
     if (!id) return;
     
-    api.get(`/documents/${id}`)
+    api.get(`/documents/${id}/timeline`)
       .then(res => {
-        setDoc(res.data);
+        setDoc(res.data.document);
+        setApprovals(res.data.approvals);
         setError("");
         setLoading(false);
       })
@@ -33,9 +36,13 @@ export default function DocumentDetail() {
   React.useEffect(() => {
     fetchDocument();
     
-    // Refresh document data periodically to get extraction results
-    const interval = setInterval(fetchDocument, 3000);
-    return () => clearInterval(interval);
+    // Refresh when extraction/approval events arrive; poll only if the event stream is unavailable
+    const close = subscribeDocumentEvents(fetchDocument, { documentId: id });
+    const interval = setInterval(fetchDocument, close ? 60000 : 3000);
+    return () => {
+      clearInterval(interval);
+      if (close) close();
+    };
   }, [fetchDocument]);
 
   if (loading) {
@@ -83,7 +90,23 @@ export default function DocumentDetail() {
   return (
     <Card title={`Document ${doc.id}`}>
       <div className="space-y-3">
-        <div><strong>Filename:</strong> {doc.filename}</div>
+        {!previewFailed && (
+          <a href={documentFileUrl(doc.id)} target="_blank" rel="noreferrer" className="inline-block">
+            <img
+              src={documentFileUrl(doc.id, "thumbnail", { page: 1 })}
+              alt={`Preview of ${doc.filename}`}
+              loading="lazy"
+              onError={() => setPreviewFailed(true)}
+              className="w-40 border rounded shadow-sm"
+            />
+          </a>
+        )}
+        <div>
+          <strong>Filename:</strong> {doc.filename}{" "}
+          <a href={documentFileUrl(doc.id)} target="_blank" rel="noreferrer" className="text-teal-600 hover:underline">
+            View original
+          </a>
+        </div>
         <div>
           <strong>Vendor:</strong> {doc.vendor || <span className="text-gray-400 italic">Extracting...</span>}
         </div>
@@ -105,6 +128,26 @@ export default function DocumentDetail() {
           'bg-yellow-100 text-yellow-800'
         }`}>{doc.status}</span></div>
         <div><strong>Duplicate:</strong> {doc.is_duplicate ? <span className="text-red-600">Yes</span> : <span className="text-green-600">No</span>}</div>
+        <div className="pt-4 border-t">
+          <strong>Approval history</strong>
+          {approvals.length === 0 ? (
+            <div className="text-gray-400 italic">No approvals yet</div>
+          ) : (
+            <ol className="mt-2 space-y-1 text-sm">
+              {approvals.map(a => (
+                <li key={a.id}>
+                  <span className="text-gray-500">{new Date(a.timestamp).toLocaleString()}</span>{" "}
+                  Step {a.step}:{" "}
+                  <span className={a.action === "approve" ? "text-green-700" : "text-red-700"}>
+                    {a.action === "approve" ? "approved" : "rejected"}
+                  </span>{" "}
+                  by {a.approver_email || "unknown user"}
+                  {a.comment && <span className="text-gray-600"> — {a.comment}</span>}
+                </li>
+              ))}
+            </ol>
+          )}
+        </div>
         <div className="pt-4 border-t">
           <button
             onClick={() => navigate("/")}
@@ -320,12 +320,15 @@ export default function Insights() {
 
       {insights?.anomalies?.length > 0 && (
         <Card title="Anomalies (Unusually High Amounts)">
-          <p className="text-sm text-gray-600 mb-2">Documents with amounts significantly above average.</p>
+          <p className="text-sm text-gray-600 mb-2">Documents with amounts far above what their vendor usually bills.</p>
           <ul className="space-y-2">
             {insights.anomalies.map((a) => (
               <li key={a.id} className="flex justify-between items-center border-b pb-2 last:border-0">
                 <span>
                   {a.filename} — {a.vendor || "—"}
+                  {a.vendor_typical_amount != null && (
+                    <span className="text-gray-500 text-sm"> (usually ${Number(a.vendor_typical_amount).toFixed(2)})</span>
+                  )}
                 </span>
                 <strong className="text-red-600">${Number(a.amount).toFixed(2)}</strong>
               </li>
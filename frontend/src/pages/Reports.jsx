@@ -16,6 +16,22 @@ export default function Reports() {
   const [vatReport, setVatReport] = React.useState(null);
   const [vendorAnalysis, setVendorAnalysis] = React.useState(null);
   const [loading, setLoading] = React.useState(false);
+  const [vendorSuggestions, setVendorSuggestions] = React.useState([]);
+
+  React.useEffect(() => {
+    const q = filters.vendor.trim();
+    if (!q) {
+      setVendorSuggestions([]);
+      return;
+    }
+    // Debounced; the server answers from an in-memory index
+    const timer = setTimeout(() => {
+      api.get("/vendors/autocomplete", { params: { q, limit: 8 } })
+        .then((res) => setVendorSuggestions(res.data))
+        .catch(() => setVendorSuggestions([]));
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [filters.vendor]);
 
   const fetchReports = () => {
     setLoading(true);
@@ -83,7 +99,12 @@ export default function Reports() {
           </div>
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-1">Vendor</label>
-            <input type="text" className="w-full p-2 border rounded" placeholder="Vendor name" value={filters.vendor} onChange={(e) => setFilters((f) => ({ ...f, vendor: e.target.value }))} />
+            <input type="text" list="vendor-suggestions" className="w-full p-2 border rounded" placeholder="Vendor name" value={filters.vendor} onChange={(e) => setFilters((f) => ({ ...f, vendor: e.target.value }))} />
+            <datalist id="vendor-suggestions">
+              {vendorSuggestions.map((v) => (
+                <option key={v.id} value={v.name}>{`${v.documents} document${v.documents === 1 ? "" : "s"}`}</option>
+              ))}
+            </datalist>
           </div>
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-1">Approval Status</label>
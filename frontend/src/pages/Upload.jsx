@@ -5,13 +5,13 @@ import Card from "../components/Card";
 
 export default function Upload() {
   const navigate = useNavigate();
-  const [file, setFile] = React.useState(null);
+  const [files, setFiles] = React.useState([]);
   const [message, setMessage] = React.useState("");
   const [isUploading, setIsUploading] = React.useState(false);
   const fileInputRef = React.useRef(null);
 
   const handleUpload = async () => {
-    if (!file) {
+    if (!files.length) {
       setMessage("Please select a file");
       return;
     }
@@ -26,23 +26,34 @@ export default function Upload() {
     setIsUploading(true);
     setMessage("");
     
+    const isBatch = files.length > 1 || files[0].name.toLowerCase().endsWith(".zip");
     const form = new FormData();
-    form.append("file", file);
+    if (isBatch) {
+      files.forEach((f) => form.append("files", f));
+    } else {
+      form.append("file", files[0]);
+    }
 
     // Ensure auth header is sent with FormData (some clients omit it for multipart)
     const headers = { Authorization: `Bearer ${token}` };
 
     try {
-      const response = await api.post("/documents/upload", form, {
+      const response = await api.post(isBatch ? "/documents/upload/batch" : "/documents/upload", form, {
         headers,
-        timeout: 60000,
+        timeout: isBatch ? 300000 : 60000,
       });
-      setMessage("Upload successful!");
-      setFile(null);
+      setFiles([]);
       // Reset file input
       if (fileInputRef.current) {
         fileInputRef.current.value = "";
       }
+      if (isBatch) {
+        const { accepted, rejected } = response.data;
+        setMessage(`Upload successful! ${accepted} document(s) queued for processing${rejected ? `, ${rejected} skipped` : ""}.`);
+        setTimeout(() => navigate("/"), 2500);
+        return;
+      }
+      setMessage("Upload successful!");
       // Redirect to document detail page after a short delay
       if (response.data && response.data.id) {
         setTimeout(() => {
@@ -89,19 +100,20 @@ export default function Upload() {
 
   return (
     <Card title="Upload Invoice or Credit Note">
-      <p className="text-sm text-gray-600 mb-4">Only invoices and credit notes are accepted (PDF or image).</p>
+      <p className="text-sm text-gray-600 mb-4">Only invoices and credit notes are accepted (PDF or image). Select several files or a ZIP to upload a batch.</p>
       <div className="space-y-4">
         <input 
           ref={fileInputRef}
           type="file" 
-          accept=".pdf,.png,.jpg,.jpeg" 
-          onChange={e => setFile(e.target.files[0])}
+          accept=".pdf,.png,.jpg,.jpeg,.zip" 
+          multiple
+          onChange={e => setFiles(Array.from(e.target.files))}
           disabled={isUploading}
           className="block w-full text-sm text-gray-500 file:mr-4 file:py-2 file:px-4 file:rounded file:border-0 file:text-sm file:font-semibold file:bg-teal-50 file:text-teal-700 hover:file:bg-teal-100"
         />
         <button 
           onClick={handleUpload} 
-          disabled={isUploading || !file}
+          disabled={isUploading || !files.length}
           className="px-4 py-2 bg-teal-600 text-white rounded hover:bg-teal-700 disabled:bg-gray-400 disabled:cursor-not-allowed"
         >
           {isUploading ? "Uploading..." : "Upload"}